@@ -8,10 +8,12 @@ import uvicorn
 
 # Import the new router from routes.py
 from routes.router import router as api_router
-from database.connector import engine, Base
+from database.connector import engine, Base, ensure_schema
+from controllers.lifecycle import lifespan
 
 # Create database tables
 Base.metadata.create_all(bind=engine)
+ensure_schema()
 
 # Windows-specific setup
 if sys.platform.startswith("win"):
@@ -20,7 +22,7 @@ if sys.platform.startswith("win"):
 load_dotenv()
 
 # FastAPI setup
-app = FastAPI()
+app = FastAPI(lifespan=lifespan)
 ALLOWED_ORIGINS = ["*"]
 
 app.add_middleware(
@@ -6,14 +6,16 @@ from fastapi.middleware.cors import CORSMiddleware
 import uvicorn
 
 from routes.router import router as api_router
-from database.connector import engine, Base
+from database.connector import engine, Base, ensure_schema
+from controllers.lifecycle import lifespan
 
 # Create database tables
 Base.metadata.create_all(bind=engine)
+ensure_schema()
 
 load_dotenv()
 
-app = FastAPI()
+app = FastAPI(lifespan=lifespan)
 ALLOWED_ORIGINS = ["*"]
 
 app.add_middleware(
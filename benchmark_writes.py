@@ -0,0 +1,134 @@
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import time
+import uuid
+
+# Benchmark for the tracker write path: N concurrent writers each moving rows
+# Pending -> Running -> Completed, like agent runners do, while readers poll
+# per-status counts like the status routes. Runs against a scratch database
+# in a temporary directory, never ./runs.db.
+
+
+async def _seed(rows: int, execution_id: str) -> list:
+    from sqlalchemy import insert
+    from database.connector import AsyncSessionLocal
+    from schema.TaskTracker import TaskTracker
+    from controllers.status import record_new_tasks
+
+    row_task_ids = [str(uuid.uuid4()) for _ in range(rows)]
+    async with AsyncSessionLocal() as db:
+        await db.execute(insert(TaskTracker), [
+            {"execution_id": execution_id, "file_name": "bench.xlsx", "agent_id": "bench",
+             "row_task_id": row_task_id, "operation": "bench", "status": "Pending", "duration": 0.0}
+            for row_task_id in row_task_ids
+        ])
+        await record_new_tasks(db, execution_id, "bench.xlsx", "bench", rows)
+        await db.commit()
+    return row_task_ids
+
+
+async def _direct_update(row_task_id: str, status: str, **_):
+    # One session and one commit per update, as runners did before the tracker writer
+    from database.connector import AsyncSessionLocal
+    from controllers.controller import find_task_tracker
+    from controllers.status import set_task_status
+
+    async with AsyncSessionLocal() as db:
+        task_tracker = await find_task_tracker(db, row_task_id)
+        await set_task_status(db, task_tracker, status)
+        await db.commit()
+
+
+async def _run(mode: str, writers: int, updates_per_writer: int, readers: int) -> dict:
+    from sqlalchemy import select, func
+    from database.connector import AsyncSessionLocal, async_engine
+    from schema.TaskTracker import TaskTracker
+    from controllers.tracker_writer import tracker_writer
+
+    execution_id = f"bench-{mode}-{uuid.uuid4().hex[:6]}"
+    rows_per_writer = max(1, updates_per_writer // 2)
+    row_task_ids = await _seed(writers * rows_per_writer, execution_id)
+    update = tracker_writer.update if mode == "writer" else _direct_update
+    latencies, errors = [], []
+    reads = 0
+    done = asyncio.Event()
+
+    async def writer(rows):
+        for row_task_id in rows:
+            for status in ("Running", "Completed"):
+                started = time.perf_counter()
+                try:
+                    await update(row_task_id, status=status)
+                except Exception as e:
+                    errors.append(str(e))
+                latencies.append(time.perf_counter() - started)
+
+    async def reader():
+        nonlocal reads
+        while not done.is_set():
+            async with AsyncSessionLocal() as db:
+                await db.execute(
+                    select(TaskTracker.status, func.count(TaskTracker.id))
+                    .where(TaskTracker.execution_id == execution_id)
+                    .group_by(TaskTracker.status)
+                )
+            reads += 1
+            await asyncio.sleep(0.01)
+
+    reader_tasks = [asyncio.create_task(reader()) for _ in range(readers)]
+    started = time.perf_counter()
+    await asyncio.gather(*(
+        writer(row_task_ids[i * rows_per_writer:(i + 1) * rows_per_writer]) for i in range(writers)
+    ))
+    elapsed = time.perf_counter() - started
+    done.set()
+    await asyncio.gather(*reader_tasks)
+    await tracker_writer.close()
+    await async_engine.dispose()
+
+    latencies.sort()
+    return {
+        "mode": mode,
+        "writers": writers,
+        "updates": len(latencies),
+        "seconds": round(elapsed, 2),
+        "updates_per_second": round(len(latencies) / elapsed, 1),
+        "p50_ms": round(statistics.median(latencies) * 1000, 1),
+        "p99_ms": round(latencies[int(len(latencies) * 0.99) - 1] * 1000, 1),
+        "errors": len(errors),
+        "first_error": errors[0] if errors else None,
+        "status_reads": reads,
+        **({"writer": tracker_writer.stats()} if mode == "writer" else {})
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure tracker status updates/sec under concurrent writers.")
+    parser.add_argument("--writers", type=int, default=100, help="concurrent writers (runners)")
+    parser.add_argument("--updates", type=int, default=40, help="status updates per writer")
+    parser.add_argument("--readers", type=int, default=4, help="concurrent status-count readers")
+    parser.add_argument("--mode", choices=("writer", "direct", "both"), default="both",
+                        help="writer: group commits through tracker_writer; direct: one commit per update")
+    args = parser.parse_args()
+
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    os.chdir(tempfile.mkdtemp(prefix="bench_writes_"))
+    from database.connector import engine, Base, ensure_schema
+    import controllers.controller  # noqa: F401  registers the models on Base
+
+    Base.metadata.create_all(bind=engine)
+    ensure_schema()
+    if sys.platform.startswith("win"):
+        asyncio.set_event_loop_policy(asyncio.WindowsProactorEventLoopPolicy())
+
+    for mode in (("direct", "writer") if args.mode == "both" else (args.mode,)):
+        print(asyncio.run(_run(mode, args.writers, args.updates, args.readers)))
+    print(f"Scratch database left in {os.getcwd()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,198 @@
+import asyncio
+import os
+from pydantic import BaseModel
+
+from controllers.tracker_writer import tracker_writer
+from controllers.results import pack_result
+from controllers.controller import (
+    _run_agent_logic,
+    browser_pool,
+    global_active_runners,
+    login_state_store,
+    LOGIN_STATE_HINT,
+    publish_result,
+    RunnerControl,
+    run_stoppable,
+    AGENT_RUN_TIMEOUT_SECONDS,
+)
+from browser_use import Controller, ActionResult
+
+BATCH_DEFAULT_SIZE = int(os.getenv("BATCH_DEFAULT_SIZE", "25"))
+BATCH_STEPS_PER_RECORD = int(os.getenv("BATCH_STEPS_PER_RECORD", "15"))
+
+BATCH_INSTRUCTIONS = (
+    "You will process several records with the same operation in one browser session. "
+    "Navigate to the url and log in once. Then, for each entry in 'records' in order, "
+    "perform the instructions using that record's user_info. After finishing each record, "
+    "call report_record_result with its record_index and whether it succeeded, then move on "
+    "to the next record without logging in again. Call done only after every record has been reported."
+)
+
+
+class RecordResult(BaseModel):
+    record_index: int
+    success: bool
+    note: str = ""
+
+
+class BatchAgentRunner(RunnerControl):
+    """
+    Runs one agent over a chunk of rows that share the same (app_type, operation).
+    The agent reports each record through the report_record_result action, which
+    updates that row's TaskTracker status and duration as soon as it is done.
+    Per-record timeout_seconds and max_steps are scaled by the number of rows.
+    Rows handed back for a retry run again as a smaller batch. A record's
+    duplicate rows follow it. Each row's result is its report; the run's
+    transcript is stored under the batch id.
+    """
+
+    def __init__(self, batch_id: str, task: dict, row_task_ids: list, sensitive_data: dict,
+                 timeout_seconds: float = None, max_steps: int = None, retry: dict = None,
+                 attempt: int = 1, job_id: str = None, duplicates: dict = None):
+        self.session_id = batch_id
+        self.task = task
+        self.sensitive_data = sensitive_data
+        self.max_steps = (max_steps or BATCH_STEPS_PER_RECORD) * len(row_task_ids)
+        self._init_control(row_task_ids, (timeout_seconds or AGENT_RUN_TIMEOUT_SECONDS) * len(row_task_ids),
+                           retry=retry, attempt=attempt, job_id=job_id or batch_id, duplicates=duplicates)
+        self.browser_session = None
+        self.done = False
+        self.reported = {}
+        self.started = set()
+        self.login_key = login_state_store.key(task.get("execution_id"), task.get("url"), sensitive_data)
+        self.restored_login = False
+
+    def _build_controller(self):
+        controller = Controller()
+
+        @controller.action(
+            "Report that one record of the batch has been processed, with its record_index and success",
+            param_model=RecordResult
+        )
+        async def report_record_result(params: RecordResult):
+            if not 0 <= params.record_index < len(self.row_task_ids):
+                return ActionResult(error=f"Unknown record_index {params.record_index}")
+            await self._finish_row(params.record_index, self._outcome("Completed") if params.success
+                                   else self._outcome("Failed", "incomplete", params.note), params.note)
+            await self._start_row(params.record_index + 1)
+            return ActionResult(
+                extracted_content=f"Record {params.record_index} reported as "
+                                  f"{'success' if params.success else 'failure'}",
+                include_in_memory=True
+            )
+
+        return controller
+
+    async def _start_row(self, record_index: int):
+        if record_index >= len(self.row_task_ids) or record_index in self.reported:
+            return
+        self.started.add(record_index)
+        await self._update_rows(self.row_task_ids[record_index], status="Running", only_from=("Pending",),
+                                start_clock=True)
+
+    async def _finish_row(self, record_index: int, outcome: dict, note: str = None):
+        if record_index in self.reported:
+            return
+        status = outcome["attempt"]["status"]
+        self.reported[record_index] = status
+        result = pack_result(self.task.get("execution_id"), self.job_id,
+                             {"done": status == "Completed", "final_result": note if status == "Completed" else None},
+                             outcome["attempt"]["error"])
+        # A row cancelled meanwhile keeps its Cancelled status
+        await self._update_rows(self.row_task_ids[record_index], start_clock=record_index not in self.started,
+                                result=result, **outcome)
+
+    async def run(self):
+        print(f"Batch agent run initiated for {self.session_id} ({len(self.row_task_ids)} rows)")
+        result = None
+        browser_healthy = True
+        cancelled = False
+        try:
+            self._begin_run()
+            self.browser_session = await browser_pool.checkout()
+            saved_state = login_state_store.get(self.login_key)
+            if saved_state:
+                try:
+                    await login_state_store.apply(self.browser_session, saved_state)
+                    self.restored_login = True
+                    self.task["login_state"] = LOGIN_STATE_HINT
+                except Exception as e:
+                    print(f"Could not restore saved login for batch {self.session_id}: {e}")
+
+            await self._start_row(0)
+            result = await _run_agent_logic(
+                self.session_id,
+                self.task,
+                self.browser_session,
+                self.sensitive_data,
+                controller=self._build_controller(),
+                max_steps=self.max_steps,
+                on_step=self.record_progress
+            )
+            publish_result(self.task, self.session_id, result)
+
+            if self.reported and all(status == "Completed" for status in self.reported.values()):
+                await login_state_store.capture(self.login_key, self.browser_session)
+            elif self.restored_login:
+                login_state_store.invalidate(self.login_key)
+
+        except asyncio.CancelledError:
+            browser_healthy = False
+            if self.stop_status is None:
+                # Shutdown: the job queue hands the unfinished rows back
+                cancelled = True
+            else:
+                publish_result(self.task, self.session_id, error=self.stop_reason)
+            raise
+
+        except Exception as e:
+            print(f"Batch agent run failed for {self.session_id}: {e}")
+            self.error = e
+            browser_healthy = False
+            publish_result(self.task, self.session_id, error=str(e))
+            if self.restored_login:
+                login_state_store.invalidate(self.login_key)
+
+        finally:
+            self.done = True
+            self._end_run()
+            if self.browser_session is not None:
+                await browser_pool.checkin(self.browser_session, healthy=browser_healthy)
+
+            # Rows the agent never reported did not get processed; queued
+            # together they land in one commit
+            if not cancelled:
+                await asyncio.gather(
+                    tracker_writer.update(self.session_id,
+                                          result=await self._packed_result(result, self.stop_reason or self.error)),
+                    *(self._finish_row(record_index, self._failure())
+                      for record_index in range(len(self.row_task_ids)) if record_index not in self.reported)
+                )
+
+            if self.session_id in global_active_runners:
+                del global_active_runners[self.session_id]
+
+
+async def start_batch_agent_instance(batch_id: str, sensitive_data: dict,
+                                     batch_task_data: dict, row_task_ids: list,
+                                     timeout_seconds: float = None, max_steps: int = None,
+                                     retry: dict = None, attempt: int = 1, job_id: str = None,
+                                     duplicates: dict = None) -> bool:
+    """Runs one agent over a chunk of same-operation rows, returning once it has finished or was stopped.
+    Returns whether any row was handed back for a retry."""
+    runner = BatchAgentRunner(
+        batch_id=batch_id,
+        task=batch_task_data,
+        row_task_ids=row_task_ids,
+        sensitive_data=sensitive_data,
+        timeout_seconds=timeout_seconds,
+        max_steps=max_steps,
+        retry=retry,
+        attempt=attempt,
+        job_id=job_id,
+        duplicates=duplicates
+    )
+    global_active_runners[batch_id] = runner
+    print(f"Batch agent runner {batch_id} created for {len(row_task_ids)} rows.")
+    await run_stoppable(runner)
+    return runner.retrying
@@ -0,0 +1,302 @@
+import asyncio
+import os
+import time
+from collections import deque
+
+import psutil
+
+BROWSER_POOL_SIZE = int(os.getenv("BROWSER_POOL_SIZE", os.getenv("AGENT_MAX_CONCURRENCY", "8")))
+BROWSER_POOL_WARM = int(os.getenv("BROWSER_POOL_WARM", "1"))
+BROWSER_POOL_MAX_USES = int(os.getenv("BROWSER_POOL_MAX_USES", "20"))
+BROWSER_POOL_MAX_AGE_SECONDS = float(os.getenv("BROWSER_POOL_MAX_AGE_SECONDS", "1800"))
+# Memory of one browser (main process plus renderers/GPU/utility children).
+# Over the soft cap it is recycled when returned; over the hard cap it is
+# killed even mid-run. 0 disables a cap.
+BROWSER_MAX_RSS_MB = float(os.getenv("BROWSER_MAX_RSS_MB", "1500"))
+BROWSER_KILL_RSS_MB = float(os.getenv("BROWSER_KILL_RSS_MB", "3000"))
+
+
+def process_tree(pid: int) -> list:
+    """
+    The process pid and all its descendants, or [] if it is gone.
+    """
+    try:
+        process = psutil.Process(pid)
+        return [process] + process.children(recursive=True)
+    except psutil.Error:
+        return []
+
+
+def process_tree_rss_mb(pid: int) -> float:
+    total = 0
+    for process in process_tree(pid):
+        try:
+            total += process.memory_info().rss
+        except psutil.Error:
+            pass
+    return total / (1024 * 1024)
+
+
+def kill_process_tree(pid: int, timeout: float = 5) -> int:
+    """
+    SIGKILL a process and its descendants. Returns how many were killed.
+    """
+    processes = process_tree(pid)
+    for process in processes:
+        try:
+            process.kill()
+        except psutil.Error:
+            pass
+    psutil.wait_procs(processes, timeout=timeout)
+    return len(processes)
+
+
+class PooledBrowser:
+    def __init__(self, session):
+        self.session = session
+        self.created_at = time.monotonic()
+        self.uses = 0
+        self.rss_mb = 0.0
+
+    @property
+    def pid(self):
+        return getattr(self.session, "browser_pid", None)
+
+    @property
+    def age(self) -> float:
+        return time.monotonic() - self.created_at
+
+
+class BrowserPool:
+    """
+    Pool of pre-started BrowserSession instances shared by AgentRunner.
+    Sessions are health-checked on checkout, reset between rows on checkin and
+    recycled after max_uses checkouts, after max_age seconds, when their
+    memory passes max_rss_mb or when a run crashed while holding them.
+    Retiring a session kills its whole process tree, falling back to
+    SIGKILL when BrowserSession.kill() fails.
+    """
+
+    def __init__(self, factory,
+                 size: int = BROWSER_POOL_SIZE,
+                 warm: int = BROWSER_POOL_WARM,
+                 max_uses: int = BROWSER_POOL_MAX_USES,
+                 max_age: float = BROWSER_POOL_MAX_AGE_SECONDS,
+                 max_rss_mb: float = BROWSER_MAX_RSS_MB,
+                 kill_rss_mb: float = BROWSER_KILL_RSS_MB):
+        self.factory = factory
+        self.size = max(1, size)
+        self.warm = min(max(0, warm), self.size)
+        self.max_uses = max_uses
+        self.max_age = max_age
+        self.max_rss_mb = max_rss_mb
+        self.kill_rss_mb = kill_rss_mb
+        self.closed = False
+        self._idle = deque()
+        self._in_use = {}
+        self._total = 0
+        self._available = None
+        self._waits = deque(maxlen=200)
+        self._created = 0
+        self._recycled = 0
+        self._memory_recycled = 0
+        self._force_killed = 0
+
+    def _condition(self):
+        if self._available is None:
+            self._available = asyncio.Condition()
+        return self._available
+
+    async def warm_up(self):
+        """
+        Start sessions until `warm` of them are idle, respecting the pool size.
+        """
+        while len(self._idle) < self.warm and self._total < self.size:
+            self._total += 1
+            try:
+                pooled = PooledBrowser(await self.factory())
+                self._created += 1
+            except Exception as e:
+                self._total -= 1
+                print(f"Browser pool warm-up failed: {e}")
+                return
+            self._idle.append(pooled)
+        print(f"Browser pool warmed: {len(self._idle)} idle / {self.size} max")
+
+    async def checkout(self):
+        """
+        Return a healthy BrowserSession, waiting for one to be returned if the
+        pool is exhausted.
+        """
+        available = self._condition()
+        started = time.monotonic()
+        while True:
+            pooled = None
+            async with available:
+                await available.wait_for(lambda: self._idle or self._total < self.size)
+                if self._idle:
+                    pooled = self._idle.popleft()
+                else:
+                    self._total += 1
+
+            if pooled is not None and not self._is_healthy(pooled):
+                await self._retire(pooled)
+                continue
+
+            if pooled is None:
+                try:
+                    pooled = PooledBrowser(await self.factory())
+                    self._created += 1
+                except Exception:
+                    async with available:
+                        self._total -= 1
+                        available.notify()
+                    raise
+
+            pooled.uses += 1
+            self._in_use[id(pooled.session)] = pooled
+            self._waits.append(time.monotonic() - started)
+            return pooled.session
+
+    async def checkin(self, session, healthy: bool = True):
+        """
+        Return a session to the pool. Unhealthy, worn-out or expired sessions
+        are killed and their slot released for a fresh one.
+        """
+        pooled = self._in_use.pop(id(session), None)
+        if pooled is None:
+            return
+
+        recycle = (
+            not healthy
+            or self.closed
+            or self._over_memory(pooled)
+            or pooled.uses >= self.max_uses
+            or pooled.age >= self.max_age
+            or not self._is_healthy(pooled)
+        )
+        if not recycle:
+            try:
+                await self._reset(session)
+            except Exception as e:
+                print(f"Browser pool reset failed, recycling session: {e}")
+                recycle = True
+
+        if recycle:
+            await self._retire(pooled)
+            return
+
+        available = self._condition()
+        async with available:
+            self._idle.append(pooled)
+            available.notify()
+
+    def _over_memory(self, pooled: PooledBrowser) -> bool:
+        if self.max_rss_mb and pooled.rss_mb > self.max_rss_mb:
+            self._memory_recycled += 1
+            return True
+        return False
+
+    def _is_healthy(self, pooled: PooledBrowser) -> bool:
+        if pooled.age >= self.max_age:
+            return False
+        try:
+            return pooled.session.is_connected()
+        except Exception:
+            return False
+
+    async def _reset(self, session):
+        """
+        Drop per-row state: extra tabs, cookies, web storage and the current page.
+        """
+        context = session.browser_context
+        pages = list(context.pages)
+        for page in pages[1:]:
+            await page.close()
+        if pages:
+            try:
+                await pages[0].evaluate("() => { try { localStorage.clear(); sessionStorage.clear(); } catch (e) {} }")
+            except Exception:
+                pass
+            await pages[0].goto("about:blank")
+        await context.clear_cookies()
+
+    async def _retire(self, pooled: PooledBrowser):
+        self._recycled += 1
+        pid = pooled.pid
+        try:
+            await pooled.session.kill()
+        except Exception as e:
+            print(f"Error killing pooled browser session: {e}")
+        if pid and psutil.pid_exists(pid):
+            # kill() failed or left the process behind
+            await asyncio.to_thread(kill_process_tree, pid)
+        available = self._condition()
+        async with available:
+            self._total -= 1
+            available.notify()
+
+    async def sample_memory(self):
+        """
+        Measure every session's process tree. Idle sessions over max_rss_mb
+        are retired now; checked-out ones are recycled when returned, or
+        killed right away when over kill_rss_mb.
+        """
+        pooled_browsers = list(self._idle) + list(self._in_use.values())
+        for pooled in pooled_browsers:
+            if pooled.pid:
+                pooled.rss_mb = await asyncio.to_thread(process_tree_rss_mb, pooled.pid)
+
+        for pooled in list(self._idle):
+            if pooled in self._idle and self._over_memory(pooled):
+                self._idle.remove(pooled)
+                print(f"Browser pool: recycling idle browser at {pooled.rss_mb:.0f} MB")
+                await self._retire(pooled)
+
+        for pooled in list(self._in_use.values()):
+            if self.kill_rss_mb and pooled.rss_mb > self.kill_rss_mb and pooled.pid:
+                # The run fails on its next browser call and checks the session back in
+                print(f"Browser pool: killing browser {pooled.pid} at {pooled.rss_mb:.0f} MB mid-run")
+                self._force_killed += 1
+                await asyncio.to_thread(kill_process_tree, pooled.pid)
+
+    def pids(self) -> set:
+        return {pooled.pid for pooled in list(self._idle) + list(self._in_use.values()) if pooled.pid}
+
+    async def close(self):
+        """
+        Kill every idle session, then any session still checked out; sessions
+        returned after close are killed too.
+        """
+        self.warm = 0
+        self.closed = True
+        while self._idle:
+            await self._retire(self._idle.popleft())
+        for pooled in list(self._in_use.values()):
+            if pooled.pid:
+                await asyncio.to_thread(kill_process_tree, pooled.pid)
+
+    def stats(self) -> dict:
+        waits = list(self._waits)
+        browsers = list(self._idle) + list(self._in_use.values())
+        return {
+            "size": self.size,
+            "warm": self.warm,
+            "max_uses": self.max_uses,
+            "max_age_seconds": self.max_age,
+            "total": self._total,
+            "idle": len(self._idle),
+            "in_use": len(self._in_use),
+            "created": self._created,
+            "recycled": self._recycled,
+            "memory_recycled": self._memory_recycled,
+            "force_killed": self._force_killed,
+            "max_rss_mb": self.max_rss_mb,
+            "kill_rss_mb": self.kill_rss_mb,
+            "rss_mb_total": round(sum(pooled.rss_mb for pooled in browsers), 1),
+            "rss_mb_max": round(max((pooled.rss_mb for pooled in browsers), default=0.0), 1),
+            "checkouts_sampled": len(waits),
+            "avg_checkout_wait": round(sum(waits) / len(waits), 4) if waits else 0.0,
+            "max_checkout_wait": round(max(waits), 4) if waits else 0.0,
+            "last_checkout_wait": round(waits[-1], 4) if waits else 0.0
+        }
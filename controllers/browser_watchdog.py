@@ -0,0 +1,125 @@
+import asyncio
+import getpass
+import os
+import time
+
+import psutil
+
+from controllers.browser_pool import kill_process_tree, process_tree_rss_mb
+from controllers.controller import browser_pool
+
+BROWSER_WATCHDOG_INTERVAL_SECONDS = float(os.getenv("BROWSER_WATCHDOG_INTERVAL_SECONDS", "30"))
+# Process names treated as automation browsers (substring match, case-insensitive)
+BROWSER_PROCESS_NAMES = tuple(
+    name.strip().lower() for name in os.getenv("BROWSER_PROCESS_NAMES", "chrome,chromium,headless_shell,msedge").split(",")
+    if name.strip()
+)
+# An orphan is only killed once it has been seen orphaned this long
+BROWSER_ORPHAN_GRACE_SECONDS = float(os.getenv("BROWSER_ORPHAN_GRACE_SECONDS", "60"))
+
+
+def _is_browser_root(process: psutil.Process) -> bool:
+    # Main browser processes of automation sessions; renderers and helpers
+    # carry --type= and die with their root.
+    name = (process.info.get("name") or "").lower()
+    if not any(candidate in name for candidate in BROWSER_PROCESS_NAMES):
+        return False
+    cmdline = process.info.get("cmdline") or []
+    return (any(arg.startswith("--remote-debugging") for arg in cmdline)
+            and not any(arg.startswith("--type=") for arg in cmdline))
+
+
+class BrowserWatchdog:
+    """
+    Host-level safety net for Chrome processes. Every interval it samples the
+    browser pool's memory (letting the pool enforce its RSS caps) and kills
+    automation browsers of this user whose parent process is gone, e.g. left
+    behind by a crashed or SIGKILLed worker. Browsers of live processes,
+    including other workers, are never touched.
+    """
+
+    def __init__(self, pool, interval: float = BROWSER_WATCHDOG_INTERVAL_SECONDS,
+                 grace: float = BROWSER_ORPHAN_GRACE_SECONDS):
+        self.pool = pool
+        self.interval = interval
+        self.grace = grace
+        self._user = getpass.getuser()
+        self._orphans_seen = {}
+        self._task = None
+        self._last_sample = {}
+        self.orphans_killed = 0
+
+    async def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._loop())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    async def _loop(self):
+        while True:
+            try:
+                await self.sweep()
+            except Exception as e:
+                print(f"Browser watchdog sweep failed: {e}")
+            await asyncio.sleep(self.interval)
+
+    async def sweep(self) -> dict:
+        await self.pool.sample_memory()
+        roots, orphans = await asyncio.to_thread(self._scan)
+
+        now = time.monotonic()
+        self._orphans_seen = {key: self._orphans_seen.get(key, now) for key in orphans}
+        killed = 0
+        for key, seen_at in list(self._orphans_seen.items()):
+            if now - seen_at >= self.grace:
+                print(f"Browser watchdog: killing orphaned browser process {key[0]}")
+                await asyncio.to_thread(kill_process_tree, key[0])
+                del self._orphans_seen[key]
+                killed += 1
+        self.orphans_killed += killed
+
+        self._last_sample = {
+            "host_browsers": len(roots),
+            "host_browser_rss_mb": round(sum(rss for _, rss in roots), 1),
+            "orphans_pending": len(self._orphans_seen),
+            "sampled_at": time.time()
+        }
+        return {"orphans_killed": killed, **self._last_sample}
+
+    def _scan(self):
+        """
+        Return ([(pid, rss_mb)] for every automation browser of this user,
+        [(pid, create_time)] for the orphaned ones).
+        """
+        roots, orphans = [], []
+        pool_pids = self.pool.pids()
+        for process in psutil.process_iter(["pid", "ppid", "name", "cmdline", "username", "create_time"]):
+            try:
+                if process.info.get("username") and process.info["username"].split("\\")[-1] != self._user:
+                    continue
+                if not _is_browser_root(process):
+                    continue
+                roots.append((process.pid, process_tree_rss_mb(process.pid)))
+                if process.pid in pool_pids:
+                    continue
+                ppid = process.info.get("ppid")
+                parent_gone = not ppid or not psutil.pid_exists(ppid) or (ppid == 1 and os.getpid() != 1)
+                if parent_gone:
+                    orphans.append((process.pid, process.info.get("create_time")))
+            except psutil.Error:
+                continue
+        return roots, orphans
+
+    def stats(self) -> dict:
+        return {
+            "interval_seconds": self.interval,
+            "orphan_grace_seconds": self.grace,
+            "orphans_killed": self.orphans_killed,
+            **self._last_sample
+        }
+
+
+browser_watchdog = BrowserWatchdog(browser_pool)
@@ -1,104 +1,295 @@
+import os
 import uuid
 import asyncio
 import pandas as pd
 import time
 from datetime import datetime
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from fastapi import HTTPException, WebSocket, WebSocketDisconnect
 
+from database.connector import AsyncSessionLocal
 from schema.TaskTracker import TaskTracker
-from browser_use import BrowserSession, BrowserProfile, Agent
-from langchain_openai import ChatOpenAI
+from controllers.scheduler import agent_scheduler
+from controllers.status import ACTIVE_TASK_STATUSES
+from controllers.tracker_writer import tracker_writer
+from controllers.retry import classify_failure, should_retry
+from controllers.results import pack_result
+from controllers.events import event_bus
+from controllers.browser_pool import BrowserPool, kill_process_tree
+from controllers.login_state import login_state_store, LOGIN_STATE_HINT
+from controllers.replay import (
+    replay_store, fill_history, REPLAY_ENABLED, REPLAY_ACTION_DELAY_SECONDS, REPLAY_MAX_FAILURES
+)
+from browser_use import BrowserSession, BrowserProfile, Agent, AgentHistoryList
+from controllers.llm_client import llm_registry
 
 global_active_runners = {}
 
-class AgentRunner:
-    def __init__(self, session_id: str, task: str, browser_session, sensitive_data: dict):
+# Default run limits; a Tasks row can override them per operation
+AGENT_RUN_TIMEOUT_SECONDS = float(os.getenv("AGENT_RUN_TIMEOUT_SECONDS", "900"))
+AGENT_MAX_STEPS = int(os.getenv("AGENT_MAX_STEPS", "100"))
+
+
+async def find_task_tracker(db: AsyncSession, row_task_id: str):
+    result = await db.execute(select(TaskTracker).where(TaskTracker.row_task_id == row_task_id))
+    return result.scalars().first()
+
+
+class RunnerControl:
+    """
+    Deadline, progress, stop and retry bookkeeping shared by AgentRunner and
+    BatchAgentRunner. stop() cancels the run; the runner then marks its
+    unfinished rows with the given status instead of Completed/Failed.
+    Failures the job's retry policy covers put the row back to Pending
+    instead, and the job queue runs it again after a backoff. Rows collapsed
+    onto a row of the run (duplicates, {row_task_id: [duplicate ids]}) get
+    every tracker write of that row.
+    """
+
+    def _init_control(self, row_task_ids: list, timeout_seconds: float, retry: dict = None,
+                      attempt: int = 1, job_id: str = None, duplicates: dict = None):
+        self.row_task_ids = row_task_ids
+        self.duplicates = duplicates or {}
+        self.all_row_task_ids = [row for row_task_id in row_task_ids for row in self.rows_of(row_task_id)]
+        self.timeout_seconds = timeout_seconds
+        self.retry = retry
+        self.attempt = attempt
+        self.job_id = job_id
+        self.retrying = False
+        self.error = None
+        self.last_progress_at = time.monotonic()
+        self.stop_status = None
+        self.stop_reason = None
+        self._run_task = None
+        self._deadline = None
+
+    def rows_of(self, row_task_id: str) -> list:
+        return [row_task_id, *self.duplicates.get(row_task_id, ())]
+
+    async def _update_rows(self, row_task_id: str, result: dict = None, **update):
+        # Queued together, a row and its duplicates land in one commit. The
+        # result is stored once; duplicates read it through duplicate_of.
+        await asyncio.gather(*(
+            tracker_writer.update(row, result=result if row == row_task_id else None, **update)
+            for row in self.rows_of(row_task_id)
+        ))
+
+    async def _packed_result(self, result: dict = None, error=None) -> dict:
+        # Compressing model thoughts can take a while for long runs
+        return await asyncio.to_thread(pack_result, self.task.get("execution_id"), self.job_id, result, error)
+
+    def record_progress(self, *_):
+        self.last_progress_at = time.monotonic()
+
+    def _begin_run(self):
+        self._run_task = asyncio.current_task()
+        self.record_progress()
+        if self.timeout_seconds:
+            self._deadline = asyncio.get_running_loop().call_later(
+                self.timeout_seconds, self.stop, "TimedOut", f"Run exceeded its {self.timeout_seconds:g}s deadline"
+            )
+
+    def _end_run(self):
+        if self._deadline is not None:
+            self._deadline.cancel()
+            self._deadline = None
+
+    def _outcome(self, status: str, failure_class: str = None, error=None) -> dict:
+        """
+        tracker_writer.update arguments ending a row's run with status, and
+        the attempt record for its history.
+        """
+        retry = status in ("Failed", "TimedOut") and should_retry(self.retry, self.attempt, failure_class)
+        self.retrying = self.retrying or retry
+        return {
+            "status": "Pending" if retry else status,
+            "only_from": ACTIVE_TASK_STATUSES,
+            "finish_clock": True,
+            "attempt": {
+                "job_id": self.job_id,
+                "status": status,
+                "failure_class": failure_class,
+                "error": str(error)[:1000] if error else None
+            }
+        }
+
+    def _failure(self) -> dict:
+        # Outcome of a run that did not report its rows: stopped, raised or gave up
+        status = self.stop_status or "Failed"
+        if status == "Cancelled":
+            return self._outcome(status, error=self.stop_reason)
+        return self._outcome(status, classify_failure(self.error, self.stop_status), self.stop_reason or self.error)
+
+    def stop(self, status: str, reason: str) -> bool:
+        """
+        Cancel the run, marking its unfinished rows status (Cancelled/TimedOut).
+        Returns False when the run is not in progress or already stopping.
+        """
+        if self.done or self._run_task is None or self.stop_status is not None:
+            return False
+        print(f"Stopping runner {self.session_id}: {reason}")
+        self.stop_status, self.stop_reason = status, reason
+        self._run_task.cancel()
+        return True
+
+
+async def run_stoppable(runner: RunnerControl):
+    """
+    Await runner.run(). A stop() ends it like any other finished run; other
+    cancellations (shutdown) propagate so the job queue hands the job back.
+    """
+    try:
+        await runner.run()
+    except asyncio.CancelledError:
+        if runner.stop_status is None:
+            raise
+        asyncio.current_task().uncancel()
+
+
+class AgentRunner(RunnerControl):
+    def __init__(self, session_id: str, task: str, sensitive_data: dict, browser_session=None,
+                 timeout_seconds: float = None, max_steps: int = None, retry: dict = None,
+                 attempt: int = 1, job_id: str = None, duplicates: dict = None):
         self.session_id = session_id
         self.task = task
         self.browser_session = browser_session
         self.sensitive_data = sensitive_data
-        self.queue = asyncio.Queue()
         self.done = False
-        
-    async def run(self, db: Session):
+        self.login_key = login_state_store.key(task.get("execution_id"), task.get("url"), sensitive_data)
+        self.restored_login = False
+        self.max_steps = max_steps or AGENT_MAX_STEPS
+        self._init_control([task.get("row_task_id", session_id)], timeout_seconds or AGENT_RUN_TIMEOUT_SECONDS,
+                           retry=retry, attempt=attempt, job_id=job_id or session_id, duplicates=duplicates)
+
+    async def run(self):
+        """
+        Run the agent. Tracker writes go through tracker_writer, which commits
+        them together with those of the other runners; the run's result is
+        stored with the final status write (see controllers.results).
+        """
         print(f"Agent run initiated for session {self.session_id}")
         result = None
-        task_tracker = None
-        
+        row_task_id = self.row_task_ids[0]
+        browser_healthy = True
+        cancelled = False
+        finished = False
+        started = False
+
         try:
-            task_tracker = db.query(TaskTracker).filter(TaskTracker.row_task_id == self.session_id).first()
-            if task_tracker:
-                task_tracker.status = "Running"
-                db.commit()
-        
-            result = await _run_agent_logic(self.session_id, self.task, self.browser_session, self.sensitive_data)
+            self._begin_run()
+            if self.browser_session is None:
+                self.browser_session = await browser_pool.checkout()
+            await self._restore_login()
+
+            # The row may have waited in the scheduler queue, so the run
+            # duration is measured from the moment a slot was granted.
+            await self._update_rows(row_task_id, status="Running", only_from=("Pending",), start_clock=True)
+            started = True
+
+            result = await _run_agent_logic(self.session_id, self.task, self.browser_session, self.sensitive_data,
+                                            max_steps=self.max_steps, on_step=self.record_progress)
             print(f"Agent run completed for session {self.session_id}")
-            await self.queue.put({"result": result})
-            
-            # Update task status to completed in the task table
-            if task_tracker:
-                print(result.get("done", False) if isinstance(result, dict) else False)
-                is_successful = result.get("done", False) if isinstance(result, dict) else False
-                task_tracker.status = "Completed" if is_successful else "Failed"
-                db.commit()
-                
+            packed = await self._packed_result(result)
+            for row in self.rows_of(row_task_id):
+                publish_result(self.task, self.session_id, result, row_task_id=row)
+
+            # Update task status to completed in the task table (unless cancelled meanwhile)
+            is_successful = result.get("done", False) if isinstance(result, dict) else False
+            if is_successful:
+                await self._update_rows(row_task_id, result=packed, **self._outcome("Completed"))
+            else:
+                await self._update_rows(row_task_id, result=packed,
+                                        **self._outcome("Failed", "incomplete", _result_error(result)))
+            finished = True
+
+            await self._save_login(is_successful)
+
             print(f"Agent run completed successfully for session {self.session_id}")
-            
+
+        except asyncio.CancelledError:
+            browser_healthy = False
+            if self.stop_status is None:
+                # Shutdown: the job queue hands the row back, so leave its status alone
+                cancelled = True
+            else:
+                publish_result(self.task, self.session_id, error=self.stop_reason)
+            raise
+
         except Exception as e:
             print(f"Agent run failed for session {self.session_id}: {e}")
-            await self.queue.put({"error": str(e)})
-            
-            # Update task status to failed if exception occurred
-            if task_tracker:
-                task_tracker.status = "Failed"
-                db.commit()
-                
+            self.error = e
+            browser_healthy = False
+            await self._save_login(False)
+            publish_result(self.task, self.session_id, error=str(e))
+
         finally:
             self.done = True
-            
-            # Handle result even if it's None in case of exceptions
-            is_successful = False
-            if result:
-                is_successful = result.get("done", False) if isinstance(result, dict) else False
-            
-            # Update task status in TaskTracker using row_task_id
-            row_task_id = self.task.get("row_task_id", self.session_id)
-            task_tracker = db.query(TaskTracker).filter(TaskTracker.row_task_id == row_task_id).first()
-            
-            if task_tracker:
-                end_time = time.time()
-                
-                # Calculate duration based on the timestamp format
-                if task_tracker.time_stamp:
-                    if isinstance(task_tracker.time_stamp, datetime):
-                        duration = (datetime.now() - task_tracker.time_stamp).total_seconds()
-                    elif isinstance(task_tracker.time_stamp, float):
-                        duration = end_time - task_tracker.time_stamp
-                    else:
-                        try:
-                            if isinstance(task_tracker.time_stamp, datetime):
-                                duration = end_time - task_tracker.time_stamp.timestamp()
-                            elif isinstance(task_tracker.time_stamp, (int, float)):
-                                duration = end_time - float(task_tracker.time_stamp)
-                            else:
-                                duration = 0
-                        except:
-                            duration = 0
-                    
-                    task_tracker.duration = duration
-                
-                # Update status (if not already updated)
-                if task_tracker.status in ["Pending", "Running"]:
-                    task_tracker.status = "Completed" if is_successful else "Failed"
-                    db.commit()
-            
+            self._end_run()
+
+            # A stopped run kills its browser rather than resetting it for reuse
+            if self.browser_session is not None:
+                await browser_pool.checkin(self.browser_session, healthy=browser_healthy)
+
+            # Failed, stopped (Cancelled/TimedOut) or crashed before reporting
+            if not finished and not cancelled:
+                await self._update_rows(row_task_id, start_clock=not started,
+                                        result=await self._packed_result(result, self.stop_reason or self.error),
+                                        **self._failure())
+
             # Remove from global runners tracking
             if self.session_id in global_active_runners:
                 del global_active_runners[self.session_id]
 
-    async def next_update(self):
-        return await self.queue.get()
+    async def _restore_login(self):
+        """
+        Start the row already signed in when an earlier row of the same
+        execution captured a login for this URL and these credentials.
+        """
+        saved_state = login_state_store.get(self.login_key)
+        if not saved_state:
+            return
+        try:
+            await login_state_store.apply(self.browser_session, saved_state)
+            self.restored_login = True
+            self.task["login_state"] = LOGIN_STATE_HINT
+        except Exception as e:
+            print(f"Could not restore saved login for session {self.session_id}: {e}")
+
+    async def _save_login(self, is_successful: bool):
+        """
+        Refresh the saved login after a successful run. A failed run that started
+        from a saved login drops it, so later rows fall back to a normal login.
+        """
+        if is_successful:
+            try:
+                await login_state_store.capture(self.login_key, self.browser_session)
+            except Exception as e:
+                print(f"Could not capture login state for session {self.session_id}: {e}")
+        elif self.restored_login:
+            login_state_store.invalidate(self.login_key)
+
+def _result_error(result) -> str:
+    # Why a run that returned did not complete: the agent's last error or its final answer
+    if not isinstance(result, dict):
+        return None
+    errors = [str(error) for error in result.get("errors") or [] if error]
+    return errors[-1] if errors else result.get("final_result")
+
+def publish_result(task: dict, session_id: str, result: dict = None, error: str = None, row_task_id: str = None):
+    """
+    Push a runner's final outcome to the execution's event stream, for
+    row_task_id when it is a duplicate sharing the task's run.
+    """
+    result = result if isinstance(result, dict) else {}
+    event_bus.publish(
+        task.get("execution_id"), "result",
+        row_task_id=row_task_id or task.get("row_task_id", session_id),
+        done=result.get("done", False),
+        final_result=result.get("final_result"),
+        errors=[str(e) for e in result.get("errors") or [] if e],
+        error=error
+    )
 
 async def browser_profile_opening_logic(): 
     browser_profile = BrowserProfile(
@@ -113,28 +304,66 @@ async def browser_profile_opening_logic():
         disable_security=True
     )
     browser_session = BrowserSession(browser_profile=browser_profile)
-    await browser_session.start()
+    try:
+        await browser_session.start()
+    except BaseException:
+        # keep_alive browsers outlive the session object, so a failed start must kill its Chrome
+        try:
+            await browser_session.kill()
+        except Exception as e:
+            print(f"Error killing browser after a failed start: {e}")
+        if getattr(browser_session, "browser_pid", None):
+            await asyncio.to_thread(kill_process_tree, browser_session.browser_pid)
+        raise
     return browser_session
 
+browser_pool = BrowserPool(browser_profile_opening_logic)
+
 async def _run_agent_logic(session_id:str,
                            task: dict, 
                            browser_session: BrowserSession, 
-                           sensitive_data: dict):
+                           sensitive_data: dict,
+                           controller=None,
+                           max_steps: int = AGENT_MAX_STEPS,
+                           on_step=None):
     print("Setting up LLMs and agent.")
-    llm = ChatOpenAI(model='gpt-4.1')
+    # Shared clients: pooled connections and one RPM/TPM limiter for all runners
+    llm = llm_registry.get('gpt-4.1')
     print(task)
+    last_step_at = time.monotonic()
+    row_task_id = task.get("row_task_id", session_id)
+
+    def on_new_step(browser_state_summary, model_output, step_number):
+        nonlocal last_step_at
+        now = time.monotonic()
+        agent_scheduler.record_step_latency(now - last_step_at)
+        last_step_at = now
+        if on_step is not None:
+            on_step(step_number)
+        current_state = getattr(model_output, "current_state", None)
+        event_bus.publish(
+            task.get("execution_id"), "step",
+            row_task_id=row_task_id,
+            step=step_number,
+            url=getattr(browser_state_summary, "url", None),
+            next_goal=getattr(current_state, "next_goal", None)
+        )
+
+    extra_agent_kwargs = {"controller": controller} if controller is not None else {}
     agent = Agent(
         task=task,
         save_conversation_path=f"running/log/{session_id}", 
         browser_session=browser_session,
-        llm=ChatOpenAI(model='gpt-4.1', temperature=0.4),
+        llm=llm_registry.get('gpt-4.1', temperature=0.4),
         planner_llm=llm,
-        page_extraction_llm=ChatOpenAI(model='gpt-4.1'),
+        page_extraction_llm=llm,
         use_vision=True,
         max_actions_per_step=5,
         max_input_tokens=136000,
         sensitive_data=sensitive_data,
         task_id=session_id,
+        register_new_step_callback=on_new_step,
+        **extra_agent_kwargs,
         extend_system_message='''
 You are a web automation agent that follows instructions with high precision. When navigating menus or clicking sidebar items, always prefer exact text matches over partial matches.
 If multiple options have similar names, use the one that best aligns with the task intent (e.g., 'Access' vs. 'Privileged Access').
@@ -150,11 +379,49 @@ If a detail is automatically filled in a form, you can skip it.
 '''
     )
 
+    # Replay a recorded script for this task template when there is one; the
+    # LLM only takes over if a replayed step fails or the page no longer matches.
+    template_id = task.get("template_id")
+    use_replay = REPLAY_ENABLED and controller is None and bool(template_id)
+    script = await replay_store.get(template_id) if use_replay else None
+
     print("Executing agent task.")
-    result = await agent.run()
-    await agent.close()
-    print("Agent task execution finished.")    # Extract row_task_id from the task data if available
-    row_task_id = task.get("row_task_id", session_id)
+    if script:
+        replay_results = await _replay_script(agent, script, task.get("user_info"))
+        if replay_results is not None:
+            await agent.close()
+            replay_store.count(template_id, "replayed")
+            replay_store.record_success(template_id)
+            print(f"Replayed recorded script for {template_id}")
+            return {
+                "final_result": replay_results[-1].extracted_content,
+                "urls": [],
+                "errors": [],
+                "model_thoughts": [],
+                "done": True,
+                "replayed": True,
+                "session_id": session_id,
+                "row_task_id": row_task_id
+            }
+        replay_store.count(template_id, "llm_fallback")
+        if await replay_store.record_failure(template_id):
+            print(f"Dropped the recorded script for {template_id} after {REPLAY_MAX_FAILURES} failed replays")
+    elif use_replay:
+        replay_store.count(template_id, "llm_run")
+
+    try:
+        result = await agent.run(max_steps=max_steps)
+    finally:
+        # Also on errors and stop(); the pooled browser itself is released by the runner
+        await agent.close()
+    print("Agent task execution finished.")
+
+    if use_replay and not script and result.is_done() and result.is_successful():
+        try:
+            await replay_store.save(template_id, result.model_dump(), task.get("user_info"), recorded_from=row_task_id)
+            replay_store.count(template_id, "recorded")
+        except Exception as e:
+            print(f"Could not record action script for {template_id}: {e}")
     print("-----------------------------------------------------------------------")
     print("-----------------------------------------------------------------------")
     print("-----------------------------------------------------------------------")
@@ -172,21 +439,59 @@ If a detail is automatically filled in a form, you can skip it.
         }
 
 
-async def start_agent_instance(db: Session, session_id:str, sensitive_data: dict, merged_task_data: dict):
-    """Starts the browser and the agent runner instance asynchronously."""
-    
-    browser_session = await browser_profile_opening_logic()
+async def _replay_script(agent: Agent, script: dict, user_info):
+    """
+    Replay a recorded script with this row's values. Returns the action results
+    when the replay reached a successful done action, otherwise None.
+    """
+    try:
+        data = fill_history(script, user_info)
+        for item in data["history"]:
+            if isinstance(item.get("model_output"), dict):
+                item["model_output"] = agent.AgentOutput.model_validate(item["model_output"])
+            item["state"].setdefault("interacted_element", None)
+        history = AgentHistoryList.model_validate(data)
+        results = await agent.rerun_history(
+            history,
+            max_retries=1,
+            skip_failures=False,
+            delay_between_actions=REPLAY_ACTION_DELAY_SECONDS
+        )
+    except Exception as e:
+        print(f"Replay failed for session {agent.task_id}, falling back to LLM: {e}")
+        return None
+
+    if not results or any(r.error for r in results):
+        return None
+    if not results[-1].is_done or results[-1].success is False:
+        return None
+    return results
+
+
+async def start_agent_instance(session_id:str, sensitive_data: dict, merged_task_data: dict,
+                               timeout_seconds: float = None, max_steps: int = None, retry: dict = None,
+                               attempt: int = 1, job_id: str = None, duplicates: dict = None) -> bool:
+    """Runs the agent on a pooled browser, returning once the run has finished or was stopped.
+    Uploads reach it through the durable job queue (controllers.job_queue).
+    Rows in duplicates share the run and its outcome.
+    Returns whether the row was handed back for a retry."""
     
     runner = AgentRunner(
         session_id=session_id,
-        browser_session=browser_session,
         sensitive_data=sensitive_data,
-        task=merged_task_data
+        task=merged_task_data,
+        timeout_seconds=timeout_seconds,
+        max_steps=max_steps,
+        retry=retry,
+        attempt=attempt,
+        job_id=job_id,
+        duplicates=duplicates
     )
     
     global_active_runners[session_id] = runner
     
-    asyncio.create_task(runner.run(db))
-    print(f"Agent runner for session {session_id} created and task started in background.")
+    print(f"Agent runner for session {session_id} created, running task.")
+    await run_stoppable(runner)
+    return runner.retrying
     
 
@@ -0,0 +1,138 @@
+import asyncio
+import os
+from datetime import datetime, timedelta
+
+from sqlalchemy import select, insert, delete, func
+
+from database.connector import AsyncSessionLocal
+from schema.EventLog import EventLog
+from controllers.events import event_bus
+from controllers.status import status_counters, enable_event_log, rebuild_execution_summaries
+
+EVENT_LOG_POLL_SECONDS = float(os.getenv("EVENT_LOG_POLL_SECONDS", "0.5"))
+EVENT_LOG_BATCH_ROWS = int(os.getenv("EVENT_LOG_BATCH_ROWS", "1000"))
+EVENT_LOG_RETENTION_SECONDS = float(os.getenv("EVENT_LOG_RETENTION_SECONDS", "3600"))
+
+
+class EventLogWriter:
+    """
+    Worker side of the relay: turns on event_log writes for status changes and
+    periodically flushes step/result events from event_bus into the table.
+    """
+
+    def __init__(self):
+        self._task = None
+        self.written = 0
+
+    async def start(self):
+        enable_event_log()
+        event_bus.outbox = []
+        self._task = asyncio.create_task(self._flush_loop())
+
+    async def _flush_loop(self):
+        while True:
+            await asyncio.sleep(EVENT_LOG_POLL_SECONDS)
+            try:
+                await self.flush()
+            except Exception as e:
+                print(f"Event log flush failed: {e}")
+
+    async def flush(self):
+        events, event_bus.outbox = event_bus.outbox, []
+        if not events:
+            return
+        now = datetime.now()
+        async with AsyncSessionLocal() as db:
+            await db.execute(insert(EventLog), [
+                {"execution_id": execution_id, "kind": "event", "data": {"type": event_type, **data},
+                 "created_at": now}
+                for execution_id, event_type, data in events
+            ])
+            await db.commit()
+        self.written += len(events)
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        await self.flush()
+
+
+class EventLogTailer:
+    """
+    API side of the relay for agents running in separate worker processes:
+    replays event_log into the in-memory status counters and event_bus so the
+    status routes, SSE/WebSocket streams and long-polls see worker progress.
+    """
+
+    def __init__(self):
+        self.last_id = 0
+        self.applied = 0
+        self._task = None
+
+    async def start(self):
+        async with AsyncSessionLocal() as db:
+            result = await db.execute(select(func.max(EventLog.id)))
+            self.last_id = result.scalar() or 0
+            await rebuild_execution_summaries(db)
+            await db.commit()
+        self._task = asyncio.create_task(self._tail_loop())
+
+    async def _tail_loop(self):
+        last_cleanup = datetime.now()
+        while True:
+            try:
+                applied = await self.poll()
+                if datetime.now() - last_cleanup > timedelta(seconds=60):
+                    await self.cleanup()
+                    last_cleanup = datetime.now()
+            except Exception as e:
+                print(f"Event log tail failed: {e}")
+                applied = 0
+            if applied < EVENT_LOG_BATCH_ROWS:
+                await asyncio.sleep(EVENT_LOG_POLL_SECONDS)
+
+    async def poll(self) -> int:
+        async with AsyncSessionLocal() as db:
+            result = await db.execute(
+                select(EventLog.id, EventLog.execution_id, EventLog.kind, EventLog.data)
+                .where(EventLog.id > self.last_id)
+                .order_by(EventLog.id)
+                .limit(EVENT_LOG_BATCH_ROWS)
+            )
+            rows = result.all()
+        for row_id, execution_id, kind, data in rows:
+            data = dict(data or {})
+            if kind == "counts":
+                status_counters.apply(execution_id, data.get("file_name"), data.get("deltas") or {})
+            elif kind == "touch":
+                status_counters.touch(execution_id, data.get("file_name"))
+            elif kind == "event":
+                event_type = data.pop("type", "event")
+                if event_type == "status":
+                    snapshot = status_counters.execution(execution_id)
+                    data["status_counts"] = snapshot[0] if snapshot else {}
+                event_bus.publish(execution_id, event_type, **data)
+            self.last_id = row_id
+        if rows:
+            self.applied += len(rows)
+            status_counters.notify()
+        return len(rows)
+
+    async def cleanup(self):
+        cutoff = datetime.now() - timedelta(seconds=EVENT_LOG_RETENTION_SECONDS)
+        async with AsyncSessionLocal() as db:
+            await db.execute(delete(EventLog).where(EventLog.created_at < cutoff))
+            await db.commit()
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    def stats(self) -> dict:
+        return {"last_id": self.last_id, "applied": self.applied}
+
+
+event_log_writer = EventLogWriter()
+event_log_tailer = EventLogTailer()
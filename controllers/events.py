@@ -0,0 +1,143 @@
+import asyncio
+import json
+import os
+import time
+from collections import OrderedDict, deque
+
+# Events kept per execution for resume; a client that falls further behind
+# gets a "resync" event and should refetch the status snapshot.
+EVENTS_BUFFER_SIZE = int(os.getenv("EVENTS_BUFFER_SIZE", "2000"))
+EVENTS_MAX_EXECUTIONS = int(os.getenv("EVENTS_MAX_EXECUTIONS", "256"))
+# Window used to gather a burst of events into one push
+EVENTS_COALESCE_SECONDS = float(os.getenv("EVENTS_COALESCE_SECONDS", "0.25"))
+EVENTS_HEARTBEAT_SECONDS = float(os.getenv("EVENTS_HEARTBEAT_SECONDS", "15"))
+
+
+class _Channel:
+    def __init__(self):
+        self.events = deque(maxlen=EVENTS_BUFFER_SIZE)
+        self.seq = 0
+        self.wakeup = asyncio.Event()
+
+
+class EventBus:
+    """
+    Per-execution event stream for status transitions, agent steps and final
+    results. Every event gets a sequence number within its execution and is kept
+    in a bounded ring buffer. Subscribers read from the buffer after their last
+    seen sequence number, which both coalesces bursts and lets a reconnecting
+    client resume where it stopped.
+    """
+
+    def __init__(self):
+        self._channels = OrderedDict()
+        # Set when a channel is created, for subscribers waiting on one
+        self._created = asyncio.Event()
+        self.published = 0
+        # Set to a list in worker processes: events are collected there and
+        # written to event_log instead of being served locally.
+        self.outbox = None
+
+    def _channel(self, execution_id: str) -> _Channel:
+        # Only publish creates channels (and refreshes their LRU position), so
+        # subscribers to unknown executions cannot evict real ones
+        channel = self._channels.get(execution_id)
+        if channel is None:
+            channel = self._channels[execution_id] = _Channel()
+            while len(self._channels) > EVENTS_MAX_EXECUTIONS:
+                self._channels.popitem(last=False)
+            self._created.set()
+            self._created = asyncio.Event()
+        self._channels.move_to_end(execution_id)
+        return channel
+
+    def publish(self, execution_id: str, event_type: str, **data):
+        if not execution_id:
+            return
+        if self.outbox is not None:
+            self.outbox.append((execution_id, event_type, data))
+            return
+        channel = self._channel(execution_id)
+        channel.seq += 1
+        channel.events.append({"seq": channel.seq, "type": event_type, "ts": time.time(), **data})
+        self.published += 1
+        # Wake everyone waiting on this round, then start a new one
+        channel.wakeup.set()
+        channel.wakeup = asyncio.Event()
+
+    def last_seq(self, execution_id: str) -> int:
+        channel = self._channels.get(execution_id)
+        return channel.seq if channel else 0
+
+    @staticmethod
+    def _coalesce(events: list) -> list:
+        # Only the latest step event of each task is worth sending
+        latest_step = {}
+        for index, event in enumerate(events):
+            if event["type"] == "step":
+                latest_step[event.get("row_task_id")] = index
+        return [event for index, event in enumerate(events)
+                if event["type"] != "step" or latest_step[event.get("row_task_id")] == index]
+
+    async def subscribe(self, execution_id: str, since: int = 0, row_task_id: str = None):
+        """
+        Yield lists of events with seq > since, optionally only for one task.
+        Yields an empty list every EVENTS_HEARTBEAT_SECONDS while idle.
+        Until the execution publishes its first event there is no channel to
+        read; the subscriber waits for one without creating it.
+        """
+        last_seen = since
+        while True:
+            channel = self._channels.get(execution_id)
+            if channel is None:
+                try:
+                    await asyncio.wait_for(self._created.wait(), EVENTS_HEARTBEAT_SECONDS)
+                except asyncio.TimeoutError:
+                    yield []
+                continue
+            if last_seen > channel.seq:
+                # The server restarted since the client's last event
+                last_seen = 0
+            pending = [event for event in channel.events if event["seq"] > last_seen]
+            batch = []
+            oldest = pending[0]["seq"] if pending else channel.seq + 1
+            if last_seen and oldest > last_seen + 1:
+                batch.append({"seq": oldest - 1, "type": "resync", "ts": time.time()})
+            if pending:
+                last_seen = pending[-1]["seq"]
+                if row_task_id:
+                    pending = [event for event in pending if event.get("row_task_id") in (None, row_task_id)]
+                batch.extend(self._coalesce(pending))
+            if batch:
+                yield batch
+                await asyncio.sleep(EVENTS_COALESCE_SECONDS)
+                continue
+            try:
+                await asyncio.wait_for(channel.wakeup.wait(), EVENTS_HEARTBEAT_SECONDS)
+            except asyncio.TimeoutError:
+                yield []
+                continue
+            await asyncio.sleep(EVENTS_COALESCE_SECONDS)
+
+    def stats(self) -> dict:
+        return {
+            "executions": len(self._channels),
+            "published": self.published,
+            "buffer_size": EVENTS_BUFFER_SIZE
+        }
+
+
+def format_sse(events: list) -> str:
+    """
+    Render a batch from EventBus.subscribe as Server-Sent Events; an empty
+    batch becomes a keep-alive comment.
+    """
+    if not events:
+        return ": keep-alive\n\n"
+    return "".join(
+        f"id: {event['seq']}\nevent: {event['type']}\ndata: {json.dumps(event, default=str)}\n\n"
+        for event in events
+    )
+
+
+event_bus = EventBus()
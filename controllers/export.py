@@ -0,0 +1,166 @@
+import csv
+import io
+import os
+import re
+import tempfile
+
+from sqlalchemy import select, func, true
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from database.connector import AsyncSessionLocal, SessionLocal
+from schema.TaskTracker import TaskTracker
+from schema.TaskResult import TaskResult
+from schema.TaskInput import TaskInput
+
+# Rows fetched per round trip from the database cursor while exporting
+EXPORT_STREAM_BATCH_ROWS = int(os.getenv("EXPORT_STREAM_BATCH_ROWS", "1000"))
+EXPORT_FORMATS = ("xlsx", "csv")
+# Appended to each uploaded row; prefixed with agent_ when the upload has a
+# column of the same name
+EXPORT_COLUMNS = ("status", "duration", "final_result", "error", "row_task_id")
+# Longest text an Excel cell holds
+XLSX_MAX_CELL_CHARS = 32767
+# Text starting with one of these is run as a formula by spreadsheet apps
+FORMULA_PREFIXES = ("=", "+", "-", "@", "\t", "\r")
+# A leading + or - followed only by digits and separators is a number or a
+# phone number, not a formula, and is exported unchanged
+NUMERIC_TEXT_RE = re.compile(r"[+-][\d\s.,()/-]*\d[\d\s.,()/-]*")
+
+
+def _filters(execution_id: str, file_name: str = None) -> list:
+    criteria = [TaskInput.execution_id == execution_id]
+    if file_name is not None:
+        criteria.append(TaskInput.file_name == file_name)
+    return criteria
+
+
+def columns_query(execution_id: str, file_name: str = None):
+    """
+    The uploaded columns, in the order they first appear, worked out by
+    SQLite from the stored rows so the export knows its header up front.
+    """
+    cells = func.json_each(TaskInput.data).table_valued("key", "id")
+    return (
+        select(cells.c.key)
+        .select_from(TaskInput)
+        .join(cells, true())
+        .where(*_filters(execution_id, file_name))
+        .group_by(cells.c.key)
+        .order_by(func.min(TaskInput.row_index), func.min(cells.c.id))
+    )
+
+
+def export_query(execution_id: str, file_name: str = None):
+    """
+    The uploaded rows of an execution (or one file) in file order, with
+    their status and the result of their latest run. Duplicate rows carry
+    the result of the row whose run they shared.
+    """
+    source = func.coalesce(TaskTracker.duplicate_of, TaskTracker.row_task_id)
+    return (
+        select(
+            TaskInput.file_name, TaskInput.data, TaskTracker.status, TaskTracker.duration,
+            TaskResult.final_result, TaskResult.error, TaskTracker.row_task_id
+        )
+        .join(TaskTracker, TaskTracker.row_task_id == TaskInput.row_task_id)
+        .outerjoin(TaskResult, TaskResult.row_task_id == source)
+        .where(*_filters(execution_id, file_name))
+        .order_by(TaskInput.file_name, TaskInput.row_index)
+        .execution_options(yield_per=EXPORT_STREAM_BATCH_ROWS)
+    )
+
+
+async def has_export_rows(db: AsyncSession, execution_id: str, file_name: str = None) -> bool:
+    result = await db.execute(select(TaskInput.id).where(*_filters(execution_id, file_name)).limit(1))
+    return result.first() is not None
+
+
+def _formula_like(value) -> bool:
+    # Uploaded cells and agent output are untrusted and must not run as
+    # formulas when the export is opened in a spreadsheet app
+    return (isinstance(value, str) and value.startswith(FORMULA_PREFIXES)
+            and NUMERIC_TEXT_RE.fullmatch(value) is None)
+
+
+def _csv_cell(value):
+    # CSV has no cell types; a leading ' is what spreadsheet apps take as "text"
+    return "'" + value if _formula_like(value) else value
+
+
+def _header(columns: list, with_file: bool) -> list:
+    appended = [f"agent_{name}" if name in columns else name for name in EXPORT_COLUMNS]
+    return (["file_name"] if with_file else []) + list(columns) + appended
+
+
+def _values(row, columns: list, with_file: bool) -> list:
+    data = row.data or {}
+    values = [data.get(column) for column in columns]
+    values += [row.status, row.duration, row.final_result, row.error, row.row_task_id]
+    return ([row.file_name] if with_file else []) + values
+
+
+async def stream_csv(execution_id: str, file_name: str = None):
+    """
+    Yield the export as CSV text straight from a server-side cursor, one
+    fetched batch at a time. Uses its own session, since the response
+    outlives the request handler.
+    """
+    with_file = file_name is None
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    async with AsyncSessionLocal() as db:
+        columns = list((await db.execute(columns_query(execution_id, file_name))).scalars().all())
+        # The BOM makes Excel read the file as UTF-8; uploads accept it too
+        buffer.write("\ufeff")
+        writer.writerow([_csv_cell(name) for name in _header(columns, with_file)])
+        result = await db.stream(export_query(execution_id, file_name))
+        async for rows in result.partitions():
+            writer.writerows([_csv_cell(value) for value in _values(row, columns, with_file)] for row in rows)
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+        if buffer.tell():
+            yield buffer.getvalue()
+
+
+def write_xlsx(execution_id: str, file_name: str = None) -> str:
+    """
+    Write the export to a temporary .xlsx file and return its path; the
+    caller deletes it. openpyxl's write-only mode streams rows to disk, so
+    memory stays flat however many rows are read from the cursor. Blocking,
+    so callers run it in a thread.
+    """
+    from openpyxl import Workbook
+    from openpyxl.cell import WriteOnlyCell
+    from openpyxl.cell.cell import ILLEGAL_CHARACTERS_RE
+
+    def cell(value):
+        if not isinstance(value, str):
+            return value
+        value = ILLEGAL_CHARACTERS_RE.sub("", value)[:XLSX_MAX_CELL_CHARS]
+        if not _formula_like(value):
+            return value
+        # Keep the text as is, stored as a string with Excel's quote prefix
+        # so that editing the cell does not turn it into a formula either
+        text = WriteOnlyCell(sheet, value=value)
+        text.data_type = "s"
+        text.quotePrefix = True
+        return text
+
+    with_file = file_name is None
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet("results")
+    handle = tempfile.NamedTemporaryFile(prefix="export_", suffix=".xlsx", delete=False)
+    handle.close()
+    try:
+        with SessionLocal() as db:
+            columns = list(db.execute(columns_query(execution_id, file_name)).scalars().all())
+            sheet.append([cell(name) for name in _header(columns, with_file)])
+            for rows in db.execute(export_query(execution_id, file_name)).partitions():
+                for row in rows:
+                    sheet.append([cell(value) for value in _values(row, columns, with_file)])
+        workbook.save(handle.name)
+    except Exception:
+        os.remove(handle.name)
+        raise
+    return handle.name
@@ -0,0 +1,78 @@
+import os
+from collections import Counter
+from datetime import datetime
+
+# Priority levels accepted by /start; each level doubles the share of slots
+PRIORITY_LEVELS = {"low": 0, "normal": 1, "high": 2}
+DEFAULT_PRIORITY = PRIORITY_LEVELS["normal"]
+# Max jobs one agent_id may have running across all workers (0 = no cap)
+TENANT_MAX_CONCURRENCY = int(os.getenv("TENANT_MAX_CONCURRENCY", "0"))
+# Waiting this long doubles a group's weight, so low priority work still moves
+JOB_AGING_SECONDS = float(os.getenv("JOB_AGING_SECONDS", "300"))
+
+
+def priority_level(priority: str) -> int:
+    """
+    Map a /start priority name to its level, raising ValueError if unknown.
+    """
+    try:
+        return PRIORITY_LEVELS[(priority or "normal").lower()]
+    except KeyError:
+        raise ValueError(f"Unknown priority '{priority}'; use one of {', '.join(PRIORITY_LEVELS)}")
+
+
+def group_weight(priority: int, oldest_queued_at: datetime, now: datetime) -> float:
+    waited = max(0.0, (now - oldest_queued_at).total_seconds()) if oldest_queued_at else 0.0
+    return (2 ** priority) * (1 + waited / JOB_AGING_SECONDS)
+
+
+def plan_claims(groups: list, running_by_agent: Counter, running_by_execution: Counter, slots: int,
+                now: datetime = None, tenant_cap: int = TENANT_MAX_CONCURRENCY) -> Counter:
+    """
+    Decide how many jobs to take from each queued group for the free slots.
+
+    groups holds (agent_id, execution_id, priority, queued, oldest_queued_at)
+    tuples. Slots are handed out one at a time, first to the agent with the
+    lowest running-per-weight share, then to that agent's execution with the
+    lowest share, so a huge upload cannot starve later ones. Agents at
+    tenant_cap running jobs are skipped. Returns a Counter keyed by
+    (agent_id, execution_id, priority).
+    """
+    now = now or datetime.now()
+    remaining = {}
+    weights = {}
+    oldest = {}
+    for agent_id, execution_id, priority, queued, oldest_queued_at in groups:
+        key = (agent_id, execution_id, priority)
+        remaining[key] = queued
+        weights[key] = group_weight(priority, oldest_queued_at, now)
+        oldest[key] = oldest_queued_at or now
+
+    picks = Counter()
+    agent_picks = Counter()
+    execution_picks = Counter()
+    for _ in range(slots):
+        open_groups = [
+            key for key, count in remaining.items()
+            if count > 0 and (not tenant_cap or running_by_agent[key[0]] + agent_picks[key[0]] < tenant_cap)
+        ]
+        if not open_groups:
+            break
+
+        agent_weight = {}
+        agent_oldest = {}
+        for key in open_groups:
+            agent_weight[key[0]] = max(agent_weight.get(key[0], 0.0), weights[key])
+            agent_oldest[key[0]] = min(agent_oldest.get(key[0], oldest[key]), oldest[key])
+        agent_id = min(agent_weight, key=lambda agent: (
+            (running_by_agent[agent] + agent_picks[agent] + 1) / agent_weight[agent], agent_oldest[agent]
+        ))
+
+        key = min((key for key in open_groups if key[0] == agent_id), key=lambda key: (
+            (running_by_execution[key[1]] + execution_picks[key[1]] + 1) / weights[key], oldest[key]
+        ))
+        picks[key] += 1
+        agent_picks[agent_id] += 1
+        execution_picks[key[1]] += 1
+        remaining[key] -= 1
+    return picks
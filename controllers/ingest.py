@@ -0,0 +1,179 @@
+import asyncio
+import csv
+import hashlib
+import importlib.util
+import multiprocessing
+import os
+import queue as queue_module
+import tempfile
+from datetime import date, datetime
+
+INGEST_CHUNK_ROWS = int(os.getenv("INGEST_CHUNK_ROWS", "200"))
+# Chunks buffered between the reader process and the event loop
+INGEST_QUEUE_CHUNKS = int(os.getenv("INGEST_QUEUE_CHUNKS", "4"))
+INGEST_SPOOL_CHUNK_BYTES = 1024 * 1024
+
+# Parquet is only accepted when pyarrow is installed (it is not in
+# requirements.txt); otherwise /start rejects it up front with a 400
+PARQUET_SUPPORTED = importlib.util.find_spec("pyarrow") is not None
+SUPPORTED_EXTENSIONS = (".xlsx", ".xlsm", ".xls", ".csv") + ((".parquet",) if PARQUET_SUPPORTED else ())
+
+
+def file_extension(file_name: str) -> str:
+    return os.path.splitext(file_name or "")[1].lower()
+
+
+async def spool_upload(upload, suffix: str) -> tuple:
+    """
+    Copy an UploadFile to a temporary file in 1 MB chunks and return its path
+    and the sha256 hex digest of its content. The caller owns the file and
+    must delete it.
+    """
+    handle = tempfile.NamedTemporaryFile(prefix="upload_", suffix=suffix, delete=False)
+    digest = hashlib.sha256()
+
+    def write(chunk: bytes):
+        digest.update(chunk)
+        handle.write(chunk)
+
+    try:
+        while True:
+            chunk = await upload.read(INGEST_SPOOL_CHUNK_BYTES)
+            if not chunk:
+                break
+            await asyncio.to_thread(write, chunk)
+    finally:
+        handle.close()
+    return handle.name, digest.hexdigest()
+
+
+def _clean_value(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, str):
+        return value.strip()
+    return value
+
+
+def _iter_xlsx(path: str):
+    from openpyxl import load_workbook
+
+    workbook = load_workbook(path, read_only=True, data_only=True)
+    try:
+        # The first sheet, as pd.read_excel reads it; workbook.active is
+        # whichever sheet was selected when the file was saved
+        rows = workbook.worksheets[0].iter_rows(values_only=True)
+        header = next(rows, None)
+        if header is None:
+            return
+        columns = [str(name).strip() if name is not None else f"column_{i}" for i, name in enumerate(header)]
+        for values in rows:
+            if values is None or all(value is None for value in values):
+                continue
+            yield {column: _clean_value(value) for column, value in zip(columns, values)}
+    finally:
+        workbook.close()
+
+
+def _iter_xls(path: str):
+    # Legacy .xls has no streaming reader; pandas loads it in one go.
+    import pandas as pd
+
+    df = pd.read_excel(path)
+    df = df.astype(object).where(df.notna(), None)
+    for record in df.to_dict(orient="records"):
+        yield {str(column).strip(): _clean_value(value) for column, value in record.items()}
+
+
+def _iter_csv(path: str):
+    with open(path, newline="", encoding="utf-8-sig") as handle:
+        for record in csv.DictReader(handle):
+            yield {str(column).strip(): _clean_value(value) if value != "" else None
+                   for column, value in record.items() if column is not None}
+
+
+def _iter_parquet(path: str):
+    try:
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise ValueError("Parquet uploads require the pyarrow package")
+
+    parquet_file = pq.ParquetFile(path)
+    for batch in parquet_file.iter_batches(batch_size=INGEST_CHUNK_ROWS):
+        for record in batch.to_pylist():
+            yield {str(column).strip(): _clean_value(value) for column, value in record.items()}
+
+
+def iter_rows(path: str, extension: str):
+    """
+    Yield each data row of the file as a dict, reading it incrementally.
+    """
+    if extension in (".xlsx", ".xlsm"):
+        return _iter_xlsx(path)
+    if extension == ".xls":
+        return _iter_xls(path)
+    if extension == ".csv":
+        return _iter_csv(path)
+    if extension == ".parquet":
+        return _iter_parquet(path)
+    raise ValueError(f"Unsupported file type '{extension}'")
+
+
+def _read_rows_worker(path: str, extension: str, chunk_rows: int, queue):
+    """
+    Reader process entry point: puts lists of (index, row) on the queue, then
+    None when done, or ("error", message) if the file can't be read.
+    """
+    try:
+        chunk = []
+        for index, row in enumerate(iter_rows(path, extension)):
+            chunk.append((index, row))
+            if len(chunk) >= chunk_rows:
+                queue.put(chunk)
+                chunk = []
+        if chunk:
+            queue.put(chunk)
+        queue.put(None)
+    except Exception as e:
+        queue.put(("error", f"{type(e).__name__}: {e}"))
+
+
+def _next_item(queue, process):
+    # Blocking get that notices a reader process which died without a sentinel
+    while True:
+        try:
+            return queue.get(timeout=1)
+        except queue_module.Empty:
+            if not process.is_alive():
+                try:
+                    return queue.get_nowait()
+                except queue_module.Empty:
+                    return ("error", f"Reader process exited with code {process.exitcode}")
+
+
+async def stream_row_chunks(path: str, extension: str, chunk_rows: int = INGEST_CHUNK_ROWS):
+    """
+    Parse the file in a separate process and yield chunks of (index, row) as
+    they are read. The bounded queue applies backpressure to the reader, so
+    memory stays flat however large the sheet is.
+    """
+    queue = multiprocessing.Queue(maxsize=INGEST_QUEUE_CHUNKS)
+    process = multiprocessing.Process(
+        target=_read_rows_worker,
+        args=(path, extension, chunk_rows, queue),
+        daemon=True
+    )
+    process.start()
+    try:
+        while True:
+            item = await asyncio.to_thread(_next_item, queue, process)
+            if item is None:
+                break
+            if isinstance(item, tuple):
+                raise ValueError(item[1])
+            yield item
+    finally:
+        if process.is_alive():
+            process.terminate()
+        await asyncio.to_thread(process.join, 5)
+        queue.close()
@@ -0,0 +1,625 @@
+import asyncio
+import os
+import socket
+import uuid
+from collections import Counter
+from datetime import datetime, timedelta
+
+from sqlalchemy import select, update, insert, delete, event, func, or_
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from database.connector import AsyncSessionLocal
+from schema.AgentJob import AgentJob
+from schema.JobSecret import JobSecret
+from schema.TaskTracker import TaskTracker
+from controllers.scheduler import agent_scheduler
+from controllers.tracker_writer import tracker_writer
+from controllers.fair_share import plan_claims, DEFAULT_PRIORITY, TENANT_MAX_CONCURRENCY
+from controllers.status import (
+    bulk_set_status, ACTIVE_TASK_STATUSES, TERMINAL_TASK_STATUSES, RERUNNABLE_TASK_STATUSES
+)
+from controllers.retry import retry_delay
+from controllers.controller import start_agent_instance
+from controllers.batch import start_batch_agent_instance
+
+JOB_LEASE_SECONDS = float(os.getenv("JOB_LEASE_SECONDS", "120"))
+JOB_HEARTBEAT_SECONDS = float(os.getenv("JOB_HEARTBEAT_SECONDS", "30"))
+# How often to look for jobs enqueued by other processes
+JOB_POLL_SECONDS = float(os.getenv("JOB_POLL_SECONDS", "2"))
+# Leases lost this many times (process crashes mid-run) fail the job for good
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "3"))
+# How long stop() waits for cancelled runners to release their browsers
+JOB_STOP_GRACE_SECONDS = float(os.getenv("JOB_STOP_GRACE_SECONDS", "15"))
+# Rows and jobs per statement when rerunning failed rows
+RERUN_CHUNK_ROWS = 500
+
+
+async def enqueue_jobs(db: AsyncSession, jobs: list):
+    """
+    Add jobs to the queue inside the caller's transaction, normally the one
+    that inserts their tracker rows. Each job is a dict with id, kind
+    ("row"/"batch"), execution_id, agent_id, row_task_ids and payload. The
+    payload's sensitive_data goes to job_secrets instead of agent_jobs.
+    """
+    if not jobs:
+        return
+    now = datetime.now()
+    secrets = []
+    rows = []
+    for job in jobs:
+        payload = dict(job["payload"])
+        sensitive_data = payload.pop("sensitive_data", None)
+        if sensitive_data:
+            secrets.append({"job_id": job["id"], "sensitive_data": sensitive_data, "created_at": now})
+        rows.append({**job, "payload": payload, "status": "queued", "attempts": 0, "created_at": now, "updated_at": now})
+    await db.execute(insert(AgentJob), rows)
+    if secrets:
+        await db.execute(insert(JobSecret), secrets)
+    db.info["jobs_enqueued"] = True
+
+
+async def load_job_secret(db: AsyncSession, job) -> dict:
+    """
+    The credentials a job runs with. Jobs queued by older versions still
+    carry them in their payload.
+    """
+    result = await db.execute(select(JobSecret.sensitive_data).where(JobSecret.job_id == job.id))
+    sensitive_data = result.scalars().first()
+    if sensitive_data is None:
+        sensitive_data = (job.payload or {}).get("sensitive_data")
+    return sensitive_data or {}
+
+
+async def drop_job_secrets(db: AsyncSession, job_ids) -> None:
+    """
+    Delete the credentials of jobs that will not run again, inside the
+    caller's transaction.
+    """
+    job_ids = list(job_ids)
+    for start in range(0, len(job_ids), RERUN_CHUNK_ROWS):
+        await db.execute(delete(JobSecret).where(JobSecret.job_id.in_(job_ids[start:start + RERUN_CHUNK_ROWS])))
+
+
+async def purge_job_secrets(db: AsyncSession) -> int:
+    """
+    Delete credentials left behind by jobs that can no longer run (e.g. a
+    process died between finishing a job and dropping its secret) and clear
+    the ones older versions left in finished jobs' payloads.
+    """
+    runnable = select(AgentJob.id).where(AgentJob.status.in_(("queued", "leased")))
+    result = await db.execute(delete(JobSecret).where(JobSecret.job_id.not_in(runnable)))
+    await db.execute(
+        update(AgentJob)
+        .where(AgentJob.status.not_in(("queued", "leased")),
+               func.json_type(AgentJob.payload, "$.sensitive_data").is_not(None))
+        .values(payload=func.json_remove(AgentJob.payload, "$.sensitive_data"))
+        .execution_options(synchronize_session=False)
+    )
+    await db.commit()
+    return result.rowcount
+
+
+@event.listens_for(Session, "after_commit")
+def _wake_dispatcher(session):
+    if session.info.pop("jobs_enqueued", False):
+        job_dispatcher.wake()
+
+
+@event.listens_for(Session, "after_rollback")
+def _forget_enqueued(session):
+    session.info.pop("jobs_enqueued", None)
+
+
+async def claim_jobs(db: AsyncSession, owner: str, limit: int) -> list:
+    """
+    Atomically lease up to limit queued jobs, spread across agents and
+    executions by plan_claims (weighted fair share with aging and per-tenant
+    caps), oldest first within each group. Jobs waiting out a retry backoff
+    are left alone until their available_at.
+    """
+    now = datetime.now()
+    priority = func.coalesce(AgentJob.priority, DEFAULT_PRIORITY)
+    claimable = (AgentJob.status == "queued", or_(AgentJob.available_at.is_(None), AgentJob.available_at <= now))
+    result = await db.execute(
+        select(AgentJob.agent_id, AgentJob.execution_id, priority, func.count(AgentJob.id), func.min(AgentJob.created_at))
+        .where(*claimable)
+        .group_by(AgentJob.agent_id, AgentJob.execution_id, priority)
+    )
+    groups = result.all()
+    if not groups:
+        return []
+    result = await db.execute(
+        select(AgentJob.agent_id, AgentJob.execution_id, func.count(AgentJob.id))
+        .where(AgentJob.status == "leased")
+        .group_by(AgentJob.agent_id, AgentJob.execution_id)
+    )
+    running_by_agent, running_by_execution = Counter(), Counter()
+    for agent_id, execution_id, count in result.all():
+        running_by_agent[agent_id] += count
+        running_by_execution[execution_id] += count
+
+    jobs = []
+    plan = plan_claims(groups, running_by_agent, running_by_execution, limit, now)
+    for (agent_id, execution_id, group_priority), count in plan.items():
+        candidates = (
+            select(AgentJob.id)
+            .where(*claimable, AgentJob.agent_id == agent_id,
+                   AgentJob.execution_id == execution_id, priority == group_priority)
+            .order_by(AgentJob.created_at)
+            .limit(count)
+            .scalar_subquery()
+        )
+        result = await db.execute(
+            update(AgentJob)
+            .where(AgentJob.id.in_(candidates), AgentJob.status == "queued")
+            .values(
+                status="leased",
+                lease_owner=owner,
+                lease_expires_at=now + timedelta(seconds=JOB_LEASE_SECONDS),
+                attempts=AgentJob.attempts + 1,
+                started_at=now,
+                updated_at=now
+            )
+            .returning(AgentJob.id, AgentJob.kind, AgentJob.execution_id, AgentJob.row_task_ids,
+                       AgentJob.payload, AgentJob.attempts, AgentJob.retries)
+            .execution_options(synchronize_session=False)
+        )
+        jobs.extend(result.all())
+    await db.commit()
+    return jobs
+
+
+async def tenant_stats(db: AsyncSession) -> dict:
+    """
+    Queue depth, running jobs and wait times per agent_id and execution_id.
+    Wait is measured from enqueue to (last) claim, over the past hour.
+    """
+    now = datetime.now()
+    tenants = {}
+
+    def _entry(agent_id, execution_id):
+        tenant = tenants.setdefault(agent_id, {
+            "queued": 0, "running": 0, "oldest_wait_seconds": 0.0, "avg_wait_seconds": None, "executions": {}
+        })
+        execution = tenant["executions"].setdefault(execution_id, {
+            "queued": 0, "running": 0, "oldest_wait_seconds": 0.0, "avg_wait_seconds": None
+        })
+        return tenant, execution
+
+    result = await db.execute(
+        select(AgentJob.agent_id, AgentJob.execution_id, AgentJob.status,
+               func.count(AgentJob.id), func.min(AgentJob.created_at))
+        .where(AgentJob.status.in_(("queued", "leased")))
+        .group_by(AgentJob.agent_id, AgentJob.execution_id, AgentJob.status)
+    )
+    for agent_id, execution_id, status, count, oldest in result.all():
+        tenant, execution = _entry(agent_id, execution_id)
+        field = "queued" if status == "queued" else "running"
+        tenant[field] += count
+        execution[field] += count
+        if status == "queued" and oldest:
+            waited = round((now - oldest).total_seconds(), 1)
+            execution["oldest_wait_seconds"] = waited
+            tenant["oldest_wait_seconds"] = max(tenant["oldest_wait_seconds"], waited)
+
+    wait_seconds = (func.julianday(AgentJob.started_at) - func.julianday(AgentJob.created_at)) * 86400
+    result = await db.execute(
+        select(AgentJob.agent_id, AgentJob.execution_id, func.avg(wait_seconds), func.count(AgentJob.id))
+        .where(AgentJob.started_at >= now - timedelta(hours=1))
+        .group_by(AgentJob.agent_id, AgentJob.execution_id)
+    )
+    totals = Counter()
+    for agent_id, execution_id, avg_wait, count in result.all():
+        tenant, execution = _entry(agent_id, execution_id)
+        execution["avg_wait_seconds"] = round(avg_wait, 2)
+        totals[(agent_id, "sum")] += avg_wait * count
+        totals[(agent_id, "count")] += count
+    for agent_id, tenant in tenants.items():
+        if totals[(agent_id, "count")]:
+            tenant["avg_wait_seconds"] = round(totals[(agent_id, "sum")] / totals[(agent_id, "count")], 2)
+    return {"tenant_max_concurrency": TENANT_MAX_CONCURRENCY, "tenants": tenants}
+
+
+async def extend_leases(db: AsyncSession, owner: str, job_ids) -> int:
+    if not job_ids:
+        return 0
+    result = await db.execute(
+        update(AgentJob)
+        .where(AgentJob.id.in_(list(job_ids)), AgentJob.lease_owner == owner, AgentJob.status == "leased")
+        .values(lease_expires_at=datetime.now() + timedelta(seconds=JOB_LEASE_SECONDS))
+        .execution_options(synchronize_session=False)
+    )
+    await db.commit()
+    return result.rowcount
+
+
+async def finish_job(db: AsyncSession, job, status: str):
+    """
+    Mark a job done/failed and drop its credentials.
+    """
+    payload = dict(job.payload or {})
+    payload.pop("sensitive_data", None)
+    await db.execute(
+        update(AgentJob)
+        .where(AgentJob.id == job.id)
+        .values(status=status, lease_owner=None, lease_expires_at=None, payload=payload)
+        .execution_options(synchronize_session=False)
+    )
+    await drop_job_secrets(db, [job.id])
+    await db.commit()
+
+
+async def retry_job(db: AsyncSession, job) -> bool:
+    """
+    Queue a job again after its runner handed failed rows back as Pending,
+    available once the retry policy's backoff has passed. Returns False when
+    no row is left to run (e.g. cancelled meanwhile).
+    """
+    if not await _unfinished_rows(db, job.row_task_ids or []):
+        return False
+    retries = (job.retries or 0) + 1
+    now = datetime.now()
+    await db.execute(
+        update(AgentJob)
+        .where(AgentJob.id == job.id)
+        .values(status="queued", attempts=0, retries=retries, lease_owner=None, lease_expires_at=None,
+                available_at=now + timedelta(seconds=retry_delay((job.payload or {}).get("retry"), retries)),
+                updated_at=now)
+        .execution_options(synchronize_session=False)
+    )
+    await db.commit()
+    return True
+
+
+async def rerun_failed_tasks(db: AsyncSession, execution_id: str, sensitive_data: dict, file_name: str = None) -> dict:
+    """
+    Queue the Failed and TimedOut rows of an execution (or one of its files)
+    again, reusing the row data stored in their jobs' payloads. Credentials
+    are dropped once a job finishes, so the caller supplies them again. A batch job runs only its rerun rows. Rows whose job is
+    still queued or running are skipped. Each rerun gets a fresh retry budget.
+    """
+    criteria = [TaskTracker.execution_id == execution_id, TaskTracker.status.in_(RERUNNABLE_TASK_STATUSES)]
+    if file_name is not None:
+        criteria.append(TaskTracker.file_name == file_name)
+    result = await db.execute(select(TaskTracker.row_task_id).where(*criteria))
+    failed = set(result.scalars().all())
+    if not failed:
+        return {"requeued": 0, "jobs_requeued": 0, "skipped": 0}
+
+    result = await db.execute(
+        select(AgentJob.id, AgentJob.row_task_ids)
+        .where(AgentJob.execution_id == execution_id, AgentJob.status.in_(("done", "failed", "cancelled")))
+    )
+    job_ids, rows = [], []
+    for job_id, row_task_ids in result.all():
+        job_rows = failed.intersection(row_task_ids or [])
+        if job_rows:
+            job_ids.append(job_id)
+            rows.extend(job_rows)
+
+    now = datetime.now()
+    requeued = 0
+    for start in range(0, len(rows), RERUN_CHUNK_ROWS):
+        requeued += await bulk_set_status(db, "Pending", TaskTracker.row_task_id.in_(rows[start:start + RERUN_CHUNK_ROWS]),
+                                          TaskTracker.status.in_(RERUNNABLE_TASK_STATUSES))
+    for start in range(0, len(job_ids), RERUN_CHUNK_ROWS):
+        await db.execute(
+            update(AgentJob)
+            .where(AgentJob.id.in_(job_ids[start:start + RERUN_CHUNK_ROWS]))
+            .values(status="queued", attempts=0, retries=0, available_at=None, lease_owner=None,
+                    lease_expires_at=None, created_at=now, updated_at=now)
+            .execution_options(synchronize_session=False)
+        )
+    if job_ids and sensitive_data:
+        await drop_job_secrets(db, job_ids)
+        await db.execute(insert(JobSecret), [
+            {"job_id": job_id, "sensitive_data": sensitive_data, "created_at": now} for job_id in job_ids
+        ])
+    db.info["jobs_enqueued"] = bool(job_ids)
+    await db.commit()
+    return {"requeued": requeued, "jobs_requeued": len(job_ids), "skipped": len(failed) - requeued}
+
+
+async def requeue_jobs(db: AsyncSession, *criteria, refund_attempt: bool = False) -> dict:
+    """
+    Return leased jobs matching criteria to the queue, putting their Running
+    tracker rows back to Pending. Jobs that already used JOB_MAX_ATTEMPTS
+    leases are failed instead, together with their unfinished rows.
+    """
+    result = await db.execute(
+        select(AgentJob.id, AgentJob.row_task_ids, AgentJob.attempts)
+        .where(AgentJob.status == "leased", *criteria)
+    )
+    requeued, failed = [], []
+    for job_id, row_task_ids, attempts in result.all():
+        attempts = attempts - 1 if refund_attempt else attempts
+        if attempts >= JOB_MAX_ATTEMPTS:
+            failed.append(job_id)
+            await bulk_set_status(db, "Failed", TaskTracker.row_task_id.in_(row_task_ids or []),
+                                  TaskTracker.status.not_in(TERMINAL_TASK_STATUSES))
+        else:
+            requeued.append(job_id)
+            await bulk_set_status(db, "Pending", TaskTracker.row_task_id.in_(row_task_ids or []),
+                                  TaskTracker.status == "Running")
+        await db.execute(
+            update(AgentJob)
+            .where(AgentJob.id == job_id, AgentJob.status == "leased")
+            .values(status="failed" if job_id in failed else "queued", attempts=attempts,
+                    lease_owner=None, lease_expires_at=None,
+                    payload=func.json_remove(AgentJob.payload, "$.sensitive_data") if job_id in failed
+                    else AgentJob.payload)
+            .execution_options(synchronize_session=False)
+        )
+    await drop_job_secrets(db, failed)
+    await db.commit()
+    if requeued:
+        job_dispatcher.wake()
+    return {"requeued": len(requeued), "failed": len(failed)}
+
+
+async def requeue_expired_leases(db: AsyncSession) -> dict:
+    """
+    Requeue jobs whose worker stopped heartbeating (crashed or was killed).
+    """
+    return await requeue_jobs(db, AgentJob.lease_expires_at < datetime.now())
+
+
+async def cancel_tasks(db: AsyncSession, execution_id: str, file_name: str = None, row_task_id: str = None) -> dict:
+    """
+    Mark an execution's unfinished tracker rows Cancelled, narrowed to one
+    file or one row, and cancel the queued jobs left with nothing to run.
+    Runners already working on those rows are stopped by the runner reaper of
+    whichever process holds them.
+    """
+    criteria = [TaskTracker.execution_id == execution_id, TaskTracker.status.in_(ACTIVE_TASK_STATUSES)]
+    if file_name is not None:
+        criteria.append(TaskTracker.file_name == file_name)
+    if row_task_id is not None:
+        criteria.append(TaskTracker.row_task_id == row_task_id)
+    cancelled = await bulk_set_status(db, "Cancelled", *criteria)
+
+    jobs_cancelled = 0
+    if cancelled:
+        result = await db.execute(
+            select(TaskTracker.row_task_id)
+            .where(TaskTracker.execution_id == execution_id, TaskTracker.status.in_(ACTIVE_TASK_STATUSES))
+        )
+        unfinished = set(result.scalars().all())
+        result = await db.execute(
+            select(AgentJob.id, AgentJob.row_task_ids)
+            .where(AgentJob.execution_id == execution_id, AgentJob.status == "queued")
+        )
+        job_ids = [job_id for job_id, row_task_ids in result.all() if unfinished.isdisjoint(row_task_ids or [])]
+        if job_ids:
+            result = await db.execute(
+                update(AgentJob)
+                .where(AgentJob.id.in_(job_ids), AgentJob.status == "queued")
+                .values(status="cancelled", updated_at=datetime.now(),
+                        payload=func.json_remove(AgentJob.payload, "$.sensitive_data"))
+                .execution_options(synchronize_session=False)
+            )
+            jobs_cancelled = result.rowcount
+            await drop_job_secrets(db, job_ids)
+    await db.commit()
+    return {"cancelled": cancelled, "jobs_cancelled": jobs_cancelled}
+
+
+async def _unfinished_rows(db: AsyncSession, row_task_ids: list) -> dict:
+    # {row_task_id: row it duplicates or None}
+    result = await db.execute(
+        select(TaskTracker.row_task_id, TaskTracker.duplicate_of).where(
+            TaskTracker.row_task_id.in_(row_task_ids),
+            TaskTracker.status.not_in(TERMINAL_TASK_STATUSES)
+        )
+    )
+    return dict(result.all())
+
+
+def _split_duplicates(remaining: dict) -> tuple:
+    # The rows a job still has to run, and the duplicates sharing each one's run
+    keep, duplicates = set(), {}
+    for row_task_id, duplicate_of in remaining.items():
+        keep.add(duplicate_of or row_task_id)
+        if duplicate_of:
+            duplicates.setdefault(duplicate_of, []).append(row_task_id)
+    return keep, duplicates
+
+
+def _trim_batch_payload(payload: dict, keep: set) -> dict:
+    # Drop finished records from a batch and renumber the rest
+    rows = [(row_task_id, record) for row_task_id, record
+            in zip(payload["row_task_ids"], payload["batch_task_data"]["records"]) if row_task_id in keep]
+    records = [{**record, "record_index": index} for index, (_, record) in enumerate(rows)]
+    return {
+        **payload,
+        "row_task_ids": [row_task_id for row_task_id, _ in rows],
+        "batch_task_data": {**payload["batch_task_data"], "records": records}
+    }
+
+
+class JobDispatcher:
+    """
+    Moves jobs from the agent_jobs table into agent_scheduler. It only claims as
+    many jobs as the scheduler has free slots, keeps their leases alive while
+    they run and requeues jobs whose owner stopped heartbeating, so a crash or
+    restart resumes the backlog without re-running finished rows.
+    """
+
+    def __init__(self, scheduler=agent_scheduler, owner: str = None):
+        self.scheduler = scheduler
+        self._owner = owner
+        self.owner = None
+        self.held = set()
+        self._running = {}
+        self.draining = False
+        self._wakeup = None
+        self._tasks = []
+        self.claimed = 0
+        self.finished = 0
+        self.retried = 0
+        self.skipped = 0
+        self.recovered = {"requeued": 0, "failed": 0}
+
+    async def start(self):
+        # Named at start, not import, so forked worker processes differ
+        self.owner = self._owner or f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+        self.draining = False
+        self._wakeup = asyncio.Event()
+        async with AsyncSessionLocal() as db:
+            recovered = await requeue_expired_leases(db)
+            await purge_job_secrets(db)
+        self._count_recovered(recovered)
+        self._tasks = [
+            asyncio.create_task(self._claim_loop()),
+            asyncio.create_task(self._heartbeat_loop())
+        ]
+
+    def wake(self):
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    def _count_recovered(self, recovered: dict):
+        for key, value in recovered.items():
+            self.recovered[key] += value
+        if any(recovered.values()):
+            print(f"Job queue recovery: {recovered}")
+
+    async def _claim_loop(self):
+        while not self.draining:
+            room = self.scheduler.free_slots()
+            if room > 0:
+                try:
+                    async with AsyncSessionLocal() as db:
+                        jobs = await claim_jobs(db, self.owner, room)
+                except Exception as e:
+                    print(f"Job claim failed: {e}")
+                    jobs = []
+                for job in jobs:
+                    self.held.add(job.id)
+                    self.claimed += 1
+                    self.scheduler.submit(job.id, self._run, job)
+                if jobs:
+                    continue
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), JOB_POLL_SECONDS)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+
+    async def _heartbeat_loop(self):
+        while True:
+            await asyncio.sleep(JOB_HEARTBEAT_SECONDS)
+            try:
+                async with AsyncSessionLocal() as db:
+                    await extend_leases(db, self.owner, self.held)
+                    self._count_recovered(await requeue_expired_leases(db))
+            except Exception as e:
+                print(f"Job heartbeat failed: {e}")
+
+    async def _run(self, job):
+        if job.id not in self.held:
+            # Handed back by stop() while it waited for a scheduler slot
+            return
+        status = "done"
+        retrying = False
+        self._running[job.id] = asyncio.current_task()
+        # Counts the automatic retries of this run only; lease attempts are separate
+        attempt = (job.retries or 0) + 1
+        try:
+            async with AsyncSessionLocal() as db:
+                remaining = await _unfinished_rows(db, job.row_task_ids or [])
+                payload = {**(job.payload or {}), "sensitive_data": await load_job_secret(db, job) if remaining else {}}
+            keep, duplicates = _split_duplicates(remaining)
+            if not remaining:
+                # Finished before a crash took the lease with it
+                self.skipped += 1
+            elif job.kind == "batch":
+                retrying = await start_batch_agent_instance(**_trim_batch_payload(payload, keep),
+                                                            attempt=attempt, job_id=job.id, duplicates=duplicates)
+            else:
+                retrying = await start_agent_instance(**payload, attempt=attempt, job_id=job.id,
+                                                      duplicates=duplicates)
+        except asyncio.CancelledError:
+            # Shutting down: stop() or lease expiry hands the job back
+            self.held.discard(job.id)
+            self._running.pop(job.id, None)
+            raise
+        except Exception as e:
+            print(f"Job {job.id} failed: {e}")
+            status = "failed"
+
+        try:
+            async with AsyncSessionLocal() as db:
+                if retrying and await retry_job(db, job):
+                    self.retried += 1
+                else:
+                    await finish_job(db, job, status)
+        finally:
+            self.held.discard(job.id)
+            self._running.pop(job.id, None)
+            self.finished += 1
+            self.wake()
+
+    async def drain(self, timeout: float):
+        """
+        Stop claiming new jobs and wait up to timeout seconds for the ones
+        already claimed to finish.
+        """
+        self.draining = True
+        self.wake()
+        deadline = asyncio.get_running_loop().time() + timeout
+        while self.held and asyncio.get_running_loop().time() < deadline:
+            await asyncio.sleep(0.5)
+        return not self.held
+
+    async def stop(self):
+        """
+        Stop claiming, cancel the runs still in progress (their runners kill
+        their browsers on the way out) and hand every job this process still
+        holds back to the queue, without charging it an attempt.
+        """
+        self.draining = True
+        held = list(self.held)
+        for task in self._tasks:
+            task.cancel()
+        self._tasks = []
+        running = list(self._running.values())
+        for task in running:
+            task.cancel()
+        if running:
+            await asyncio.wait(running, timeout=JOB_STOP_GRACE_SECONDS)
+        # Their last tracker writes must land before the rows are requeued
+        await tracker_writer.flush()
+        if held:
+            async with AsyncSessionLocal() as db:
+                await requeue_jobs(db, AgentJob.id.in_(held), AgentJob.lease_owner == self.owner,
+                                   refund_attempt=True)
+            self.held.clear()
+
+    async def stats(self) -> dict:
+        async with AsyncSessionLocal() as db:
+            result = await db.execute(
+                select(AgentJob.status, func.count(AgentJob.id)).group_by(AgentJob.status)
+            )
+            by_status = dict(result.all())
+            result = await db.execute(
+                select(AgentJob.lease_owner, func.count(AgentJob.id))
+                .where(AgentJob.status == "leased")
+                .group_by(AgentJob.lease_owner)
+            )
+            leases = dict(result.all())
+        return {
+            "owner": self.owner,
+            "held": len(self.held),
+            "claimed": self.claimed,
+            "finished": self.finished,
+            "retried": self.retried,
+            "skipped_finished": self.skipped,
+            "recovered": self.recovered,
+            "jobs": by_status,
+            "leases_by_owner": leases
+        }
+
+
+job_dispatcher = JobDispatcher()
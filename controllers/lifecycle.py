@@ -0,0 +1,47 @@
+import os
+from contextlib import asynccontextmanager
+from fastapi import FastAPI
+
+from controllers.controller import browser_pool
+from controllers.browser_watchdog import browser_watchdog
+from controllers.llm_client import llm_registry
+from controllers.job_queue import job_dispatcher
+from controllers.tracker_writer import tracker_writer
+from controllers.reaper import runner_reaper
+from controllers.event_log import event_log_tailer
+from controllers.task import fail_stale_uploads
+from database.connector import async_engine, AsyncSessionLocal
+
+# Set to 0 when agents run only in separate worker processes (python
+# worker.py); the API then only enqueues jobs. Either way it follows worker
+# progress through event_log.
+JOB_DISPATCH_IN_API = os.getenv("JOB_DISPATCH_IN_API", "1") == "1"
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Application startup/shutdown hooks shared by app.py and app_linux.py.
+    """
+    # Uploads are ingested by the API, so a restart may have cut one short
+    async with AsyncSessionLocal() as db:
+        await fail_stale_uploads(db)
+    # Always tailed, as workers may run next to an API that dispatches too:
+    # their commits reach the status counters (and ETags) only through
+    # event_log. The API's own commits are never written there.
+    await event_log_tailer.start()
+    if JOB_DISPATCH_IN_API:
+        await browser_pool.warm_up()
+        await browser_watchdog.start()
+        await job_dispatcher.start()
+        await runner_reaper.start()
+    yield
+    if JOB_DISPATCH_IN_API:
+        await runner_reaper.stop()
+        await job_dispatcher.stop()
+        await tracker_writer.close()
+    await event_log_tailer.stop()
+    await browser_watchdog.stop()
+    await browser_pool.close()
+    await llm_registry.close()
+    await async_engine.dispose()
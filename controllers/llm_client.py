@@ -0,0 +1,200 @@
+import asyncio
+import json
+import os
+import time
+from collections import deque
+
+import httpx
+from langchain_openai import ChatOpenAI
+
+LLM_REQUESTS_PER_MINUTE = float(os.getenv("LLM_REQUESTS_PER_MINUTE", "500"))
+LLM_TOKENS_PER_MINUTE = float(os.getenv("LLM_TOKENS_PER_MINUTE", "300000"))
+LLM_MAX_CONNECTIONS = int(os.getenv("LLM_MAX_CONNECTIONS", "50"))
+LLM_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("LLM_MAX_KEEPALIVE_CONNECTIONS", "20"))
+LLM_REQUEST_TIMEOUT_SECONDS = float(os.getenv("LLM_REQUEST_TIMEOUT_SECONDS", "120"))
+# Tokens assumed for the completion when the request does not set max_tokens
+LLM_DEFAULT_COMPLETION_TOKENS = int(os.getenv("LLM_DEFAULT_COMPLETION_TOKENS", "1024"))
+
+
+class TokenBucket:
+    """
+    Token bucket refilled continuously at capacity per minute.
+    """
+
+    def __init__(self, per_minute: float):
+        self.capacity = max(1.0, per_minute)
+        self.rate = self.capacity / 60.0
+        self.tokens = self.capacity
+        self.updated_at = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+    def time_until(self, amount: float) -> float:
+        self._refill()
+        # A single request larger than the bucket only has to wait for a full bucket
+        amount = min(amount, self.capacity)
+        if self.tokens >= amount:
+            return 0.0
+        return (amount - self.tokens) / self.rate
+
+    def take(self, amount: float):
+        self._refill()
+        self.tokens -= min(amount, self.capacity)
+
+
+class LLMRateLimiter:
+    """
+    Process-wide RPM/TPM limiter. Callers queue on a FIFO lock, so concurrent
+    runners are served in arrival order and none can starve the others. A 429
+    from the API pauses the whole queue for the advertised retry-after.
+    """
+
+    def __init__(self, requests_per_minute: float = LLM_REQUESTS_PER_MINUTE,
+                 tokens_per_minute: float = LLM_TOKENS_PER_MINUTE):
+        self.requests = TokenBucket(requests_per_minute)
+        self.tokens = TokenBucket(tokens_per_minute)
+        self.paused_until = 0.0
+        self._lock = None
+        self._waits = deque(maxlen=500)
+        self.calls = 0
+        self.rate_limited_responses = 0
+        self.total_wait = 0.0
+
+    async def acquire(self, estimated_tokens: int) -> float:
+        """
+        Wait for one request slot and estimated_tokens of TPM budget.
+        Returns the time spent queued, in seconds.
+        """
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        started = time.monotonic()
+        async with self._lock:
+            while True:
+                delay = max(
+                    self.paused_until - time.monotonic(),
+                    self.requests.time_until(1),
+                    self.tokens.time_until(estimated_tokens)
+                )
+                if delay <= 0:
+                    break
+                await asyncio.sleep(delay)
+            self.requests.take(1)
+            self.tokens.take(estimated_tokens)
+        waited = time.monotonic() - started
+        self.calls += 1
+        self.total_wait += waited
+        self._waits.append(waited)
+        return waited
+
+    def pause(self, seconds: float):
+        self.rate_limited_responses += 1
+        self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+
+    def stats(self) -> dict:
+        waits = list(self._waits)
+        return {
+            "requests_per_minute": self.requests.capacity,
+            "tokens_per_minute": self.tokens.capacity,
+            "calls": self.calls,
+            "rate_limited_responses": self.rate_limited_responses,
+            "paused_for": round(max(0.0, self.paused_until - time.monotonic()), 3),
+            "avg_queue_wait": round(self.total_wait / self.calls, 4) if self.calls else 0.0,
+            "max_queue_wait": round(max(waits), 4) if waits else 0.0,
+            "last_queue_wait": round(waits[-1], 4) if waits else 0.0
+        }
+
+
+def estimate_request_tokens(body: bytes) -> int:
+    """
+    Rough token estimate for an OpenAI chat request: ~4 bytes of prompt per token
+    plus the requested completion budget. Image parts are counted by their
+    encoded size, which overestimates and keeps the limiter on the safe side.
+    """
+    completion_tokens = LLM_DEFAULT_COMPLETION_TOKENS
+    try:
+        payload = json.loads(body)
+        completion_tokens = int(
+            payload.get("max_completion_tokens") or payload.get("max_tokens") or completion_tokens
+        )
+    except (ValueError, TypeError, AttributeError):
+        pass
+    return len(body) // 4 + completion_tokens
+
+
+class RateLimitedTransport(httpx.AsyncBaseTransport):
+    """
+    httpx transport that gates every request through the shared limiter before
+    handing it to a pooled connection transport.
+    """
+
+    def __init__(self, limiter: LLMRateLimiter, transport: httpx.AsyncBaseTransport):
+        self.limiter = limiter
+        self.transport = transport
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        await request.aread()
+        waited = await self.limiter.acquire(estimate_request_tokens(request.content))
+        response = await self.transport.handle_async_request(request)
+        response.extensions = {**response.extensions, "queue_wait": waited}
+        if response.status_code == 429:
+            try:
+                retry_after = float(response.headers.get("retry-after", "1"))
+            except ValueError:
+                retry_after = 1.0
+            self.limiter.pause(retry_after)
+        return response
+
+    async def aclose(self):
+        await self.transport.aclose()
+
+
+class LLMClientRegistry:
+    """
+    Process-wide registry of ChatOpenAI clients. Clients with the same settings
+    are shared by every runner, and all of them send through one pooled
+    httpx.AsyncClient behind the RPM/TPM limiter. Point OPENAI_BASE_URL at a
+    local OpenAI-compatible stub to exercise it without the real API.
+    """
+
+    def __init__(self, limiter: LLMRateLimiter = None):
+        self.limiter = limiter or LLMRateLimiter()
+        self._http_client = None
+        self._clients = {}
+
+    @property
+    def http_client(self) -> httpx.AsyncClient:
+        if self._http_client is None or self._http_client.is_closed:
+            transport = httpx.AsyncHTTPTransport(
+                limits=httpx.Limits(
+                    max_connections=LLM_MAX_CONNECTIONS,
+                    max_keepalive_connections=LLM_MAX_KEEPALIVE_CONNECTIONS
+                )
+            )
+            self._http_client = httpx.AsyncClient(
+                transport=RateLimitedTransport(self.limiter, transport),
+                timeout=LLM_REQUEST_TIMEOUT_SECONDS
+            )
+        return self._http_client
+
+    def get(self, model: str, **kwargs) -> ChatOpenAI:
+        key = (model, tuple(sorted(kwargs.items())))
+        client = self._clients.get(key)
+        if client is None:
+            client = ChatOpenAI(model=model, http_async_client=self.http_client, **kwargs)
+            self._clients[key] = client
+        return client
+
+    async def close(self):
+        self._clients.clear()
+        if self._http_client is not None:
+            await self._http_client.aclose()
+            self._http_client = None
+
+    def stats(self) -> dict:
+        return {"clients": len(self._clients), **self.limiter.stats()}
+
+
+llm_registry = LLMClientRegistry()
@@ -0,0 +1,79 @@
+import hashlib
+import os
+import time
+
+LOGIN_STATE_TTL_SECONDS = float(os.getenv("LOGIN_STATE_TTL_SECONDS", "3600"))
+
+LOGIN_STATE_HINT = (
+    "The browser was restored with a saved signed-in session for this site. "
+    "If the app is already signed in, skip the login steps. "
+    "If a login page appears, sign in normally with the provided credentials."
+)
+
+
+class LoginStateStore:
+    """
+    Browser storage state (cookies + local storage) captured after a successful
+    run, keyed by execution, target URL and a hash of the credentials, so later
+    rows of the same execution can start already signed in.
+    """
+
+    def __init__(self, ttl: float = LOGIN_STATE_TTL_SECONDS):
+        self.ttl = ttl
+        self._states = {}
+
+    @staticmethod
+    def key(execution_id: str, url: str, sensitive_data: dict) -> str:
+        credentials = "\x00".join(f"{k}={v}" for k, v in sorted((sensitive_data or {}).items()))
+        credentials_hash = hashlib.sha256(credentials.encode("utf-8")).hexdigest()
+        return f"{execution_id}|{url}|{credentials_hash}"
+
+    def get(self, key: str):
+        entry = self._states.get(key)
+        if entry is None:
+            return None
+        if time.time() - entry["captured_at"] > self.ttl:
+            del self._states[key]
+            return None
+        return entry["storage_state"]
+
+    def invalidate(self, key: str):
+        self._states.pop(key, None)
+
+    def discard_execution(self, execution_id: str):
+        for key in [k for k in self._states if k.startswith(f"{execution_id}|")]:
+            del self._states[key]
+
+    async def capture(self, key: str, browser_session):
+        """
+        Save the session's current storage state under key.
+        """
+        storage_state = await browser_session.browser_context.storage_state()
+        if storage_state.get("cookies") or storage_state.get("origins"):
+            self._states[key] = {"storage_state": storage_state, "captured_at": time.time()}
+
+    async def apply(self, browser_session, storage_state: dict):
+        """
+        Load a saved storage state into a (freshly reset) browser session.
+        """
+        context = browser_session.browser_context
+        if storage_state.get("cookies"):
+            await context.add_cookies(storage_state["cookies"])
+        origins = storage_state.get("origins") or []
+        if origins:
+            page = await browser_session.get_current_page()
+            for origin in origins:
+                items = origin.get("localStorage") or []
+                if not items:
+                    continue
+                await page.goto(origin["origin"])
+                await page.evaluate(
+                    "(items) => { for (const item of items) localStorage.setItem(item.name, item.value); }",
+                    items
+                )
+
+    def stats(self) -> dict:
+        return {"saved_sessions": len(self._states), "ttl_seconds": self.ttl}
+
+
+login_state_store = LoginStateStore()
@@ -0,0 +1,97 @@
+import asyncio
+import os
+import time
+
+from sqlalchemy import select
+
+from database.connector import AsyncSessionLocal
+from schema.TaskTracker import TaskTracker
+from controllers.controller import global_active_runners
+from controllers.status import ACTIVE_TASK_STATUSES
+
+# A runner with no agent step for this long is stopped and its rows marked TimedOut
+AGENT_STALL_SECONDS = float(os.getenv("AGENT_STALL_SECONDS", "300"))
+REAPER_INTERVAL_SECONDS = float(os.getenv("REAPER_INTERVAL_SECONDS", "10"))
+
+
+class RunnerReaper:
+    """
+    Watches the runners of this process. Stops runners that stopped making
+    progress, and runners whose rows were cancelled through the API, which
+    may live in another process than the one running them.
+    """
+
+    def __init__(self, stall_seconds: float = AGENT_STALL_SECONDS, interval: float = REAPER_INTERVAL_SECONDS):
+        self.stall_seconds = stall_seconds
+        self.interval = interval
+        self._task = None
+        self.stalled = 0
+        self.cancelled = 0
+
+    async def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._loop())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    async def _loop(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.sweep()
+            except Exception as e:
+                print(f"Runner reaper sweep failed: {e}")
+
+    async def sweep(self) -> dict:
+        """
+        Check every active runner once. Returns how many were stopped.
+        """
+        runners = [runner for runner in list(global_active_runners.values())
+                   if not runner.done and runner.stop_status is None]
+        stalled = cancelled = 0
+
+        now = time.monotonic()
+        for runner in runners:
+            idle = now - runner.last_progress_at
+            if self.stall_seconds and idle > self.stall_seconds:
+                if runner.stop("TimedOut", f"No progress for {idle:.0f}s"):
+                    stalled += 1
+
+        runners = [runner for runner in runners if runner.stop_status is None]
+        row_task_ids = {row_task_id for runner in runners for row_task_id in runner.all_row_task_ids}
+        if row_task_ids:
+            async with AsyncSessionLocal() as db:
+                result = await db.execute(
+                    select(TaskTracker.row_task_id, TaskTracker.status)
+                    .where(TaskTracker.row_task_id.in_(row_task_ids))
+                )
+                statuses = dict(result.all())
+            for runner in runners:
+                row_statuses = {statuses.get(row_task_id) for row_task_id in runner.all_row_task_ids}
+                # Only once no row is left to work on, so a batch keeps going
+                # when just some of its rows were cancelled
+                if row_statuses.isdisjoint(ACTIVE_TASK_STATUSES) and "Cancelled" in row_statuses:
+                    if runner.stop("Cancelled", "Cancelled by request"):
+                        cancelled += 1
+
+        self.stalled += stalled
+        self.cancelled += cancelled
+        return {"stalled": stalled, "cancelled": cancelled}
+
+    def stats(self) -> dict:
+        now = time.monotonic()
+        return {
+            "stall_seconds": self.stall_seconds,
+            "interval_seconds": self.interval,
+            "active_runners": len(global_active_runners),
+            "longest_idle_seconds": round(max((now - runner.last_progress_at
+                                               for runner in list(global_active_runners.values())), default=0.0), 1),
+            "stalled": self.stalled,
+            "cancelled": self.cancelled
+        }
+
+
+runner_reaper = RunnerReaper()
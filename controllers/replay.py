@@ -0,0 +1,161 @@
+import copy
+import os
+import re
+import time
+
+from sqlalchemy import delete
+
+from database.connector import AsyncSessionLocal
+from schema.ActionScript import ActionScript
+
+REPLAY_ENABLED = os.getenv("REPLAY_ENABLED", "true").lower() in ("1", "true", "yes")
+REPLAY_ACTION_DELAY_SECONDS = float(os.getenv("REPLAY_ACTION_DELAY_SECONDS", "0.5"))
+# Consecutive failed replays after which a script is dropped and re-recorded;
+# a single failure is often a slow page or a bad row, not a changed app
+REPLAY_MAX_FAILURES = int(os.getenv("REPLAY_MAX_FAILURES", "3"))
+# How long a cached script (or the lack of one) is trusted before
+# action_scripts is read again, so scripts recorded or dropped by other
+# worker processes are picked up
+REPLAY_CACHE_TTL_SECONDS = float(os.getenv("REPLAY_CACHE_TTL_SECONDS", "60"))
+
+_PLACEHOLDER = re.compile(r"\{\{row\.([^{}]+)\}\}")
+
+
+def _row_values(user_info) -> dict:
+    """
+    Column -> string value of the current row (the last entry of user_info).
+    """
+    if not user_info:
+        return {}
+    row = user_info[-1] if isinstance(user_info, list) else user_info
+    values = {}
+    for column, value in (row or {}).items():
+        if value is None:
+            continue
+        text = str(value).strip()
+        if text and text.lower() != "nan":
+            values[str(column)] = text
+    return values
+
+
+def _map_strings(node, fn):
+    if isinstance(node, str):
+        return fn(node)
+    if isinstance(node, list):
+        return [_map_strings(item, fn) for item in node]
+    if isinstance(node, dict):
+        return {key: _map_strings(value, fn) for key, value in node.items()}
+    return node
+
+
+def parameterise_history(history: dict, user_info) -> dict:
+    """
+    Replace recorded action parameters equal to one of the current row's values
+    with {{row.<column>}} placeholders so the script can be replayed for other rows.
+    """
+    # Only whole parameter values are matched: short cells like "10", "No"
+    # or "US" also occur inside URLs, selectors and other typed text
+    placeholders = {}
+    for column, value in _row_values(user_info).items():
+        placeholders.setdefault(value, "{{row." + column + "}}")
+
+    def substitute(text: str) -> str:
+        return placeholders.get(text.strip(), text)
+
+    script = copy.deepcopy(history)
+    for item in script.get("history", []):
+        model_output = item.get("model_output")
+        if model_output and model_output.get("action"):
+            model_output["action"] = _map_strings(model_output["action"], substitute)
+    return script
+
+
+def fill_history(script: dict, user_info) -> dict:
+    """
+    Substitute {{row.<column>}} placeholders with the values of the given row.
+    Raises KeyError when the row lacks a column the script needs.
+    """
+    values = _row_values(user_info)
+
+    def substitute(text: str) -> str:
+        return _PLACEHOLDER.sub(lambda match: values[match.group(1)], text)
+
+    return _map_strings(copy.deepcopy(script), substitute)
+
+
+class ReplayStore:
+    """
+    Parameterised action scripts keyed by task template ({app_type}_{operation}),
+    persisted in action_scripts and cached in memory, plus per-operation counters
+    of replays versus LLM runs. Cache entries, including misses, expire after
+    REPLAY_CACHE_TTL_SECONDS. A script is only invalidated after
+    REPLAY_MAX_FAILURES failed replays in a row (counted per process).
+    """
+
+    def __init__(self, ttl: float = REPLAY_CACHE_TTL_SECONDS):
+        self.ttl = ttl
+        self._scripts = {}
+        self._stats = {}
+        self._failures = {}
+
+    def _cache(self, template_id: str, script):
+        self._scripts[template_id] = (script, time.monotonic())
+
+    async def get(self, template_id: str):
+        entry = self._scripts.get(template_id)
+        if entry is not None and time.monotonic() - entry[1] <= self.ttl:
+            return entry[0]
+        async with AsyncSessionLocal() as db:
+            record = await db.get(ActionScript, template_id)
+            script = record.history if record else None
+        self._cache(template_id, script)
+        return script
+
+    async def save(self, template_id: str, history: dict, user_info, recorded_from: str = None):
+        script = parameterise_history(history, user_info)
+        async with AsyncSessionLocal() as db:
+            record = await db.get(ActionScript, template_id)
+            if record is None:
+                record = ActionScript(template_id=template_id)
+                db.add(record)
+            record.history = script
+            record.step_count = len(script.get("history", []))
+            record.recorded_from = recorded_from
+            await db.commit()
+        self._cache(template_id, script)
+        self._failures.pop(template_id, None)
+        print(f"Recorded action script for {template_id} ({len(script.get('history', []))} steps)")
+
+    def record_success(self, template_id: str):
+        self._failures.pop(template_id, None)
+
+    async def record_failure(self, template_id: str) -> bool:
+        """
+        Count a failed replay; returns True when it invalidated the script.
+        """
+        failures = self._failures.get(template_id, 0) + 1
+        if failures < REPLAY_MAX_FAILURES:
+            self._failures[template_id] = failures
+            return False
+        await self.invalidate(template_id)
+        return True
+
+    async def invalidate(self, template_id: str):
+        self._cache(template_id, None)
+        self._failures.pop(template_id, None)
+        async with AsyncSessionLocal() as db:
+            await db.execute(delete(ActionScript).where(ActionScript.template_id == template_id))
+            await db.commit()
+
+    def count(self, template_id: str, outcome: str):
+        """
+        outcome is one of: replayed, llm_fallback, llm_run, recorded.
+        """
+        stats = self._stats.setdefault(template_id, {"replayed": 0, "llm_fallback": 0, "llm_run": 0, "recorded": 0})
+        stats[outcome] += 1
+
+    def stats(self) -> dict:
+        return {template_id: dict(counts) for template_id, counts in self._stats.items()}
+
+
+replay_store = ReplayStore()
@@ -0,0 +1,135 @@
+import json
+import os
+import zlib
+from typing import Optional
+
+from sqlalchemy import select, func
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from database.connector import AsyncSessionLocal
+from schema.TaskTracker import TaskTracker
+from schema.TaskResult import TaskResult
+
+# zlib level for result details; model thoughts compress well
+RESULT_COMPRESSION_LEVEL = int(os.getenv("RESULT_COMPRESSION_LEVEL", "6"))
+# Rows fetched per round trip from the server-side cursor when streaming
+RESULT_STREAM_BATCH_ROWS = int(os.getenv("RESULT_STREAM_BATCH_ROWS", "200"))
+
+DETAIL_FIELDS = ("urls", "errors", "model_thoughts")
+
+
+def _jsonable(value):
+    # Model thoughts and action results are pydantic models
+    if hasattr(value, "model_dump"):
+        return value.model_dump(mode="json")
+    return str(value)
+
+
+def pack_result(execution_id: str, job_id: str, result: dict = None, error=None) -> dict:
+    """
+    task_results columns for a run's result (as returned by _run_agent_logic)
+    or its error. urls, errors and model_thoughts go into one compressed
+    details blob, left NULL when all are empty. CPU-bound for long runs, so
+    runners call it through asyncio.to_thread.
+    """
+    result = result if isinstance(result, dict) else {}
+    errors = [str(e) for e in result.get("errors") or [] if e]
+    record = {
+        "execution_id": execution_id,
+        "job_id": job_id,
+        "done": bool(result.get("done", False)),
+        "replayed": bool(result.get("replayed", False)),
+        "final_result": None if result.get("final_result") is None else str(result["final_result"]),
+        "error": str(error) if error else (errors[-1] if errors else None),
+        "details": None,
+        "details_size": None
+    }
+    details = {"urls": result.get("urls") or [], "errors": errors, "model_thoughts": result.get("model_thoughts") or []}
+    if any(details.values()):
+        raw = json.dumps(details, default=_jsonable).encode("utf-8")
+        record["details"] = zlib.compress(raw, RESULT_COMPRESSION_LEVEL)
+        record["details_size"] = len(raw)
+    return record
+
+
+def unpack_details(blob: Optional[bytes]) -> dict:
+    if not blob:
+        return {name: [] for name in DETAIL_FIELDS}
+    return json.loads(zlib.decompress(blob))
+
+
+def _result_dict(row, details: bool) -> dict:
+    item = {
+        "row_task_id": row.row_task_id,
+        "status": row.status,
+        "result_of": row.result_of,
+        "done": row.done,
+        "replayed": row.replayed,
+        "final_result": row.final_result,
+        "error": row.error
+    }
+    if details:
+        item.update(unpack_details(row.details))
+    return item
+
+
+def result_query(execution_id: str, details: bool = False, file_name: str = None, cursor: int = None):
+    """
+    Keyset query over the results of one execution's tasks, ordered by
+    tracker id. Duplicate rows get the result of the row whose run they
+    shared (result_of). The details blob is only selected when asked for.
+    """
+    source = func.coalesce(TaskTracker.duplicate_of, TaskTracker.row_task_id)
+    columns = [
+        TaskTracker.id, TaskTracker.row_task_id, TaskTracker.status, source.label("result_of"),
+        TaskResult.done, TaskResult.replayed, TaskResult.final_result, TaskResult.error
+    ]
+    if details:
+        columns.append(TaskResult.details)
+    query = (
+        select(*columns)
+        .join(TaskResult, TaskResult.row_task_id == source)
+        .where(TaskTracker.execution_id == execution_id)
+    )
+    if file_name is not None:
+        query = query.where(TaskTracker.file_name == file_name)
+    if cursor is not None:
+        query = query.where(TaskTracker.id > cursor)
+    return query.order_by(TaskTracker.id)
+
+
+async def get_task_result(db: AsyncSession, execution_id: str, row_task_id: str,
+                          details: bool = True) -> Optional[dict]:
+    """
+    The latest result of one task, or None when it has none yet. A batch
+    row's own result is its report; with details it also gets the batch
+    run's transcript.
+    """
+    result = await db.execute(
+        result_query(execution_id, details).where(TaskTracker.row_task_id == row_task_id)
+    )
+    row = result.first()
+    if row is None:
+        return None
+    item = _result_dict(row, details)
+    if details and row.details is None:
+        result = await db.execute(
+            select(TaskResult.details)
+            .where(TaskResult.row_task_id == select(TaskResult.job_id)
+                   .where(TaskResult.row_task_id == row.result_of).scalar_subquery())
+        )
+        item.update(unpack_details(result.scalars().first()))
+    return item
+
+
+async def stream_results_ndjson(execution_id: str, details: bool = False, **filters):
+    """
+    Yield an execution's task results as NDJSON lines straight from a
+    server-side cursor. Uses its own session, since the response outlives
+    the request handler.
+    """
+    async with AsyncSessionLocal() as db:
+        query = result_query(execution_id, details, **filters).execution_options(yield_per=RESULT_STREAM_BATCH_ROWS)
+        result = await db.stream(query)
+        async for rows in result.partitions():
+            yield "".join(json.dumps(_result_dict(row, details)) + "\n" for row in rows)
@@ -0,0 +1,90 @@
+import asyncio
+import os
+import random
+
+# Failure classes a row can end with; a Tasks row (or AGENT_RETRY_ON) picks
+# the retryable ones. "incomplete" is not retried unless listed, since an
+# agent that gave up or reported the record failed usually does so again.
+#   timeout     a request timed out (LLM call, page load)
+#   llm         other LLM provider errors (rate limits, connection, 5xx)
+#   browser     the browser or page failed (crashed target, CDP errors)
+#   incomplete  the agent finished without completing the task
+#   deadline    the run hit its deadline or stopped making progress
+#   error       anything else
+FAILURE_CLASSES = ("timeout", "llm", "browser", "incomplete", "deadline", "error")
+
+# Defaults for operations whose Tasks row leaves the retry columns NULL.
+# Max attempts counts the first run, so the default of 1 disables retries:
+# each retry costs another agent run, so operations opt in through their
+# Tasks row (retry_max_attempts) or the deployment through the env.
+AGENT_RETRY_MAX_ATTEMPTS = int(os.getenv("AGENT_RETRY_MAX_ATTEMPTS", "1"))
+AGENT_RETRY_BACKOFF_SECONDS = float(os.getenv("AGENT_RETRY_BACKOFF_SECONDS", "30"))
+AGENT_RETRY_MAX_BACKOFF_SECONDS = float(os.getenv("AGENT_RETRY_MAX_BACKOFF_SECONDS", "900"))
+AGENT_RETRY_ON = tuple(
+    name.strip() for name in os.getenv("AGENT_RETRY_ON", "timeout,llm,browser").split(",") if name.strip()
+)
+
+_LLM_MODULES = ("openai", "anthropic", "httpx", "httpcore", "langchain", "google")
+_BROWSER_MODULES = ("playwright", "patchright", "cdp_use", "browser_use", "bubus")
+
+
+def retry_policy(template) -> dict:
+    """
+    The retry policy of a task template (a Tasks row), with the AGENT_RETRY_*
+    defaults for the columns it leaves NULL. Stored in job payloads, so a
+    queued job keeps the policy it was created with.
+    """
+    def _value(name, default):
+        value = getattr(template, name, None) if template is not None else None
+        return default if value is None else value
+
+    return {
+        "max_attempts": max(1, int(_value("retry_max_attempts", AGENT_RETRY_MAX_ATTEMPTS))),
+        "backoff_seconds": float(_value("retry_backoff_seconds", AGENT_RETRY_BACKOFF_SECONDS)),
+        "max_backoff_seconds": AGENT_RETRY_MAX_BACKOFF_SECONDS,
+        "retry_on": list(_value("retry_on", AGENT_RETRY_ON))
+    }
+
+
+def classify_failure(error: BaseException = None, stop_status: str = None) -> str:
+    """
+    Failure class of a run that raised error, was stopped with stop_status,
+    or (with neither) returned without completing its task.
+    """
+    if stop_status == "TimedOut":
+        return "deadline"
+    if error is None:
+        return "incomplete"
+    if isinstance(error, (TimeoutError, asyncio.TimeoutError)):
+        return "timeout"
+    for error_type in type(error).__mro__:
+        if "Timeout" in error_type.__name__:
+            return "timeout"
+    for error_type in type(error).__mro__:
+        module = error_type.__module__ or ""
+        if module.startswith(_LLM_MODULES):
+            return "llm"
+        if module.startswith(_BROWSER_MODULES):
+            return "browser"
+    return "error"
+
+
+def should_retry(policy: dict, attempt: int, failure_class: str) -> bool:
+    """
+    Whether a row failing its attempt-th run (1-based) with failure_class
+    gets another run.
+    """
+    if not policy:
+        return False
+    return attempt < policy.get("max_attempts", 1) and failure_class in policy.get("retry_on", ())
+
+
+def retry_delay(policy: dict, attempt: int) -> float:
+    """
+    Seconds to wait before the run after attempt: exponential backoff with
+    equal jitter, so retries of rows that failed together spread out.
+    """
+    base = (policy or {}).get("backoff_seconds", AGENT_RETRY_BACKOFF_SECONDS)
+    cap = (policy or {}).get("max_backoff_seconds", AGENT_RETRY_MAX_BACKOFF_SECONDS)
+    delay = min(cap, base * 2 ** max(0, attempt - 1))
+    return delay / 2 + random.uniform(0, delay / 2)
@@ -0,0 +1,166 @@
+import asyncio
+import os
+import time
+from collections import deque
+from functools import partial
+
+import psutil
+
+# Concurrency ceiling for browser agents. The scheduler starts at
+# AGENT_INITIAL_CONCURRENCY and moves between the min/max bounds depending on
+# host pressure and observed agent step latency.
+AGENT_MIN_CONCURRENCY = int(os.getenv("AGENT_MIN_CONCURRENCY", "1"))
+AGENT_MAX_CONCURRENCY = int(os.getenv("AGENT_MAX_CONCURRENCY", "8"))
+AGENT_INITIAL_CONCURRENCY = int(os.getenv("AGENT_INITIAL_CONCURRENCY", "2"))
+
+# Pressure thresholds (percent for memory/CPU, seconds for step latency)
+AGENT_MEMORY_HIGH_PERCENT = float(os.getenv("AGENT_MEMORY_HIGH_PERCENT", "85"))
+AGENT_MEMORY_LOW_PERCENT = float(os.getenv("AGENT_MEMORY_LOW_PERCENT", "70"))
+AGENT_CPU_HIGH_PERCENT = float(os.getenv("AGENT_CPU_HIGH_PERCENT", "90"))
+AGENT_CPU_LOW_PERCENT = float(os.getenv("AGENT_CPU_LOW_PERCENT", "60"))
+AGENT_STEP_LATENCY_HIGH_SECONDS = float(os.getenv("AGENT_STEP_LATENCY_HIGH_SECONDS", "45"))
+AGENT_SCHEDULER_INTERVAL_SECONDS = float(os.getenv("AGENT_SCHEDULER_INTERVAL_SECONDS", "5"))
+
+
+class AgentScheduler:
+    """
+    Bounded, adaptive dispatcher in front of start_agent_instance.
+    Jobs are queued and only started while the number of active agents is below
+    the current limit. A monitor loop samples host memory/CPU and recent agent
+    step latency, halving the limit under pressure and adding one slot at a time
+    when there is headroom and work is waiting.
+    """
+
+    def __init__(self,
+                 min_concurrency: int = AGENT_MIN_CONCURRENCY,
+                 max_concurrency: int = AGENT_MAX_CONCURRENCY,
+                 initial_concurrency: int = AGENT_INITIAL_CONCURRENCY):
+        self.min_concurrency = max(1, min_concurrency)
+        self.max_concurrency = max(self.min_concurrency, max_concurrency)
+        self.limit = min(max(initial_concurrency, self.min_concurrency), self.max_concurrency)
+        self.active = 0
+        self.queue = None
+        self._slot_changed = None
+        self._step_latencies = deque(maxlen=50)
+        self._last_sample = {}
+        self._dispatcher_task = None
+        self._monitor_task = None
+
+    def set_max_concurrency(self, max_concurrency: int):
+        """
+        Cap this process's agents, e.g. from the worker command line.
+        """
+        self.max_concurrency = max(self.min_concurrency, max_concurrency)
+        self.limit = min(self.limit, self.max_concurrency)
+
+    def _ensure_started(self):
+        # Loop-bound primitives are created lazily so the module can be imported
+        # before uvicorn starts its event loop.
+        if self._dispatcher_task is None or self._dispatcher_task.done():
+            self.queue = self.queue or asyncio.Queue()
+            self._slot_changed = self._slot_changed or asyncio.Condition()
+            self._dispatcher_task = asyncio.create_task(self._dispatch_loop())
+        if self._monitor_task is None or self._monitor_task.done():
+            self._monitor_task = asyncio.create_task(self._monitor_loop())
+
+    def submit(self, job_id: str, func, *args, **kwargs):
+        """
+        Queue an agent job. func(*args, **kwargs) must return an awaitable that
+        completes when the agent has finished.
+        """
+        self._ensure_started()
+        self.queue.put_nowait((job_id, partial(func, *args, **kwargs)))
+
+    def free_slots(self) -> int:
+        """
+        Jobs that could start right now without queueing.
+        """
+        queued = self.queue.qsize() if self.queue else 0
+        return max(0, self.limit - self.active - queued)
+
+    async def wait_for_room(self, max_queued: int):
+        """
+        Block producers while more than max_queued jobs are waiting, so a huge
+        upload can't pile every row into memory at once.
+        """
+        while self.queue is not None and self.queue.qsize() >= max_queued:
+            await asyncio.sleep(0.5)
+
+    def record_step_latency(self, seconds: float):
+        """
+        Record the wall time of one agent step, used as a pressure signal.
+        """
+        self._step_latencies.append(seconds)
+
+    async def _dispatch_loop(self):
+        while True:
+            job_id, job = await self.queue.get()
+            async with self._slot_changed:
+                await self._slot_changed.wait_for(lambda: self.active < self.limit)
+                self.active += 1
+            asyncio.create_task(self._run_job(job_id, job))
+
+    async def _run_job(self, job_id: str, job):
+        try:
+            await job()
+        except Exception as e:
+            print(f"Scheduled job {job_id} failed: {e}")
+        finally:
+            async with self._slot_changed:
+                self.active -= 1
+                self._slot_changed.notify_all()
+
+    def _average_step_latency(self):
+        if not self._step_latencies:
+            return 0.0
+        return sum(self._step_latencies) / len(self._step_latencies)
+
+    async def _monitor_loop(self):
+        psutil.cpu_percent(interval=None)  # prime the CPU counter
+        while True:
+            await asyncio.sleep(AGENT_SCHEDULER_INTERVAL_SECONDS)
+            memory_percent = psutil.virtual_memory().percent
+            cpu_percent = psutil.cpu_percent(interval=None)
+            step_latency = self._average_step_latency()
+            self._last_sample = {
+                "memory_percent": memory_percent,
+                "cpu_percent": cpu_percent,
+                "avg_step_latency": round(step_latency, 3),
+                "sampled_at": time.time()
+            }
+
+            new_limit = self.limit
+            under_pressure = (
+                memory_percent >= AGENT_MEMORY_HIGH_PERCENT
+                or cpu_percent >= AGENT_CPU_HIGH_PERCENT
+                or step_latency >= AGENT_STEP_LATENCY_HIGH_SECONDS
+            )
+            has_headroom = (
+                memory_percent < AGENT_MEMORY_LOW_PERCENT
+                and cpu_percent < AGENT_CPU_LOW_PERCENT
+                and step_latency < AGENT_STEP_LATENCY_HIGH_SECONDS / 2
+            )
+            if under_pressure:
+                new_limit = max(self.min_concurrency, self.limit // 2)
+            elif has_headroom and self.queue.qsize() > 0 and self.active >= self.limit:
+                new_limit = min(self.max_concurrency, self.limit + 1)
+
+            if new_limit != self.limit:
+                print(f"Agent scheduler: concurrency limit {self.limit} -> {new_limit} "
+                      f"(memory={memory_percent}%, cpu={cpu_percent}%, step_latency={step_latency:.1f}s)")
+                async with self._slot_changed:
+                    self.limit = new_limit
+                    self._slot_changed.notify_all()
+
+    def stats(self) -> dict:
+        return {
+            "limit": self.limit,
+            "min_concurrency": self.min_concurrency,
+            "max_concurrency": self.max_concurrency,
+            "active": self.active,
+            "queued": self.queue.qsize() if self.queue else 0,
+            **self._last_sample
+        }
+
+
+agent_scheduler = AgentScheduler()
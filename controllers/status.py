@@ -0,0 +1,346 @@
+import asyncio
+import uuid
+from collections import Counter
+from datetime import datetime
+from sqlalchemy import select, func, update, insert, event
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, object_session
+from sqlalchemy.orm.attributes import set_committed_value
+
+from controllers.events import event_bus
+from schema.TaskTracker import TaskTracker
+from schema.EventLog import EventLog
+from schema.ExecutionSummary import ExecutionSummaryEntry, ExecutionStatusCount, ExecutionMember
+
+# Every change to TaskTracker.status goes through this module, so the
+# execution_summary tables and the in-memory counters stay in step with the
+# tracker rows. None of the helpers commit; they join the caller's
+# transaction, and the in-memory side is applied once that transaction commits.
+# Worker processes (see controllers.event_log) also write each change to the
+# event_log table in the same transaction, for the API process to replay.
+
+ACTIVE_TASK_STATUSES = ("Pending", "Running")
+TERMINAL_TASK_STATUSES = ("Completed", "Failed", "Cancelled", "TimedOut")
+# Final statuses that "rerun failed" puts back in the queue
+RERUNNABLE_TASK_STATUSES = ("Failed", "TimedOut")
+
+_event_log_enabled = False
+
+
+def enable_event_log():
+    """
+    Record counter changes and status events in event_log as well.
+    Called by standalone workers, whose in-memory state nobody reads.
+    """
+    global _event_log_enabled
+    _event_log_enabled = True
+
+
+class StatusCounters:
+    """
+    In-memory status counts per execution and per (execution, file), so
+    count-only polls never touch SQLite. Each bucket carries a version that
+    changes whenever one of its tracker rows is written, used as the ETag.
+    """
+
+    def __init__(self):
+        self.boot_id = uuid.uuid4().hex[:8]
+        self._version = 0
+        self._executions = {}
+        self._files = {}
+        self._changed = None
+
+    def _bucket(self, table: dict, key):
+        bucket = table.get(key)
+        if bucket is None:
+            bucket = table[key] = {"counts": Counter(), "version": 0}
+        return bucket
+
+    def _bump(self, bucket: dict):
+        self._version += 1
+        bucket["version"] = self._version
+
+    def apply(self, execution_id: str, file_name: str, deltas: dict):
+        for bucket in (self._bucket(self._executions, execution_id),
+                       self._bucket(self._files, (execution_id, file_name))):
+            for status, delta in deltas.items():
+                if status is not None:
+                    bucket["counts"][status] += delta
+            self._bump(bucket)
+
+    def touch(self, execution_id: str, file_name: str):
+        for table, key in ((self._executions, execution_id), (self._files, (execution_id, file_name))):
+            if key in table:
+                self._bump(table[key])
+
+    def notify(self):
+        """
+        Wake every wait_for_change() caller.
+        """
+        if self._changed is not None:
+            self._changed.set()
+            self._changed = None
+
+    async def wait_for_change(self, timeout: float) -> bool:
+        """
+        Wait until a tracker change commits, up to timeout seconds.
+        """
+        if self._changed is None:
+            self._changed = asyncio.Event()
+        try:
+            await asyncio.wait_for(self._changed.wait(), timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+
+    def load(self, rows):
+        """
+        Replace all counters with rows of (execution_id, file_name, status, count).
+        """
+        self._executions.clear()
+        self._files.clear()
+        for execution_id, file_name, status, count in rows:
+            self.apply(execution_id, file_name, {status: count})
+
+    def _snapshot(self, bucket):
+        if bucket is None:
+            return None
+        counts = {status: count for status, count in bucket["counts"].items() if count > 0}
+        return counts, f'"{self.boot_id}-{bucket["version"]}"'
+
+    def execution(self, execution_id: str):
+        """
+        Return (status_counts, etag) for an execution, or None if it is unknown.
+        """
+        return self._snapshot(self._executions.get(execution_id))
+
+    def file(self, execution_id: str, file_name: str):
+        return self._snapshot(self._files.get((execution_id, file_name)))
+
+    def stats(self) -> dict:
+        return {"executions": len(self._executions), "files": len(self._files), "version": self._version}
+
+
+status_counters = StatusCounters()
+
+
+def _pending_changes(db) -> list:
+    return db.info.setdefault("status_changes", [])
+
+
+async def _queue_status_event(db: AsyncSession, execution_id: str, data: dict):
+    if _event_log_enabled:
+        await db.execute(insert(EventLog).values(
+            execution_id=execution_id, kind="event", data={"type": "status", **data}, created_at=datetime.now()
+        ))
+    else:
+        db.info.setdefault("status_events", []).append((execution_id, data))
+
+
+@event.listens_for(Session, "after_commit")
+def _apply_committed_changes(session):
+    changes = session.info.pop("status_changes", [])
+    for execution_id, file_name, deltas in changes:
+        if deltas:
+            status_counters.apply(execution_id, file_name, deltas)
+        else:
+            status_counters.touch(execution_id, file_name)
+    if changes:
+        status_counters.notify()
+    for execution_id, data in session.info.pop("status_events", []):
+        snapshot = status_counters.execution(execution_id)
+        event_bus.publish(execution_id, "status", status_counts=snapshot[0] if snapshot else {}, **data)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_rolled_back_changes(session):
+    session.info.pop("status_changes", None)
+    session.info.pop("status_events", None)
+
+
+@event.listens_for(TaskTracker, "after_update")
+def _touch_updated_tracker(mapper, connection, target):
+    # Duration or timestamp writes without a status change still bump the ETag
+    session = object_session(target)
+    if session is not None:
+        _pending_changes(session).append((target.execution_id, target.file_name, None))
+    if _event_log_enabled:
+        connection.execute(insert(EventLog.__table__).values(
+            execution_id=target.execution_id, kind="touch", data={"file_name": target.file_name},
+            created_at=datetime.now()
+        ))
+
+
+async def apply_status_deltas(db: AsyncSession, execution_id: str, deltas: dict, new_tasks: int = 0,
+                              file_name: str = None):
+    """
+    Add deltas ({status: +n/-n}) to an execution's status counters.
+    """
+    _pending_changes(db).append((execution_id, file_name, dict(deltas)))
+    now = datetime.now()
+    if _event_log_enabled:
+        await db.execute(insert(EventLog).values(
+            execution_id=execution_id, kind="counts",
+            data={"file_name": file_name, "deltas": {k: v for k, v in deltas.items() if k is not None and v}},
+            created_at=now
+        ))
+    summary = sqlite_insert(ExecutionSummaryEntry).values(
+        execution_id=execution_id, total_tasks=new_tasks, first_seen=now, last_updated=now
+    )
+    await db.execute(summary.on_conflict_do_update(
+        index_elements=[ExecutionSummaryEntry.execution_id],
+        set_={
+            "total_tasks": ExecutionSummaryEntry.total_tasks + summary.excluded.total_tasks,
+            "last_updated": summary.excluded.last_updated
+        }
+    ))
+    for status, delta in deltas.items():
+        if not delta or status is None:
+            continue
+        counter = sqlite_insert(ExecutionStatusCount).values(execution_id=execution_id, status=status, count=delta)
+        await db.execute(counter.on_conflict_do_update(
+            index_elements=[ExecutionStatusCount.execution_id, ExecutionStatusCount.status],
+            set_={"count": ExecutionStatusCount.count + counter.excluded.count}
+        ))
+
+
+async def record_new_tasks(db: AsyncSession, execution_id: str, file_name: str, agent_id: str,
+                           count: int, status: str = "Pending"):
+    """
+    Account for count freshly inserted tracker rows of one file.
+    """
+    if count <= 0:
+        return
+    await apply_status_deltas(db, execution_id, {status: count}, new_tasks=count, file_name=file_name)
+    await _queue_status_event(db, execution_id, {"file_name": file_name, "status": status, "count": count})
+    members = sqlite_insert(ExecutionMember).values([
+        {"execution_id": execution_id, "kind": "file", "value": file_name},
+        {"execution_id": execution_id, "kind": "agent", "value": agent_id},
+    ])
+    await db.execute(members.on_conflict_do_nothing())
+
+
+async def _swap_status(db: AsyncSession, task_tracker: TaskTracker, status: str, only_from):
+    # Compare-and-set of one row; returns the previous status, or None when unchanged
+    while True:
+        old_status = task_tracker.status
+        if old_status == status or (only_from is not None and old_status not in only_from):
+            return None
+        result = await db.execute(
+            update(TaskTracker)
+            .where(TaskTracker.id == task_tracker.id, TaskTracker.status == old_status)
+            .values(status=status)
+            .execution_options(synchronize_session=False)
+        )
+        if result.rowcount:
+            set_committed_value(task_tracker, "status", status)
+            return old_status
+        await db.refresh(task_tracker, attribute_names=["status"])
+
+
+async def set_task_status(db: AsyncSession, task_tracker: TaskTracker, status: str, only_from=None):
+    """
+    Change one tracker row's status and move it between the execution counters.
+    The write is a compare-and-set against the status last read, so a change
+    made meanwhile by another session or process (requeue, cancel) is picked
+    up instead of being counted twice. With only_from, the change only happens
+    while the row is in one of those statuses. Returns whether it changed.
+    """
+    return (await set_task_statuses(db, [(task_tracker, status, only_from)]))[0]
+
+
+async def set_task_statuses(db: AsyncSession, changes: list) -> list:
+    """
+    set_task_status for many rows: changes is [(task_tracker, status, only_from)],
+    applied in order. Counter deltas are summed per execution and file, so a
+    batch costs one counter update per file rather than one per row. Returns
+    whether each change happened.
+    """
+    results, deltas, events = [], {}, []
+    for task_tracker, status, only_from in changes:
+        old_status = await _swap_status(db, task_tracker, status, only_from)
+        if old_status is None:
+            results.append(False)
+            continue
+        file_deltas = deltas.setdefault((task_tracker.execution_id, task_tracker.file_name), {})
+        file_deltas[old_status] = file_deltas.get(old_status, 0) - 1
+        file_deltas[status] = file_deltas.get(status, 0) + 1
+        events.append((task_tracker.execution_id, {
+            "row_task_id": task_tracker.row_task_id,
+            "file_name": task_tracker.file_name,
+            "previous_status": old_status,
+            "status": status
+        }))
+        results.append(True)
+
+    for (execution_id, file_name), file_deltas in deltas.items():
+        await apply_status_deltas(db, execution_id, file_deltas, file_name=file_name)
+    for execution_id, data in events:
+        await _queue_status_event(db, execution_id, data)
+    return results
+
+
+async def bulk_set_status(db: AsyncSession, status: str, *criteria) -> int:
+    """
+    Set status on every tracker row matching criteria, keeping counters exact.
+    Returns the number of rows changed.
+    """
+    result = await db.execute(
+        select(TaskTracker.execution_id, TaskTracker.file_name, TaskTracker.status, func.count(TaskTracker.id))
+        .where(*criteria, TaskTracker.status != status)
+        .group_by(TaskTracker.execution_id, TaskTracker.file_name, TaskTracker.status)
+    )
+    groups = result.all()
+    if not groups:
+        return 0
+    await db.execute(update(TaskTracker).where(*criteria, TaskTracker.status != status).values(status=status))
+    changed = 0
+    for execution_id, file_name, old_status, count in groups:
+        await apply_status_deltas(db, execution_id, {old_status: -count, status: count}, file_name=file_name)
+        await _queue_status_event(db, execution_id, {
+            "file_name": file_name, "previous_status": old_status, "status": status, "count": count
+        })
+        changed += count
+    return changed
+
+
+async def rebuild_execution_summaries(db: AsyncSession):
+    """
+    Recompute all summary tables and the in-memory counters from task_tracker.
+    Run at startup so a database written by an older version (or edited by
+    hand) is consistent.
+    """
+    result = await db.execute(
+        select(TaskTracker.execution_id, TaskTracker.file_name, TaskTracker.status, func.count(TaskTracker.id))
+        .where(TaskTracker.execution_id.is_not(None))
+        .group_by(TaskTracker.execution_id, TaskTracker.file_name, TaskTracker.status)
+    )
+    status_counters.load(result.all())
+
+    await db.execute(ExecutionStatusCount.__table__.delete())
+    await db.execute(ExecutionMember.__table__.delete())
+    await db.execute(ExecutionSummaryEntry.__table__.delete())
+
+    await db.execute(sqlite_insert(ExecutionSummaryEntry).from_select(
+        ["execution_id", "total_tasks", "first_seen", "last_updated"],
+        select(
+            TaskTracker.execution_id,
+            func.count(TaskTracker.id),
+            func.min(TaskTracker.time_stamp),
+            func.max(TaskTracker.time_stamp)
+        ).where(TaskTracker.execution_id.is_not(None)).group_by(TaskTracker.execution_id)
+    ))
+    await db.execute(sqlite_insert(ExecutionStatusCount).from_select(
+        ["execution_id", "status", "count"],
+        select(TaskTracker.execution_id, TaskTracker.status, func.count(TaskTracker.id))
+        .where(TaskTracker.execution_id.is_not(None), TaskTracker.status.is_not(None))
+        .group_by(TaskTracker.execution_id, TaskTracker.status)
+    ))
+    for kind, column in (("file", TaskTracker.file_name), ("agent", TaskTracker.agent_id)):
+        await db.execute(sqlite_insert(ExecutionMember).from_select(
+            ["execution_id", "kind", "value"],
+            select(TaskTracker.execution_id, func.cast(kind, ExecutionMember.kind.type), column)
+            .where(TaskTracker.execution_id.is_not(None), column.is_not(None))
+            .distinct()
+        ).prefix_with("OR IGNORE"))
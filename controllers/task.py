@@ -1,139 +1,523 @@
 import asyncio
-from fastapi import Depends, UploadFile
-from sqlalchemy.orm import Session
+import hashlib
+import json
+import os
+from collections import Counter
+from fastapi import UploadFile
+from sqlalchemy import select, insert, update, func, and_, or_
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List, Dict, Optional, Any
 import pandas as pd
 import time
 import uuid
-from datetime import datetime
+from datetime import datetime, timedelta
 
-from controllers.controller import start_agent_instance
-from database.connector import get_db
+from controllers.template_cache import template_cache
+from controllers.ingest import stream_row_chunks, file_extension
+from controllers.batch import BATCH_DEFAULT_SIZE, BATCH_INSTRUCTIONS
+from controllers.job_queue import enqueue_jobs
+from controllers.fair_share import DEFAULT_PRIORITY
+from controllers.retry import retry_policy
+from controllers.status import record_new_tasks, set_task_status, bulk_set_status, TERMINAL_TASK_STATUSES
+from database.connector import AsyncSessionLocal
 from schema.DBRunner import Task  # Still needed for task instructions
 from schema.TaskTracker import TaskTracker
+from schema.AgentJob import AgentJob
+from schema.Upload import Upload
+from schema.TaskInput import TaskInput
+
+# row_task_ids per IN (...) lookup
+ROW_LOOKUP_CHUNK = 500
+# An upload still "processing" without progress for this long lost its
+# ingest (process restart) and may be uploaded again, resuming where it stopped
+UPLOAD_STALE_SECONDS = float(os.getenv("UPLOAD_STALE_SECONDS", "300"))
 
 
 async def process_excel_file(
-    excel_content: bytes,
+    file_path: str,
     file_name: str,
     execution_id: str,
     agent_id: str,
     app_type: str,
     url: str,
     sensitive_data_dict: dict,
-    db: Session
+    batch_mode: bool = False,
+    batch_size: int = BATCH_DEFAULT_SIZE,
+    priority: int = DEFAULT_PRIORITY,
+    dedup_rows: bool = False,
+    upload_id: int = None
 ):
     """
-    Process an Excel file in the background.
+    Process an uploaded sheet (Excel, CSV or Parquet) in the background.
     This function is called as a background task to avoid blocking the API response.
     Each row is processed independently with its own operation, timing, and status tracking.
+    In batch mode, rows sharing an operation are grouped and run in chunks of
+    batch_size by a single agent, while still being tracked per row.
+    The file is parsed in a reader process and handled chunk by chunk; each
+    chunk's tracker rows and their jobs are committed together to the durable
+    job queue, which the dispatcher drains. The spooled file is deleted at the end.
+    With dedup_rows, rows identical to another row of the execution (same
+    normalized data, app, URL and credentials) share that row's agent run
+    instead of starting their own. upload_id is the uploads record to mark
+    done or failed, whatever ends the ingest; rows an earlier attempt at the
+    same upload already queued are skipped.
     """
+    summary = None
     try:
-        df = pd.read_excel(excel_content)
-        
-        task_count = 0
-        header_row = df.iloc[0].to_dict()
-          # Store all data rows for processing
-        for index, row in df.iterrows():
-            row_data = row.to_dict()
-            print(f"Processing row {index + 1}: {row_data}")
-            # Extract operation from row data or use the default
-            row_operation = extract_operation_from_row(row_data)
-            
-            # Get task instructions for this specific row operation
-            task_instructions = await task_finder(
-                app_type=app_type,
-                operation=row_operation,
-                db=db
-            )
-            
-            if not task_instructions:
-                print(f"Warning: No task instructions found for app_type={app_type}, operation={row_operation}")
-                continue
-                
-            row_task_id = str(uuid.uuid4())
-            
-            start_time = datetime.now()
-            
-            task_entry = TaskTracker(
-                execution_id=execution_id,
-                file_name=file_name,
-                agent_id=agent_id,
-                row_task_id=row_task_id,
-                operation=row_operation,
-                status="Pending",
-                time_stamp=start_time,
-                duration=0.0
+        async with AsyncSessionLocal() as db:
+            summary = await _process_excel_file(
+                db, file_path, file_name, execution_id, agent_id, app_type, url,
+                sensitive_data_dict, batch_mode, batch_size, priority, dedup_rows, upload_id
             )
-            db.add(task_entry)
-            db.commit()
-            db.refresh(task_entry)            # Format row data for the agent with header context
-            user_info = []
-            
-            # Always include the header (first row) for context
-            
-            # If processing the header row itself, just include it once
-            user_info.append(header_row)
-                # For data rows, include both header and the current row
-                  # Add header row first for context
-            user_info.append(row_data)    # Add current data row
-            print(f"User info for row {index + 1}: {user_info}")
-            # Prepare task data for the agent
-            merged_task_data = {
-                "url": url,
-                "task_description": task_instructions.operation_description,
-                "instructions": task_instructions.operation_steps,
-                "user_info": user_info,
-                "execution_id": execution_id,
-                "row_task_id": row_task_id,
-                "operation": row_operation         # Include row index for reference
-            }
-            
-            # Update task tracker status to Running
-            task_entry.status = "Running"
-            db.commit()
-            
-            # Start agent instance for this row using row_task_id directly
-            asyncio.create_task(start_agent_instance(
-                db=db, 
-                session_id=row_task_id,  # Use row_task_id directly as the session ID
-                sensitive_data=sensitive_data_dict,
-                merged_task_data=merged_task_data
-            ))
-            
-            task_count += 1
-        
+    finally:
+        if upload_id is not None:
+            try:
+                async with AsyncSessionLocal() as db:
+                    await finish_upload(db, upload_id, summary)
+            except BaseException as e:
+                print(f"Could not record the end of upload {upload_id}: {e!r}")
+        try:
+            os.remove(file_path)
+        except OSError:
+            pass
+
+
+async def _process_excel_file(
+    db: AsyncSession,
+    file_path: str,
+    file_name: str,
+    execution_id: str,
+    agent_id: str,
+    app_type: str,
+    url: str,
+    sensitive_data_dict: dict,
+    batch_mode: bool,
+    batch_size: int,
+    priority: int,
+    dedup_rows: bool = False,
+    upload_id: int = None
+) -> Optional[dict]:
+    # Rows queued by an earlier attempt at this upload, by row index
+    queued_rows = await find_queued_rows(db, upload_id) if upload_id is not None else {}
+    task_count = len(queued_rows)
+    duplicate_rows = sum(1 for duplicate_of in queued_rows.values() if duplicate_of)
+    # Tracker rows this call committed
+    inserted = []
+    scope = row_hash_scope(agent_id, app_type, url, sensitive_data_dict)
+
+    def flush_batch(row_operation: str, batch: dict, chunk_runs: dict) -> tuple:
+        # Build the group's jobs; duplicates of its rows ride along in the job
+        # (not in the payload's records) and get its id in the tracker
+        jobs = build_batch_jobs(execution_id, agent_id, app_type, url, row_operation, batch["template"],
+                                batch["rows"], batch_size, sensitive_data_dict, priority)
+        job_of = {}
+        for job in jobs:
+            job["row_task_ids"] = job["row_task_ids"] + [
+                duplicate for row_task_id in job["row_task_ids"]
+                for duplicate in batch["duplicates"].get(row_task_id, ())
+            ]
+            job_of.update((row_task_id, job) for row_task_id in job["row_task_ids"])
+        for tracker_row in batch["tracker"]:
+            tracker_row["job_id"] = job_of[tracker_row["row_task_id"]]["id"]
+        for digest, primary in batch["hashes"].items():
+            chunk_runs.setdefault(digest, (primary, job_of[primary]))
+        tracker_rows = batch["tracker"]
+        batch.update(rows=[], tracker=[], hashes={}, duplicates={})
+        return tracker_rows, jobs
+
+    try:
+        header_row = None
+        reported_missing = set()
+        batches = {}
+
+        async for chunk in stream_row_chunks(file_path, file_extension(file_name)):
+            # The first data row is sent along with every row for context
+            if header_row is None:
+                header_row = chunk[0][1]
+
+            # 1. Validate the chunk: operation per row and the templates it needs
+            rows = [(index, row_data, extract_operation_from_row(row_data), row_hash(scope, row_data))
+                    for index, row_data in chunk if index not in queued_rows]
+            templates = await resolve_task_templates(db, app_type, {operation for _, _, operation, _ in rows})
+            missing = {str(operation) for _, _, operation, _ in rows if operation not in templates} - reported_missing
+            if missing:
+                reported_missing |= missing
+                print(f"Warning: No task instructions found for app_type={app_type}, operations={sorted(missing)}; "
+                      f"those rows will be skipped")
+
+            # 2. Build tracker rows and their jobs. In batch mode a group's rows
+            # are written together with its batch job once the group is full.
+            now = datetime.now()
+            tracker_rows = []
+            jobs = []
+            chunk_runs = {}
+            stored_runs = await find_stored_runs(db, execution_id, {digest for *_, digest in rows}) if dedup_rows else {}
+            for index, row_data, row_operation, digest in rows:
+                task_instructions = templates.get(row_operation)
+                if not task_instructions:
+                    continue
+                task_count += 1
+                row_task_id = str(uuid.uuid4())
+                tracker_row = {
+                    "execution_id": execution_id,
+                    "file_name": file_name,
+                    "agent_id": agent_id,
+                    "row_task_id": row_task_id,
+                    "operation": row_operation,
+                    "status": "Pending",
+                    "time_stamp": now,
+                    "duration": 0.0,
+                    "row_hash": digest,
+                    # Split off into task_inputs on insert
+                    "row_index": index,
+                    "row_data": row_data
+                }
+                # Format row data for the agent with the header row for context
+                user_info = [header_row, row_data]
+
+                if dedup_rows:
+                    # The row's operation is part of its data, so an identical
+                    # row waiting in a batch group is in this operation's group
+                    batch = batches.get(row_operation)
+                    if batch is not None and digest in batch["hashes"]:
+                        primary = batch["hashes"][digest]
+                        batch["duplicates"].setdefault(primary, []).append(row_task_id)
+                        batch["tracker"].append({**tracker_row, "duplicate_of": primary})
+                        duplicate_rows += 1
+                        continue
+                    if digest in chunk_runs:
+                        # Same as a row whose job is written with this chunk
+                        primary, job = chunk_runs[digest]
+                        job["row_task_ids"].append(row_task_id)
+                        tracker_rows.append({**tracker_row, "duplicate_of": primary, "job_id": job["id"]})
+                        duplicate_rows += 1
+                        continue
+                    if await attach_to_stored_run(db, tracker_row, stored_runs.get(digest)):
+                        tracker_rows.append(tracker_row)
+                        duplicate_rows += 1
+                        continue
+
+                if batch_mode:
+                    batch = batches.setdefault(row_operation, {"template": task_instructions, "rows": [], "tracker": [],
+                                                               "hashes": {}, "duplicates": {}})
+                    batch["rows"].append((row_task_id, user_info))
+                    batch["tracker"].append(tracker_row)
+                    batch["hashes"].setdefault(digest, row_task_id)
+                    if len(batch["rows"]) >= batch_size:
+                        batch_rows, batch_jobs = flush_batch(row_operation, batch, chunk_runs)
+                        tracker_rows.extend(batch_rows)
+                        jobs.extend(batch_jobs)
+                    continue
+
+                # Prepare task data for the agent
+                merged_task_data = {
+                    "url": url,
+                    "task_description": task_instructions.operation_description,
+                    "instructions": task_instructions.operation_steps,
+                    "user_info": user_info,
+                    "execution_id": execution_id,
+                    "row_task_id": row_task_id,
+                    "operation": row_operation,
+                    "template_id": f"{app_type}_{row_operation}" if row_operation else app_type
+                }
+                tracker_row["job_id"] = row_task_id
+                tracker_rows.append(tracker_row)
+                # The row stays "Pending" until a dispatcher claims the job and
+                # the runner flips it to "Running".
+                jobs.append({
+                    "id": row_task_id,  # Use row_task_id directly as the session ID
+                    "kind": "row",
+                    "execution_id": execution_id,
+                    "agent_id": agent_id,
+                    "priority": priority,
+                    "row_task_ids": [row_task_id],
+                    "payload": {
+                        "session_id": row_task_id,
+                        "sensitive_data": sensitive_data_dict,
+                        "merged_task_data": merged_task_data,
+                        "timeout_seconds": task_instructions.timeout_seconds,
+                        "max_steps": task_instructions.max_steps,
+                        "retry": retry_policy(task_instructions)
+                    }
+                })
+                chunk_runs.setdefault(digest, (row_task_id, jobs[-1]))
+
+            # 3. Insert the tracker rows and their jobs in one transaction
+            if upload_id is not None:
+                await touch_upload(db, upload_id)
+            inserted += await _insert_rows_and_jobs(db, execution_id, file_name, agent_id, tracker_rows, jobs,
+                                                    upload_id)
+
+        # Flush the partially filled batches
+        tracker_rows, jobs = [], []
+        for row_operation, batch in batches.items():
+            if batch["rows"]:
+                batch_rows, batch_jobs = flush_batch(row_operation, batch, {})
+                tracker_rows.extend(batch_rows)
+                jobs.extend(batch_jobs)
+        inserted += await _insert_rows_and_jobs(db, execution_id, file_name, agent_id, tracker_rows, jobs, upload_id)
+
         # Generate a summary of the processing (this doesn't create a database entry)
         print(f"Initiated processing of {task_count} rows from file {file_name} for execution {execution_id}")
         print(f"Each row will be processed independently with its own status tracking.")
+        if duplicate_rows:
+            print(f"{duplicate_rows} duplicate rows share the run of an identical row.")
         print(f"Check execution status at /execution/{execution_id}/status")
-        
+        return {"row_count": task_count, "duplicate_rows": duplicate_rows}
+
     except Exception as e:
         print(f"Error processing Excel file: {e}")
-        # Mark all pending tasks as failed
-        db.query(TaskTracker).filter(
+        await db.rollback()
+        # Rows of earlier chunks were committed together with their jobs and
+        # run as usual; only fail rows of this upload left without a job
+        orphaned = await _rows_without_jobs(db, inserted)
+        if orphaned:
+            await bulk_set_status(db, "Failed", TaskTracker.row_task_id.in_(orphaned), TaskTracker.status == "Pending")
+        await db.commit()
+        print(f"{len(inserted)} rows of {file_name} were queued before the error and keep running")
+        return None
+
+
+async def _insert_rows_and_jobs(db: AsyncSession, execution_id: str, file_name: str, agent_id: str,
+                                tracker_rows: List[dict], jobs: List[dict], upload_id: int = None) -> List[str]:
+    """
+    Commit a chunk's tracker rows, their inputs and their jobs in one
+    transaction. Returns the committed row_task_ids.
+    """
+    if not tracker_rows:
+        return []
+    # The uploaded row goes to task_inputs (for exports), keeping the tracker slim
+    inputs = []
+    for tracker_row in tracker_rows:
+        inputs.append({
+            "row_task_id": tracker_row["row_task_id"],
+            "execution_id": execution_id,
+            "file_name": file_name,
+            "upload_id": upload_id,
+            "row_index": tracker_row.pop("row_index"),
+            "data": tracker_row.pop("row_data")
+        })
+    await db.execute(insert(TaskTracker), tracker_rows)
+    await db.execute(insert(TaskInput), inputs)
+    # Duplicates of a row that already completed are inserted Completed
+    for status, count in Counter(tracker_row["status"] for tracker_row in tracker_rows).items():
+        await record_new_tasks(db, execution_id, file_name, agent_id, count, status=status)
+    await enqueue_jobs(db, jobs)
+    await db.commit()
+    return [tracker_row["row_task_id"] for tracker_row in tracker_rows]
+
+
+async def _rows_without_jobs(db: AsyncSession, row_task_ids: List[str]) -> List[str]:
+    # Rows whose job never made it to the queue
+    orphaned = []
+    for start in range(0, len(row_task_ids), ROW_LOOKUP_CHUNK):
+        result = await db.execute(
+            select(TaskTracker.row_task_id)
+            .outerjoin(AgentJob, AgentJob.id == TaskTracker.job_id)
+            .where(TaskTracker.row_task_id.in_(row_task_ids[start:start + ROW_LOOKUP_CHUNK]), AgentJob.id.is_(None))
+        )
+        orphaned.extend(result.scalars().all())
+    return orphaned
+
+
+async def register_upload(db: AsyncSession, execution_id: str, file_hash: str, file_name: str,
+                          agent_id: str) -> Optional[int]:
+    """
+    Record an upload of content file_hash to an execution. Returns its id,
+    or None when the same content was already uploaded to the execution
+    (a client retrying POST /start). An upload that failed, or whose ingest
+    stopped making progress UPLOAD_STALE_SECONDS ago, can be retried.
+    """
+    now = datetime.now()
+    stale = now - timedelta(seconds=UPLOAD_STALE_SECONDS)
+    stmt = sqlite_insert(Upload).values(
+        execution_id=execution_id, file_hash=file_hash, file_name=file_name, agent_id=agent_id,
+        status="processing", created_at=now, updated_at=now
+    )
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[Upload.execution_id, Upload.file_hash],
+        set_={"status": "processing", "file_name": file_name, "agent_id": agent_id, "updated_at": now},
+        where=or_(Upload.status == "failed", and_(Upload.status == "processing", Upload.updated_at < stale))
+    ).returning(Upload.id)
+    upload_id = (await db.execute(stmt)).scalar()
+    await db.commit()
+    return upload_id
+
+
+async def find_upload(db: AsyncSession, execution_id: str, file_hash: str) -> Optional[Upload]:
+    result = await db.execute(
+        select(Upload).where(Upload.execution_id == execution_id, Upload.file_hash == file_hash)
+    )
+    return result.scalars().first()
+
+
+async def touch_upload(db: AsyncSession, upload_id: int):
+    # Progress mark, committed with the chunk it precedes
+    await db.execute(update(Upload).where(Upload.id == upload_id).values(updated_at=datetime.now()))
+
+
+async def fail_stale_uploads(db: AsyncSession) -> int:
+    """
+    Mark failed the uploads whose ingest stopped making progress, e.g. when
+    the process died mid-file, so their status no longer claims otherwise.
+    """
+    result = await db.execute(
+        update(Upload)
+        .where(Upload.status == "processing",
+               Upload.updated_at < datetime.now() - timedelta(seconds=UPLOAD_STALE_SECONDS))
+        .values(status="failed", updated_at=datetime.now())
+    )
+    await db.commit()
+    return result.rowcount
+
+
+async def find_queued_rows(db: AsyncSession, upload_id: int) -> Dict[int, Optional[str]]:
+    """
+    The rows of an upload that are already in the tracker, as
+    {row_index: duplicate_of}.
+    """
+    result = await db.execute(
+        select(TaskInput.row_index, TaskTracker.duplicate_of)
+        .join(TaskTracker, TaskTracker.row_task_id == TaskInput.row_task_id)
+        .where(TaskInput.upload_id == upload_id)
+    )
+    return dict(result.all())
+
+
+async def finish_upload(db: AsyncSession, upload_id: int, summary: Optional[dict]):
+    """
+    Mark an upload done with its row counts, or failed when summary is None.
+    """
+    await db.execute(
+        update(Upload)
+        .where(Upload.id == upload_id)
+        .values(status="failed" if summary is None else "done", updated_at=datetime.now(), **(summary or {}))
+    )
+    await db.commit()
+
+
+async def find_stored_runs(db: AsyncSession, execution_id: str, row_hashes) -> Dict[str, tuple]:
+    """
+    Runs of an execution that new identical rows can share, by row hash:
+    (row_task_id, status, job_id) of a Completed row, or of a Pending row
+    whose job no dispatcher has claimed yet. Completed ones win.
+    """
+    if not row_hashes:
+        return {}
+    result = await db.execute(
+        select(TaskTracker.row_hash, TaskTracker.row_task_id, TaskTracker.status, TaskTracker.job_id)
+        .outerjoin(AgentJob, AgentJob.id == TaskTracker.job_id)
+        .where(
             TaskTracker.execution_id == execution_id,
-            TaskTracker.file_name == file_name,
-            TaskTracker.agent_id == agent_id,
-            TaskTracker.status == "Pending"
-        ).update({"status": "Failed"})
-        db.commit()
+            TaskTracker.row_hash.in_(row_hashes),
+            TaskTracker.duplicate_of.is_(None),
+            or_(TaskTracker.status == "Completed",
+                and_(TaskTracker.status == "Pending", AgentJob.status == "queued"))
+        )
+    )
+    runs = {}
+    for digest, row_task_id, status, job_id in result.all():
+        if digest not in runs or status == "Completed":
+            runs[digest] = (row_task_id, status, job_id)
+    return runs
 
 
+async def attach_to_stored_run(db: AsyncSession, tracker_row: dict, run: Optional[tuple]) -> bool:
+    """
+    Make tracker_row a duplicate of a run from find_stored_runs: Completed
+    right away, or added to the still queued job. Returns False when it has
+    to run on its own (no run, or the job got claimed since the lookup).
+    """
+    if run is None:
+        return False
+    primary, status, job_id = run
+    if status != "Completed":
+        result = await db.execute(
+            update(AgentJob)
+            .where(AgentJob.id == job_id, AgentJob.status == "queued")
+            .values(row_task_ids=func.json_insert(AgentJob.row_task_ids, "$[#]", tracker_row["row_task_id"]))
+            .execution_options(synchronize_session=False)
+        )
+        if not result.rowcount:
+            return False
+    tracker_row.update(duplicate_of=primary, job_id=job_id, status=status)
+    return True
 
 
+def build_batch_jobs(
+    execution_id: str,
+    agent_id: str,
+    app_type: str,
+    url: str,
+    operation: str,
+    task_instructions: Task,
+    rows: List[tuple],
+    batch_size: int,
+    sensitive_data_dict: dict,
+    priority: int = DEFAULT_PRIORITY
+) -> List[dict]:
+    """
+    Split same-operation rows into chunks and build one batch agent job per chunk.
+    rows is a list of (row_task_id, user_info) tuples.
+    """
+    jobs = []
+    batch_size = max(1, batch_size)
+    for start in range(0, len(rows), batch_size):
+        chunk = rows[start:start + batch_size]
+        batch_id = str(uuid.uuid4())
+        row_task_ids = [row_task_id for row_task_id, _ in chunk]
+        batch_task_data = {
+            "url": url,
+            "task_description": task_instructions.operation_description,
+            "instructions": task_instructions.operation_steps,
+            "batch_instructions": BATCH_INSTRUCTIONS,
+            "records": [
+                {"record_index": index, "user_info": user_info}
+                for index, (_, user_info) in enumerate(chunk)
+            ],
+            "execution_id": execution_id,
+            "batch_id": batch_id,
+            "app_type": app_type,
+            "operation": operation
+        }
+        jobs.append({
+            "id": batch_id,
+            "kind": "batch",
+            "execution_id": execution_id,
+            "agent_id": agent_id,
+            "priority": priority,
+            "row_task_ids": row_task_ids,
+            "payload": {
+                "batch_id": batch_id,
+                "sensitive_data": sensitive_data_dict,
+                "batch_task_data": batch_task_data,
+                "row_task_ids": row_task_ids,
+                "timeout_seconds": task_instructions.timeout_seconds,
+                "max_steps": task_instructions.max_steps,
+                "retry": retry_policy(task_instructions)
+            }
+        })
+        print(f"Queued batch {batch_id} with {len(chunk)} '{operation}' rows for execution {execution_id}")
+    return jobs
 
 
+async def resolve_task_templates(db: AsyncSession, app_type: str, operations) -> Dict[str, Task]:
+    """
+    Prefetch the task templates for a set of operations through the template
+    cache (one IN query for whatever is not cached yet).
+    Returns a dict of operation -> Task for the operations that have one.
+    """
+    task_ids = {(f"{app_type}_{operation}" if operation else app_type): operation for operation in operations}
+    templates = await template_cache.get_many(db, task_ids)
+    return {task_ids[task_id]: task for task_id, task in templates.items() if task is not None}
 
-async def task_finder(app_type: str, operation: str, db: Session = Depends(get_db)):
+async def task_finder(app_type: str, operation: str, db: AsyncSession):
     """
     Find task instructions based on application type and operation.
     """
     task_id = f"{app_type}_{operation}" if operation else app_type
-    task_instructions = db.query(Task).filter(Task.id == task_id).first()
-    print(f"Task finder: Looking for task with ID '{task_id}'")
-    print(f"Task instructions found: {task_instructions}")
-    return task_instructions
+    return await template_cache.get(db, task_id)
 
 async def parse_excel(file: UploadFile) -> List[Dict]:
     """
@@ -151,7 +535,7 @@ async def parse_excel(file: UploadFile) -> List[Dict]:
     return all_data
 
 async def process_excel_row(
-    db: Session,
+    db: AsyncSession,
     execution_id: str,
     agent_id: str,
     file_name: str,
@@ -190,13 +574,14 @@ async def process_excel_row(
     )
     
     db.add(task_entry)
-    db.commit()
-    db.refresh(task_entry)
+    await record_new_tasks(db, execution_id, file_name, agent_id, 1)
+    await db.commit()
+    await db.refresh(task_entry)
     
     return row_task_id, task_entry.id, operation
 
 async def update_task_status(
-    db: Session,
+    db: AsyncSession,
     row_task_id: str,
     status: str,
     duration: Optional[float] = None
@@ -205,27 +590,50 @@ async def update_task_status(
     Update the status and optionally duration of a task in the task tracker.
     If duration is not provided, it will be calculated based on the start time.
     """
-    task_entry = db.query(TaskTracker).filter(TaskTracker.row_task_id == row_task_id).first()
+    result = await db.execute(select(TaskTracker).where(TaskTracker.row_task_id == row_task_id))
+    task_entry = result.scalars().first()
     
     if task_entry:
-        task_entry.status = status
+        await set_task_status(db, task_entry, status)
         
         # If duration is provided, use it directly
         if duration is not None:
             task_entry.duration = duration
-        # Otherwise, calculate duration if this is a terminal status (Completed or Failed)
-        elif status in ["Completed", "Failed"] and task_entry.time_stamp:
+        # Otherwise, calculate duration if this is a terminal status
+        elif status in TERMINAL_TASK_STATUSES and task_entry.time_stamp:
             # Calculate the duration based on start timestamp
             if isinstance(task_entry.time_stamp, datetime):
                 task_entry.duration = (datetime.now() - task_entry.time_stamp).total_seconds()
             elif isinstance(task_entry.time_stamp, float):
                 task_entry.duration = time.time() - task_entry.time_stamp
         
-        db.commit()
+        await db.commit()
         return True
     
     return False
 
+def row_hash_scope(agent_id: str, app_type: str, url: str, sensitive_data: dict) -> str:
+    """
+    What besides its data a row's run depends on; rows only count as
+    identical within the same scope. Credentials enter as a digest.
+    """
+    credentials = json.dumps(sorted((str(k), str(v)) for k, v in (sensitive_data or {}).items()))
+    return json.dumps([agent_id, app_type, url, hashlib.sha256(credentials.encode("utf-8")).hexdigest()])
+
+
+def row_hash(scope: str, row_data: Dict[str, Any]) -> str:
+    """
+    sha256 of a row's normalized data within scope (see row_hash_scope):
+    column names trimmed and lowercased, values trimmed, empty cells
+    dropped, column order ignored.
+    """
+    normalized = sorted(
+        (str(key).strip().lower(), str(value).strip())
+        for key, value in row_data.items() if value is not None and str(value).strip() != ""
+    )
+    return hashlib.sha256(json.dumps([scope, normalized]).encode("utf-8")).hexdigest()
+
+
 def extract_operation_from_row(row_data: Dict[str, Any], default_operation: str = None) -> str:
     """
     Extract the operation from the row data.
@@ -0,0 +1,95 @@
+import json
+import os
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from database.connector import AsyncSessionLocal
+from schema.TaskTracker import TaskTracker
+
+TASK_PAGE_MAX_ROWS = int(os.getenv("TASK_PAGE_MAX_ROWS", "1000"))
+# Rows fetched per round trip from the server-side cursor when streaming
+TASK_STREAM_BATCH_ROWS = int(os.getenv("TASK_STREAM_BATCH_ROWS", "500"))
+
+TASK_FIELDS = {
+    "row_task_id": TaskTracker.row_task_id,
+    "execution_id": TaskTracker.execution_id,
+    "file_name": TaskTracker.file_name,
+    "agent_id": TaskTracker.agent_id,
+    "operation": TaskTracker.operation,
+    "status": TaskTracker.status,
+    "time_stamp": TaskTracker.time_stamp,
+    "duration": TaskTracker.duration,
+    "attempts": TaskTracker.attempts,
+    "duplicate_of": TaskTracker.duplicate_of,
+}
+
+
+def parse_fields(fields: str = None, default=None) -> list:
+    """
+    Turn a comma-separated field list into TASK_FIELDS names, rejecting
+    unknown ones with ValueError. Returns default (or every field) when empty.
+    """
+    if not fields:
+        return list(default or TASK_FIELDS)
+    names = [name.strip() for name in fields.split(",") if name.strip()]
+    unknown = [name for name in names if name not in TASK_FIELDS]
+    if unknown:
+        raise ValueError(f"Unknown fields {unknown}; choose from {sorted(TASK_FIELDS)}")
+    return names
+
+
+def task_query(execution_id: str, fields: list, file_name: str = None, status: str = None, cursor: int = None):
+    """
+    Projected keyset query over one execution's tasks, ordered by tracker id.
+    The id is always selected first so callers can build the next cursor.
+    """
+    query = select(TaskTracker.id, *(TASK_FIELDS[name] for name in fields)).where(
+        TaskTracker.execution_id == execution_id
+    )
+    if file_name is not None:
+        query = query.where(TaskTracker.file_name == file_name)
+    if status:
+        query = query.where(TaskTracker.status == status)
+    if cursor is not None:
+        query = query.where(TaskTracker.id > cursor)
+    return query.order_by(TaskTracker.id)
+
+
+def _task_dict(row, fields: list) -> dict:
+    task = {}
+    for name, value in zip(fields, row[1:]):
+        if name == "time_stamp" and value is not None:
+            value = value.isoformat()
+        task[name] = value
+    return task
+
+
+async def task_page(db: AsyncSession, execution_id: str, fields: list, limit: int = None, **filters):
+    """
+    Return (tasks, next_cursor) for one page. limit=None returns every
+    matching task in one go, as the status routes always did.
+    """
+    query = task_query(execution_id, fields, **filters)
+    if limit is not None:
+        limit = max(1, min(limit, TASK_PAGE_MAX_ROWS))
+        query = query.limit(limit + 1)
+    result = await db.execute(query)
+    rows = result.all()
+    next_cursor = None
+    if limit is not None and len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = rows[-1][0]
+    return [_task_dict(row, fields) for row in rows], next_cursor
+
+
+async def stream_tasks_ndjson(execution_id: str, fields: list, **filters):
+    """
+    Yield matching tasks as NDJSON lines straight from a server-side cursor.
+    Uses its own session, since the response outlives the request handler.
+    """
+    async with AsyncSessionLocal() as db:
+        query = task_query(execution_id, fields, **filters).execution_options(yield_per=TASK_STREAM_BATCH_ROWS)
+        result = await db.stream(query)
+        async for rows in result.partitions():
+            yield "".join(json.dumps(_task_dict(row, fields)) + "\n" for row in rows)
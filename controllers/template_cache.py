@@ -0,0 +1,102 @@
+import os
+import time
+from collections import OrderedDict
+
+from sqlalchemy import event, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from schema.DBRunner import Task
+
+TEMPLATE_CACHE_TTL_SECONDS = float(os.getenv("TEMPLATE_CACHE_TTL_SECONDS", "300"))
+TEMPLATE_CACHE_MAX_ENTRIES = int(os.getenv("TEMPLATE_CACHE_MAX_ENTRIES", "512"))
+
+
+class TemplateCache:
+    """
+    In-process LRU/TTL cache of Tasks rows keyed by {app_type}_{operation}.
+    Misses are cached too, so an unknown operation is not re-queried for
+    every row. Entries are dropped when a Task is written through the ORM,
+    or explicitly through invalidate().
+    """
+
+    def __init__(self, ttl: float = TEMPLATE_CACHE_TTL_SECONDS, max_entries: int = TEMPLATE_CACHE_MAX_ENTRIES):
+        self.ttl = ttl
+        self.max_entries = max(1, max_entries)
+        self._entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def _lookup(self, template_id: str):
+        entry = self._entries.get(template_id)
+        if entry is None:
+            return False, None
+        task, cached_at = entry
+        if time.monotonic() - cached_at > self.ttl:
+            del self._entries[template_id]
+            return False, None
+        self._entries.move_to_end(template_id)
+        return True, task
+
+    def _store(self, template_id: str, task):
+        self._entries[template_id] = (task, time.monotonic())
+        self._entries.move_to_end(template_id)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    async def get_many(self, db: AsyncSession, template_ids) -> dict:
+        """
+        Return template_id -> Task (or None when there is no template), fetching
+        every uncached id with a single IN query.
+        """
+        found = {}
+        to_fetch = []
+        for template_id in set(template_ids):
+            cached, task = self._lookup(template_id)
+            if cached:
+                self.hits += 1
+                found[template_id] = task
+            else:
+                self.misses += 1
+                to_fetch.append(template_id)
+
+        if to_fetch:
+            result = await db.execute(select(Task).where(Task.id.in_(to_fetch)))
+            fetched = {task.id: task for task in result.scalars().all()}
+            for template_id in to_fetch:
+                task = fetched.get(template_id)
+                if task is not None:
+                    db.expunge(task)
+                self._store(template_id, task)
+                found[template_id] = task
+        return found
+
+    async def get(self, db: AsyncSession, template_id: str):
+        return (await self.get_many(db, [template_id]))[template_id]
+
+    def invalidate(self, template_id: str = None):
+        """
+        Drop one template, or the whole cache when template_id is None.
+        """
+        if template_id is None:
+            self._entries.clear()
+        else:
+            self._entries.pop(template_id, None)
+
+    def stats(self) -> dict:
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses
+        }
+
+
+template_cache = TemplateCache()
+
+
+@event.listens_for(Task, "after_insert")
+@event.listens_for(Task, "after_update")
+@event.listens_for(Task, "after_delete")
+def _invalidate_changed_template(mapper, connection, target):
+    template_cache.invalidate(target.id)
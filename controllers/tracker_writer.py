@@ -0,0 +1,196 @@
+import asyncio
+import os
+import time
+from datetime import datetime
+
+from sqlalchemy import select, insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from database.connector import AsyncSessionLocal
+from schema.TaskTracker import TaskTracker
+from schema.TaskAttempt import TaskAttempt
+from schema.TaskResult import TaskResult
+from controllers.status import set_task_statuses
+
+# Most updates applied in one transaction
+TRACKER_WRITER_MAX_BATCH = int(os.getenv("TRACKER_WRITER_MAX_BATCH", "500"))
+# Extra wait for more updates before each commit; 0 batches only what queued
+# up during the previous commit
+TRACKER_WRITER_MAX_DELAY_SECONDS = float(os.getenv("TRACKER_WRITER_MAX_DELAY_SECONDS", "0"))
+
+
+class TrackerWriter:
+    """
+    Single writer task for the TaskTracker updates runners make (start,
+    finish, status and duration). Runners queue an update and await it; the
+    writer applies everything queued meanwhile in one transaction, so many
+    concurrent runners share one commit instead of contending for the SQLite
+    write lock with one each. Updates apply in submission order.
+    """
+
+    def __init__(self, max_batch: int = TRACKER_WRITER_MAX_BATCH,
+                 max_delay: float = TRACKER_WRITER_MAX_DELAY_SECONDS):
+        self.max_batch = max(1, max_batch)
+        self.max_delay = max_delay
+        self._queue = None
+        self._task = None
+        self.commits = 0
+        self.updates = 0
+        self.largest_batch = 0
+        self._commit_seconds = 0.0
+
+    def _ensure_started(self):
+        # Created lazily so the module can be imported before the event loop starts
+        if self._task is None or self._task.done():
+            self._queue = self._queue or asyncio.Queue()
+            self._task = asyncio.create_task(self._loop())
+
+    async def update(self, row_task_id: str, status: str = None, only_from=None,
+                     start_clock: bool = False, finish_clock: bool = False, attempt: dict = None,
+                     result: dict = None) -> bool:
+        """
+        Queue an update of one tracker row and wait until it is committed.
+        status/only_from work as in set_task_status; start_clock stamps
+        time_stamp with now and counts a started run, finish_clock sets
+        duration from it. attempt (job_id, status, failure_class, error)
+        adds the run that just ended to the row's attempt history, result
+        (from controllers.results.pack_result) replaces its stored result.
+        Returns whether the status changed.
+        """
+        self._ensure_started()
+        future = asyncio.get_running_loop().create_future()
+        self._queue.put_nowait(({
+            "row_task_id": row_task_id,
+            "status": status,
+            "only_from": only_from,
+            "start_clock": start_clock,
+            "finish_clock": finish_clock,
+            "attempt": attempt,
+            "result": result
+        }, future))
+        return await future
+
+    async def flush(self):
+        """
+        Wait until everything queued so far is committed.
+        """
+        if self._queue is not None and self._task is not None and not self._task.done():
+            await self._queue.join()
+
+    async def close(self):
+        await self.flush()
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        self._queue = None
+
+    async def _loop(self):
+        while True:
+            batch = [await self._queue.get()]
+            if self.max_delay:
+                await asyncio.sleep(self.max_delay)
+            while len(batch) < self.max_batch and not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+            try:
+                await self._write(batch)
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    async def _write(self, batch: list):
+        started = time.monotonic()
+        try:
+            async with AsyncSessionLocal() as db:
+                results = await _apply_updates(db, [update for update, _ in batch])
+                await db.commit()
+        except Exception as e:
+            if len(batch) > 1:
+                # Isolate the update that broke the group
+                for item in batch:
+                    await self._write([item])
+                return
+            print(f"Tracker update for {batch[0][0]['row_task_id']} failed: {e}")
+            if not batch[0][1].done():
+                batch[0][1].set_exception(e)
+            return
+
+        self.commits += 1
+        self.updates += len(batch)
+        self.largest_batch = max(self.largest_batch, len(batch))
+        self._commit_seconds += time.monotonic() - started
+        for (_, future), result in zip(batch, results):
+            # A runner cancelled while waiting no longer wants the result
+            if not future.done():
+                future.set_result(result)
+
+    def stats(self) -> dict:
+        return {
+            "queued": self._queue.qsize() if self._queue else 0,
+            "commits": self.commits,
+            "updates": self.updates,
+            "avg_batch": round(self.updates / self.commits, 2) if self.commits else 0.0,
+            "largest_batch": self.largest_batch,
+            "avg_commit_seconds": round(self._commit_seconds / self.commits, 4) if self.commits else 0.0
+        }
+
+
+async def _apply_updates(db: AsyncSession, updates: list) -> list:
+    row_task_ids = {update["row_task_id"] for update in updates}
+    result = await db.execute(select(TaskTracker).where(TaskTracker.row_task_id.in_(row_task_ids)))
+    trackers = {tracker.row_task_id: tracker for tracker in result.scalars().all()}
+
+    changes, positions = [], []
+    for position, update in enumerate(updates):
+        if update["status"] is not None and update["row_task_id"] in trackers:
+            changes.append((trackers[update["row_task_id"]], update["status"], update["only_from"]))
+            positions.append(position)
+    results = [False] * len(updates)
+    for position, changed in zip(positions, await set_task_statuses(db, changes)):
+        results[position] = changed
+
+    attempts, task_results = [], {}
+    for update in updates:
+        if update["result"] is not None:
+            # Not tied to a tracker row: a batch stores its transcript under its id
+            task_results[update["row_task_id"]] = {**update["result"], "row_task_id": update["row_task_id"],
+                                                   "updated_at": datetime.now()}
+        task_tracker = trackers.get(update["row_task_id"])
+        if task_tracker is None:
+            continue
+        now = datetime.now()
+        # A start or attempt only counts when the row is where the runner put
+        # it, not when e.g. a cancel got there first
+        reached = update["status"] is None or task_tracker.status == update["status"]
+        if update["start_clock"] and reached:
+            task_tracker.time_stamp = now
+            task_tracker.attempts = (task_tracker.attempts or 0) + 1
+        started_at = task_tracker.time_stamp if isinstance(task_tracker.time_stamp, datetime) else None
+        if update["finish_clock"] and started_at is not None:
+            task_tracker.duration = (now - started_at).total_seconds()
+        if update["attempt"] is not None and reached:
+            attempts.append({
+                **update["attempt"],
+                "row_task_id": task_tracker.row_task_id,
+                "execution_id": task_tracker.execution_id,
+                "attempt": task_tracker.attempts or 1,
+                "retried": update["status"] == "Pending",
+                "started_at": started_at,
+                "finished_at": now,
+                "duration": (now - started_at).total_seconds() if started_at is not None else None
+            })
+    if attempts:
+        await db.execute(insert(TaskAttempt), attempts)
+    if task_results:
+        stmt = sqlite_insert(TaskResult)
+        await db.execute(
+            stmt.on_conflict_do_update(
+                index_elements=[TaskResult.row_task_id],
+                set_={name: stmt.excluded[name] for name in next(iter(task_results.values())) if name != "row_task_id"}
+            ),
+            list(task_results.values())
+        )
+    return results
+
+
+tracker_writer = TrackerWriter()
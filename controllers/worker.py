@@ -0,0 +1,60 @@
+import asyncio
+import os
+import signal
+
+from controllers.controller import browser_pool
+from controllers.browser_watchdog import browser_watchdog
+from controllers.llm_client import llm_registry
+from controllers.scheduler import agent_scheduler
+from controllers.job_queue import job_dispatcher
+from controllers.tracker_writer import tracker_writer
+from controllers.reaper import runner_reaper
+from controllers.event_log import event_log_writer
+from database.connector import async_engine
+
+# How long a stopping worker waits for its claimed jobs before handing them back
+WORKER_DRAIN_SECONDS = float(os.getenv("WORKER_DRAIN_SECONDS", "300"))
+
+
+def _install_stop_handlers(stop: asyncio.Event):
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(sig, stop.set)
+        except (NotImplementedError, RuntimeError):
+            # Windows event loops have no add_signal_handler
+            signal.signal(sig, lambda *_: loop.call_soon_threadsafe(stop.set))
+
+
+async def run_worker(max_concurrency: int = None, drain_seconds: float = WORKER_DRAIN_SECONDS):
+    """
+    Run agent jobs from the shared job queue until SIGINT/SIGTERM, then drain:
+    stop claiming, let claimed jobs finish for up to drain_seconds and hand
+    the rest back to the queue.
+    """
+    stop = asyncio.Event()
+    _install_stop_handlers(stop)
+    if max_concurrency:
+        agent_scheduler.set_max_concurrency(max_concurrency)
+
+    await event_log_writer.start()
+    await browser_pool.warm_up()
+    await browser_watchdog.start()
+    await job_dispatcher.start()
+    await runner_reaper.start()
+    print(f"Worker {job_dispatcher.owner} started (max concurrency {agent_scheduler.max_concurrency})")
+
+    await stop.wait()
+    print(f"Worker {job_dispatcher.owner} draining {len(job_dispatcher.held)} jobs")
+    drained = await job_dispatcher.drain(drain_seconds)
+    if not drained:
+        print(f"Worker {job_dispatcher.owner} returning {len(job_dispatcher.held)} unfinished jobs to the queue")
+    await runner_reaper.stop()
+    await job_dispatcher.stop()
+    await tracker_writer.close()
+    await event_log_writer.stop()
+    await browser_watchdog.stop()
+    await browser_pool.close()
+    await llm_registry.close()
+    await async_engine.dispose()
+    print(f"Worker {job_dispatcher.owner} stopped")
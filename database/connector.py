@@ -1,9 +1,11 @@
 import sqlalchemy
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker, Session
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
 import os
 
 DATABASE_URL = "sqlite:///./runs.db"
+ASYNC_DATABASE_URL = "sqlite+aiosqlite:///./runs.db"
 # Ensure the directory for the database exists if it's not in the root
 # os.makedirs(os.path.dirname(DATABASE_URL.replace("sqlite:///", "")), exist_ok=True)
 engine = sqlalchemy.create_engine(
@@ -11,11 +13,66 @@ engine = sqlalchemy.create_engine(
 )
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Async engine used by the API routes and agent runners so tracker reads and
+# writes don't block the event loop. The sync engine above is kept for
+# create_all() at startup and for scripts.
+async_engine = create_async_engine(ASYNC_DATABASE_URL)
+AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
+# WAL lets status reads run alongside the single writer. It needs every
+# process using runs.db to be on the same host (the WAL index is shared
+# memory), so the API and its workers share one machine. synchronous=NORMAL
+# only fsyncs at checkpoints: the database cannot be corrupted, but the last
+# commits before a power loss or OS crash can be lost even though callers saw
+# them succeed. Set SQLITE_SYNCHRONOUS=FULL to fsync every commit. busy_timeout
+# makes a writer wait for the lock instead of failing with "database is locked".
+SQLITE_BUSY_TIMEOUT_MS = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "30000"))
+SQLITE_SYNCHRONOUS = os.getenv("SQLITE_SYNCHRONOUS", "NORMAL")
+SQLITE_CACHE_MB = int(os.getenv("SQLITE_CACHE_MB", "64"))
+
+
+def _set_sqlite_pragmas(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute(f"PRAGMA synchronous={SQLITE_SYNCHRONOUS}")
+    cursor.execute(f"PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS}")
+    cursor.execute(f"PRAGMA cache_size=-{SQLITE_CACHE_MB * 1024}")
+    cursor.execute("PRAGMA temp_store=MEMORY")
+    cursor.close()
+
+
+sqlalchemy.event.listen(engine, "connect", _set_sqlite_pragmas)
+sqlalchemy.event.listen(async_engine.sync_engine, "connect", _set_sqlite_pragmas)
+
 Base = declarative_base()
 
+def ensure_schema():
+    """
+    create_all() skips tables that already exist, so columns and indexes added
+    to a model later are created here for databases made by an older version.
+    New columns must be nullable; existing rows get NULL.
+    """
+    inspector = sqlalchemy.inspect(engine)
+    with engine.begin() as connection:
+        for table in Base.metadata.sorted_tables:
+            existing = {column["name"] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name not in existing:
+                    column_type = column.type.compile(dialect=engine.dialect)
+                    connection.execute(sqlalchemy.text(
+                        f'ALTER TABLE "{table.name}" ADD COLUMN "{column.name}" {column_type}'
+                    ))
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(bind=engine, checkfirst=True)
+
 def get_db():
     db = SessionLocal()
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
@@ -1,5 +1,5 @@
 from pydantic import BaseModel
-from typing import List, Dict, Optional, Any
+from typing import List, Dict, Optional, Any, Tuple
 from datetime import datetime
 
 class StartRequest(BaseModel):
@@ -22,6 +22,8 @@ class FileUploadResponse(BaseModel):
     message: str
     execution_id: str
     agent_id: str
+    file_hash: Optional[str] = None
+    duplicate: bool = False  # The same file was already uploaded to this execution
 
 class TaskStatus(BaseModel):
     row_task_id: str
@@ -29,6 +31,7 @@ class TaskStatus(BaseModel):
     status: str
     time_stamp: Optional[datetime] = None
     duration: float
+    attempts: Optional[int] = None
 
 class FileStatus(BaseModel):
     execution_id: str
@@ -39,8 +42,11 @@ class FileStatus(BaseModel):
     pending_tasks: int
     running_tasks: int
     processing_tasks: int
+    cancelled_tasks: int = 0
+    timed_out_tasks: int = 0
     is_complete: bool
     tasks: List[TaskStatus]
+    next_cursor: Optional[int] = None
 
 class ExecutionStatus(BaseModel):
     execution_id: str
@@ -49,8 +55,11 @@ class ExecutionStatus(BaseModel):
     failed_tasks: int
     pending_tasks: int
     running_tasks: int
+    cancelled_tasks: int = 0
+    timed_out_tasks: int = 0
     is_complete: bool
     tasks: List[TaskStatus]
+    next_cursor: Optional[int] = None
 
 class ExecutionSummary(BaseModel):
     execution_id: str
@@ -63,6 +72,59 @@ class ExecutionSummary(BaseModel):
 
 class ExecutionsListResponse(BaseModel):
     executions: List[ExecutionSummary]
+    next_cursor: Optional[str] = None
+
+class BulkStatusRequest(BaseModel):
+    row_task_ids: Optional[List[str]] = None
+    execution_id: Optional[str] = None
+    changed_since: Optional[datetime] = None
+    wait: float = 0
+
+class BulkStatusResponse(BaseModel):
+    as_of: datetime
+    # (row_task_id, status, duration) tuples
+    tasks: List[Tuple[str, Optional[str], Optional[float]]]
+    missing: List[str] = []
+
+class CancelResponse(BaseModel):
+    execution_id: str
+    cancelled: int  # tracker rows moved to Cancelled
+    jobs_cancelled: int  # queued jobs dropped
+    runners_stopped: int  # runners of this process stopped right away
+
+class RerunResponse(BaseModel):
+    execution_id: str
+    requeued: int  # Failed/TimedOut rows put back to Pending
+    jobs_requeued: int
+    skipped: int  # failed rows whose job is still queued or running
+
+class TaskAttemptRecord(BaseModel):
+    attempt: int
+    job_id: Optional[str] = None
+    status: str
+    failure_class: Optional[str] = None
+    error: Optional[str] = None
+    retried: bool = False
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+    duration: Optional[float] = None
+
+class TaskAttemptsResponse(BaseModel):
+    row_task_id: str
+    status: str
+    attempts: List[TaskAttemptRecord]
+
+class TaskResultResponse(BaseModel):
+    row_task_id: str
+    status: str
+    result_of: str  # The row whose run produced it; differs for duplicates
+    done: Optional[bool] = None
+    replayed: Optional[bool] = None
+    final_result: Optional[str] = None
+    error: Optional[str] = None
+    urls: Optional[List[Any]] = None
+    errors: Optional[List[str]] = None
+    model_thoughts: Optional[List[Any]] = None
 
 class TaskData:
     def __init__(self, url: str, description: str, instructions: str, user_info: List[Dict],
@@ -1,7 +1,11 @@
+import hashlib
 import json
 from typing import Dict, List, Optional
-from fastapi import APIRouter, Depends, File, Form, UploadFile, WebSocket
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, File, Form, HTTPException, UploadFile, WebSocket, WebSocketDisconnect, Request, Response
+from fastapi.responses import StreamingResponse, FileResponse
+from starlette.background import BackgroundTask
+from sqlalchemy import select, func
+from sqlalchemy.ext.asyncio import AsyncSession
 from pydantic import BaseModel
 import asyncio
 import pandas as pd
@@ -9,15 +13,54 @@ import io
 import os
 import uuid
 import time
-from datetime import datetime
+from datetime import datetime, timedelta
 
-from database.connector import get_db
-from controllers.task import process_excel_file
+from database.connector import get_async_db, AsyncSessionLocal
+from controllers.task import process_excel_file, register_upload, find_upload
+from controllers.scheduler import agent_scheduler
+from controllers.job_queue import job_dispatcher, tenant_stats, cancel_tasks, rerun_failed_tasks
+from controllers.reaper import runner_reaper
+from controllers.fair_share import priority_level
+from controllers.controller import browser_pool
+from controllers.browser_watchdog import browser_watchdog
+from controllers.batch import BATCH_DEFAULT_SIZE
+from controllers.replay import replay_store
+from controllers.llm_client import llm_registry
+from controllers.template_cache import template_cache
+from controllers.status import status_counters, TERMINAL_TASK_STATUSES
+from controllers.events import event_bus, format_sse
+from controllers.task_listing import task_page, stream_tasks_ndjson, parse_fields
+from controllers.results import get_task_result, stream_results_ndjson
+from controllers.export import stream_csv, write_xlsx, has_export_rows, EXPORT_FORMATS
+from controllers.ingest import spool_upload, file_extension, SUPPORTED_EXTENSIONS
 from model.Agent_input import *
 from schema.TaskTracker import TaskTracker
+from schema.TaskAttempt import TaskAttempt
+from schema.Upload import Upload
+from schema.ExecutionSummary import ExecutionSummaryEntry, ExecutionStatusCount, ExecutionMember
 
 router = APIRouter()
 
+EXECUTION_TASK_FIELDS = ["row_task_id", "file_name", "agent_id", "operation", "status", "time_stamp", "duration"]
+FILE_TASK_FIELDS = ["row_task_id", "operation", "status", "time_stamp", "duration"]
+BULK_STATUS_MAX_IDS = int(os.getenv("BULK_STATUS_MAX_IDS", "1000"))
+BULK_STATUS_MAX_WAIT_SECONDS = float(os.getenv("BULK_STATUS_MAX_WAIT_SECONDS", "60"))
+# updated_at is stamped when a write is issued, not when it commits, so the
+# as_of handed back is pulled back by this much to cover writes still in
+# flight (including a writer waiting out busy_timeout)
+BULK_STATUS_AS_OF_MARGIN_SECONDS = float(os.getenv("BULK_STATUS_AS_OF_MARGIN_SECONDS", "30"))
+# Recently issued as_of values, oldest first; a changed_since that is one of
+# them is known to lag the rows the caller already has by the margin
+BULK_STATUS_ISSUED_AS_OF_MAX = int(os.getenv("BULK_STATUS_ISSUED_AS_OF_MAX", "10000"))
+_issued_as_of: Dict[datetime, None] = {}
+
+
+def _issue_as_of(as_of: datetime) -> datetime:
+    _issued_as_of[as_of] = None
+    while len(_issued_as_of) > BULK_STATUS_ISSUED_AS_OF_MAX:
+        del _issued_as_of[next(iter(_issued_as_of))]
+    return as_of
+
 
 
 @router.post("/start", response_model=FileUploadResponse)
@@ -29,7 +72,11 @@ async def start_agent(
     taskExcel: UploadFile = File(...),
     appType: str = Form(...),
     url: str = Form(...),
-    db: Session = Depends(get_db)
+    batchMode: bool = Form(False),
+    batchSize: int = Form(BATCH_DEFAULT_SIZE),
+    priority: str = Form("normal"),
+    dedupRows: bool = Form(False),
+    db: AsyncSession = Depends(get_async_db)
 ):
     # Create sensitive data dictionary from individual fields
     sensitive_data_dict = {
@@ -37,20 +84,50 @@ async def start_agent(
         "password": password
     }
     
-    # Save the uploaded file content
-    excel_content = await taskExcel.read()
     file_name = taskExcel.filename
+    extension = file_extension(file_name)
+    if extension not in SUPPORTED_EXTENSIONS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unsupported file type '{extension}'. Upload one of: {', '.join(SUPPORTED_EXTENSIONS)}"
+        )
+    try:
+        priority_value = priority_level(priority)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    # Spool the upload to disk instead of holding it in memory
+    file_path, file_hash = await spool_upload(taskExcel, extension)
+
+    # A client retrying the same upload gets the execution already started
+    upload_id = await register_upload(db, executionId, file_hash, file_name, agentId)
+    if upload_id is None:
+        os.remove(file_path)
+        upload = await find_upload(db, executionId, file_hash)
+        return {
+            "status": "success",
+            "message": f"File '{file_name}' was already uploaded to this execution "
+                       f"(as '{upload.file_name}', {upload.status}); not processing it again.",
+            "execution_id": executionId,
+            "agent_id": upload.agent_id,
+            "file_hash": file_hash,
+            "duplicate": True
+        }
     
     # Create a background task to process the Excel file
     asyncio.create_task(process_excel_file(
-        excel_content=excel_content,
+        file_path=file_path,
         file_name=file_name,
         execution_id=executionId,
         agent_id=agentId,
         app_type=appType,
         url=url,
         sensitive_data_dict=sensitive_data_dict,
-        db=db
+        batch_mode=batchMode,
+        batch_size=batchSize,
+        priority=priority_value,
+        dedup_rows=dedupRows,
+        upload_id=upload_id
     ))
     
     # Return immediate response to client
@@ -58,21 +135,98 @@ async def start_agent(
         "status": "success",
         "message": f"File '{file_name}' uploaded successfully. Processing has started.",
         "execution_id": executionId,
-        "agent_id": agentId
+        "agent_id": agentId,
+        "file_hash": file_hash
     }
 
 
 
+@router.get("/scheduler")
+async def get_scheduler_stats():
+    """
+    Current agent concurrency limit, active/queued counts and the last host sample.
+    """
+    return agent_scheduler.stats()
+
+
+@router.get("/jobs")
+async def get_job_queue_stats():
+    """
+    Durable job queue state: jobs per status, leases held by this process and
+    what crash recovery requeued or failed.
+    """
+    return await job_dispatcher.stats()
+
+
+@router.get("/scheduler/tenants")
+async def get_tenant_stats(db: AsyncSession = Depends(get_async_db)):
+    """
+    Per agent_id and execution_id queue depth, running jobs and wait times.
+    """
+    return await tenant_stats(db)
+
+
+@router.get("/runners")
+async def get_runner_stats():
+    """
+    Runners active in this process and what the reaper stopped so far.
+    """
+    return runner_reaper.stats()
+
+
+@router.get("/browser_pool")
+async def get_browser_pool_stats():
+    """
+    Browser pool occupancy, recycling counters and checkout wait times.
+    """
+    return {**browser_pool.stats(), "watchdog": browser_watchdog.stats()}
+
+
+@router.get("/replay/stats")
+async def get_replay_stats():
+    """
+    Per-operation counts of scripted replays versus LLM runs and fallbacks.
+    """
+    return replay_store.stats()
+
+
+@router.get("/llm/stats")
+async def get_llm_stats():
+    """
+    Shared LLM client count, limiter budgets, 429s and per-call queue wait times.
+    """
+    return llm_registry.stats()
+
+
+@router.get("/templates/cache")
+async def get_template_cache_stats():
+    """
+    Task template cache size and hit/miss counters.
+    """
+    return template_cache.stats()
+
+
+@router.post("/templates/invalidate")
+async def invalidate_templates(templateId: Optional[str] = None):
+    """
+    Drop one cached template ({app_type}_{operation}), or all of them.
+    Call this after editing the Tasks table outside this service.
+    """
+    template_cache.invalidate(templateId)
+    return {"status": "success", "invalidated": templateId or "all"}
+
+
 @router.get("/is_done/{task_id}")
-async def is_done(task_id: str, db: Session = Depends(get_db)):
+async def is_done(task_id: str, db: AsyncSession = Depends(get_async_db)):
     """
     Check if a task is complete using its row_task_id.
     """
     # Check TaskTracker for task status
-    task_record = db.query(TaskTracker).filter(TaskTracker.row_task_id == task_id).first()
+    result = await db.execute(select(TaskTracker).where(TaskTracker.row_task_id == task_id))
+    task_record = result.scalars().first()
     if task_record:
         return {
-            "is_done": task_record.status in ["Completed", "Failed"],
+            "is_done": task_record.status in TERMINAL_TASK_STATUSES,
             "status": task_record.status,
             "duration": task_record.duration
         }
@@ -80,53 +234,235 @@ async def is_done(task_id: str, db: Session = Depends(get_db)):
     return {"error": "Task not found"}
 
 
+def _response_etag(etag: str, **params) -> str:
+    # The counters' ETag only tracks changes; each page, filter and projection
+    # of the same state is a different representation and needs its own
+    params = json.dumps(sorted(params.items()), default=str)
+    return f'{etag[:-1]}-{hashlib.sha1(params.encode("utf-8")).hexdigest()[:12]}"'
+
+
 @router.get("/execution/{execution_id}/status", response_model=ExecutionStatus)
-async def get_execution_status(execution_id: str, db: Session = Depends(get_db)):
+async def get_execution_status(
+    execution_id: str,
+    request: Request,
+    response: Response,
+    include_tasks: bool = True,
+    limit: Optional[int] = None,
+    cursor: Optional[int] = None,
+    status: Optional[str] = None,
+    db: AsyncSession = Depends(get_async_db)
+):
     """
     Get the status of all tasks for a specific execution ID.
+    Counts come from the in-memory status counters; pass include_tasks=false
+    to skip the task list, which then answers without touching the database.
+    Send the returned ETag as If-None-Match to get a 304 while nothing changed.
+    With limit, tasks are paged (pass next_cursor back as cursor) and can be
+    filtered by status. Use /execution/{execution_id}/tasks to project or stream.
     """
-    task_records = db.query(TaskTracker).filter(TaskTracker.execution_id == execution_id).all()
-    
-    if not task_records:
-        return {"error": "No tasks found for this execution ID"}
-    
-    tasks = []
-    for task in task_records:
-        tasks.append({
-            "row_task_id": task.row_task_id,
-            "file_name": task.file_name,
-            "agent_id": task.agent_id,
-            "operation": task.operation,
-            "status": task.status,
-            "time_stamp": task.time_stamp.isoformat() if task.time_stamp else None,
-            "duration": task.duration
-        })
-    
-    # Calculate stats
-    total_tasks = len(tasks)
-    completed_tasks = sum(1 for task in tasks if task["status"] == "Completed")
-    failed_tasks = sum(1 for task in tasks if task["status"] == "Failed")
-    pending_tasks = sum(1 for task in tasks if task["status"] == "Pending")
-    running_tasks = sum(1 for task in tasks if task["status"] == "Running")
-    
+    snapshot = status_counters.execution(execution_id)
+    if snapshot is None:
+        raise HTTPException(status_code=404, detail="No tasks found for this execution ID")
+    status_counts, etag = snapshot
+    etag = _response_etag(etag, include_tasks=include_tasks, limit=limit, cursor=cursor, status=status)
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers={"ETag": etag})
+    response.headers["ETag"] = etag
+
+    tasks, next_cursor = [], None
+    if include_tasks:
+        tasks, next_cursor = await task_page(
+            db, execution_id, EXECUTION_TASK_FIELDS, limit=limit, cursor=cursor, status=status
+        )
+
+    pending_tasks = status_counts.get("Pending", 0)
+    running_tasks = status_counts.get("Running", 0)
     return {
         "execution_id": execution_id,
-        "total_tasks": total_tasks,
-        "completed_tasks": completed_tasks,
-        "failed_tasks": failed_tasks,
+        "total_tasks": sum(status_counts.values()),
+        "completed_tasks": status_counts.get("Completed", 0),
+        "failed_tasks": status_counts.get("Failed", 0),
         "pending_tasks": pending_tasks,
         "running_tasks": running_tasks,
+        "cancelled_tasks": status_counts.get("Cancelled", 0),
+        "timed_out_tasks": status_counts.get("TimedOut", 0),
         "is_complete": pending_tasks == 0 and running_tasks == 0,
-        "tasks": tasks
+        "tasks": tasks,
+        "next_cursor": next_cursor
     }
 
 
+async def _resolve_task_execution(db: AsyncSession, row_task_id: str) -> str:
+    result = await db.execute(select(TaskTracker.execution_id).where(TaskTracker.row_task_id == row_task_id))
+    execution_id = result.scalars().first()
+    if execution_id is None:
+        raise HTTPException(status_code=404, detail="Task not found")
+    return execution_id
+
+
+async def _execution_exists(db: AsyncSession, execution_id: str) -> bool:
+    # Uploads are registered before their rows are ingested, so a client can
+    # subscribe right after POST /start
+    if status_counters.execution(execution_id) is not None:
+        return True
+    result = await db.execute(select(Upload.id).where(Upload.execution_id == execution_id).limit(1))
+    return result.first() is not None
+
+
+def _resume_point(request: Request, since: Optional[int]) -> int:
+    # EventSource sends the last id it saw as Last-Event-ID when it reconnects
+    if since is None:
+        last_event_id = request.headers.get("last-event-id")
+        since = int(last_event_id) if last_event_id and last_event_id.isdigit() else 0
+    return since
+
+
+async def _sse_events(execution_id: str, since: int, row_task_id: str = None):
+    async for batch in event_bus.subscribe(execution_id, since=since, row_task_id=row_task_id):
+        yield format_sse(batch)
+
+
+async def _send_events(websocket: WebSocket, execution_id: str, since: int, row_task_id: str = None):
+    await websocket.accept()
+    try:
+        async for batch in event_bus.subscribe(execution_id, since=since, row_task_id=row_task_id):
+            await websocket.send_json(batch)
+    except (WebSocketDisconnect, RuntimeError):
+        pass
+
+
+@router.get("/execution/{execution_id}/events")
+async def stream_execution_events(execution_id: str, request: Request, since: Optional[int] = None):
+    """
+    Server-Sent Events stream of an execution's status transitions, agent steps
+    and final results. Each event carries its sequence number as the SSE id, so
+    a reconnecting EventSource resumes from Last-Event-ID (or pass since).
+    """
+    # Own session: a dependency's would stay checked out while the stream runs
+    async with AsyncSessionLocal() as db:
+        exists = await _execution_exists(db, execution_id)
+    if not exists:
+        raise HTTPException(status_code=404, detail="No tasks found for this execution ID")
+    return StreamingResponse(
+        _sse_events(execution_id, _resume_point(request, since)),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+@router.get("/task/{row_task_id}/events")
+async def stream_task_events(row_task_id: str, request: Request, since: Optional[int] = None,
+                             db: AsyncSession = Depends(get_async_db)):
+    """
+    Server-Sent Events stream limited to one task's events.
+    """
+    execution_id = await _resolve_task_execution(db, row_task_id)
+    return StreamingResponse(
+        _sse_events(execution_id, _resume_point(request, since), row_task_id),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+@router.websocket("/ws/execution/{execution_id}")
+async def execution_events_socket(websocket: WebSocket, execution_id: str, since: int = 0):
+    """
+    WebSocket variant of /execution/{execution_id}/events. Each message is a
+    JSON list of events; an empty list is a heartbeat.
+    """
+    async with AsyncSessionLocal() as db:
+        exists = await _execution_exists(db, execution_id)
+    if not exists:
+        await websocket.close(code=1008, reason="Execution not found")
+        return
+    await _send_events(websocket, execution_id, since)
+
+
+@router.websocket("/ws/task/{row_task_id}")
+async def task_events_socket(websocket: WebSocket, row_task_id: str, since: int = 0):
+    """
+    WebSocket variant of /task/{row_task_id}/events.
+    """
+    async with AsyncSessionLocal() as db:
+        try:
+            execution_id = await _resolve_task_execution(db, row_task_id)
+        except HTTPException:
+            await websocket.close(code=1008, reason="Task not found")
+            return
+    await _send_events(websocket, execution_id, since, row_task_id)
+
+
+@router.get("/events/stats")
+async def get_event_stats():
+    """
+    Event stream buffer statistics.
+    """
+    return event_bus.stats()
+
+
+@router.post("/tasks/status", response_model=BulkStatusResponse)
+async def get_bulk_task_status(request: BulkStatusRequest, db: AsyncSession = Depends(get_async_db)):
+    """
+    Look up many tasks in one indexed query: either a list of row_task_ids or
+    every task of an execution_id, optionally only those changed after
+    changed_since (pass back the previous response's as_of). With wait > 0 and
+    changed_since set, the call long-polls until one of them changes or wait
+    seconds pass.
+
+    as_of lags the read by BULK_STATUS_AS_OF_MARGIN_SECONDS so that no commit
+    is missed, which means a task may be returned again by the next poll;
+    clients keep the latest status per row_task_id. A long-poll on an as_of
+    this server issued waits past the rows that poll already returned; one on
+    any other changed_since returns as soon as a row changed after it.
+    """
+    if bool(request.row_task_ids) == bool(request.execution_id):
+        raise HTTPException(status_code=400, detail="Pass either row_task_ids or execution_id")
+    if request.row_task_ids and len(request.row_task_ids) > BULK_STATUS_MAX_IDS:
+        raise HTTPException(status_code=400, detail=f"At most {BULK_STATUS_MAX_IDS} row_task_ids per request")
+
+    query = select(TaskTracker.row_task_id, TaskTracker.status, TaskTracker.duration, TaskTracker.updated_at)
+    if request.row_task_ids:
+        query = query.where(TaskTracker.row_task_id.in_(request.row_task_ids))
+    else:
+        query = query.where(TaskTracker.execution_id == request.execution_id)
+    if request.changed_since:
+        query = query.where(TaskTracker.updated_at > request.changed_since)
+
+    margin = timedelta(seconds=BULK_STATUS_AS_OF_MARGIN_SECONDS)
+    # Rows inside the margin of an as_of from this server were already sent
+    # by the poll that issued it; any other changed_since is taken as is
+    seen_until = request.changed_since
+    if request.changed_since is not None and request.changed_since in _issued_as_of:
+        seen_until = request.changed_since + margin
+    deadline = time.monotonic() + min(max(request.wait, 0), BULK_STATUS_MAX_WAIT_SECONDS)
+    while True:
+        as_of = datetime.now() - margin
+        result = await db.execute(query)
+        rows = result.all()
+        remaining = deadline - time.monotonic()
+        if remaining <= 0 or request.changed_since is None:
+            break
+        # Keep waiting until something changed that the caller has not seen
+        if any(row.updated_at and row.updated_at > seen_until for row in rows):
+            break
+        # Don't hold a pooled connection while waiting
+        await db.close()
+        await status_counters.wait_for_change(remaining)
+
+    missing = []
+    if request.row_task_ids and request.changed_since is None:
+        found = {row[0] for row in rows}
+        missing = [row_task_id for row_task_id in request.row_task_ids if row_task_id not in found]
+    return {"as_of": _issue_as_of(as_of), "tasks": [tuple(row)[:3] for row in rows], "missing": missing}
+
+
 @router.get("/task/{row_task_id}", response_model=TaskStatus)
-async def get_task_status(row_task_id: str, db: Session = Depends(get_db)):
+async def get_task_status(row_task_id: str, db: AsyncSession = Depends(get_async_db)):
     """
     Get the status of a specific task by its row_task_id.
     """
-    task = db.query(TaskTracker).filter(TaskTracker.row_task_id == row_task_id).first()
+    result = await db.execute(select(TaskTracker).where(TaskTracker.row_task_id == row_task_id))
+    task = result.scalars().first()
     
     if not task:
         return {"error": "Task not found"}
@@ -139,109 +475,370 @@ async def get_task_status(row_task_id: str, db: Session = Depends(get_db)):
         "operation": task.operation,
         "status": task.status,
         "time_stamp": task.time_stamp.isoformat() if task.time_stamp else None,
-        "duration": task.duration
+        "duration": task.duration,
+        "attempts": task.attempts or 0,
+        "duplicate_of": task.duplicate_of
     }
 
+
+@router.get("/task/{row_task_id}/attempts", response_model=TaskAttemptsResponse)
+async def get_task_attempts(row_task_id: str, db: AsyncSession = Depends(get_async_db)):
+    """
+    Every run of one row, oldest first: outcome, failure class, error and
+    whether a retry was scheduled after it.
+    """
+    result = await db.execute(select(TaskTracker.status).where(TaskTracker.row_task_id == row_task_id))
+    status = result.scalars().first()
+    if status is None:
+        raise HTTPException(status_code=404, detail="Task not found")
+    result = await db.execute(
+        select(TaskAttempt)
+        .where(TaskAttempt.row_task_id == row_task_id)
+        .order_by(TaskAttempt.attempt, TaskAttempt.id)
+    )
+    attempts = [
+        {
+            "attempt": attempt.attempt,
+            "job_id": attempt.job_id,
+            "status": attempt.status,
+            "failure_class": attempt.failure_class,
+            "error": attempt.error,
+            "retried": bool(attempt.retried),
+            "started_at": attempt.started_at,
+            "finished_at": attempt.finished_at,
+            "duration": attempt.duration
+        }
+        for attempt in result.scalars().all()
+    ]
+    return {"row_task_id": row_task_id, "status": status, "attempts": attempts}
+
+
+@router.get("/task/{row_task_id}/result", response_model=TaskResultResponse, response_model_exclude_none=True)
+async def get_task_result_route(row_task_id: str, details: bool = True, db: AsyncSession = Depends(get_async_db)):
+    """
+    The stored result of a task's latest run: final result and error, plus
+    urls, errors and model thoughts unless details=false. A duplicate row
+    returns the result of the row whose run it shared.
+    """
+    execution_id = await _resolve_task_execution(db, row_task_id)
+    result = await get_task_result(db, execution_id, row_task_id, details)
+    if result is None:
+        raise HTTPException(status_code=404, detail="Task has no result yet")
+    return result
+
+
+@router.get("/execution/{execution_id}/results")
+async def stream_execution_results(
+    execution_id: str,
+    file_name: Optional[str] = None,
+    cursor: Optional[int] = None,
+    details: bool = False
+):
+    """
+    Stream the results of an execution's tasks (optionally one file's) as
+    NDJSON in row order, straight from a database cursor. Tasks without a
+    result yet are left out. details=true adds urls, errors and model
+    thoughts, which are decompressed per row.
+    """
+    return StreamingResponse(
+        stream_results_ndjson(execution_id, details, file_name=file_name, cursor=cursor),
+        media_type="application/x-ndjson"
+    )
+
 @router.get("/execution/{execution_id}/file/{file_name}", response_model=FileStatus)
-async def get_file_status(execution_id: str, file_name: str, db: Session = Depends(get_db)):
+async def get_file_status(
+    execution_id: str,
+    file_name: str,
+    request: Request,
+    response: Response,
+    include_tasks: bool = True,
+    limit: Optional[int] = None,
+    cursor: Optional[int] = None,
+    status: Optional[str] = None,
+    db: AsyncSession = Depends(get_async_db)
+):
     """
     Get the status of all tasks for a specific file within an execution ID.
+    Supports include_tasks=false, If-None-Match and limit/cursor/status paging
+    like the execution status route.
     """
     # URL-decode the file_name if needed
     from urllib.parse import unquote
     file_name = unquote(file_name)
-    
-    task_records = db.query(TaskTracker).filter(
-        TaskTracker.execution_id == execution_id,
-        TaskTracker.file_name == file_name
-    ).all()
-    
-    if not task_records:
-        return {"error": f"No tasks found for file '{file_name}' in execution '{execution_id}'"}
-    
-    tasks = []
-    for task in task_records:
-        tasks.append({
-            "row_task_id": task.row_task_id,
-            "operation": task.operation,
-            "status": task.status,
-            "time_stamp": task.time_stamp.isoformat() if task.time_stamp else None,
-            "duration": task.duration
-        })
-    
-    # Calculate stats
-    total_tasks = len(tasks)
-    completed_tasks = sum(1 for task in tasks if task["status"] == "Completed")
-    failed_tasks = sum(1 for task in tasks if task["status"] == "Failed")
-    pending_tasks = sum(1 for task in tasks if task["status"] == "Pending")
-    running_tasks = sum(1 for task in tasks if task["status"] == "Running")
-    processing_tasks = sum(1 for task in tasks if task["status"] == "Processing")
-    
+
+    snapshot = status_counters.file(execution_id, file_name)
+    if snapshot is None:
+        raise HTTPException(status_code=404,
+                            detail=f"No tasks found for file '{file_name}' in execution '{execution_id}'")
+    status_counts, etag = snapshot
+    etag = _response_etag(etag, include_tasks=include_tasks, limit=limit, cursor=cursor, status=status)
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers={"ETag": etag})
+    response.headers["ETag"] = etag
+
+    tasks, next_cursor = [], None
+    if include_tasks:
+        tasks, next_cursor = await task_page(
+            db, execution_id, FILE_TASK_FIELDS, limit=limit, cursor=cursor, status=status, file_name=file_name
+        )
+
+    pending_tasks = status_counts.get("Pending", 0)
+    running_tasks = status_counts.get("Running", 0)
+    processing_tasks = status_counts.get("Processing", 0)
     return {
         "execution_id": execution_id,
         "file_name": file_name,
-        "total_tasks": total_tasks,
-        "completed_tasks": completed_tasks,
-        "failed_tasks": failed_tasks,
+        "total_tasks": sum(status_counts.values()),
+        "completed_tasks": status_counts.get("Completed", 0),
+        "failed_tasks": status_counts.get("Failed", 0),
         "pending_tasks": pending_tasks,
         "running_tasks": running_tasks,
         "processing_tasks": processing_tasks,
+        "cancelled_tasks": status_counts.get("Cancelled", 0),
+        "timed_out_tasks": status_counts.get("TimedOut", 0),
         "is_complete": pending_tasks == 0 and running_tasks == 0 and processing_tasks == 0,
-        "tasks": tasks
+        "tasks": tasks,
+        "next_cursor": next_cursor
     }
 
+
+@router.get("/execution/{execution_id}/tasks")
+async def list_execution_tasks(
+    execution_id: str,
+    limit: int = 500,
+    cursor: Optional[int] = None,
+    status: Optional[str] = None,
+    file_name: Optional[str] = None,
+    fields: Optional[str] = None,
+    stream: bool = False,
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    List an execution's tasks one page at a time, optionally filtered by status
+    and file_name. fields picks the columns to return (comma-separated, e.g.
+    row_task_id,status). With stream=true every matching task after cursor is
+    sent as NDJSON straight from a database cursor, ignoring limit.
+    """
+    try:
+        field_names = parse_fields(fields)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    if stream:
+        return StreamingResponse(
+            stream_tasks_ndjson(execution_id, field_names, cursor=cursor, status=status, file_name=file_name),
+            media_type="application/x-ndjson"
+        )
+
+    tasks, next_cursor = await task_page(
+        db, execution_id, field_names, limit=limit, cursor=cursor, status=status, file_name=file_name
+    )
+    return {"execution_id": execution_id, "tasks": tasks, "next_cursor": next_cursor}
+
+
+async def _cancel(db: AsyncSession, execution_id: str, **scope) -> dict:
+    outcome = await cancel_tasks(db, execution_id, **scope)
+    # Runners in this process stop now; worker processes notice on their next sweep
+    stopped = await runner_reaper.sweep() if outcome["cancelled"] else {"cancelled": 0}
+    return {"execution_id": execution_id, **outcome, "runners_stopped": stopped["cancelled"]}
+
+
+@router.post("/execution/{execution_id}/cancel", response_model=CancelResponse)
+async def cancel_execution(execution_id: str, db: AsyncSession = Depends(get_async_db)):
+    """
+    Cancel every Pending or Running task of an execution. Running agents are
+    stopped and their browsers closed; the rows end up "Cancelled".
+    """
+    if status_counters.execution(execution_id) is None:
+        raise HTTPException(status_code=404, detail="No tasks found for this execution ID")
+    return await _cancel(db, execution_id)
+
+
+@router.post("/execution/{execution_id}/file/{file_name}/cancel", response_model=CancelResponse)
+async def cancel_file(execution_id: str, file_name: str, db: AsyncSession = Depends(get_async_db)):
+    """
+    Cancel the unfinished tasks of one uploaded file.
+    """
+    from urllib.parse import unquote
+    file_name = unquote(file_name)
+    if status_counters.file(execution_id, file_name) is None:
+        raise HTTPException(status_code=404,
+                            detail=f"No tasks found for file '{file_name}' in execution '{execution_id}'")
+    return await _cancel(db, execution_id, file_name=file_name)
+
+
+@router.post("/task/{row_task_id}/cancel", response_model=CancelResponse)
+async def cancel_task(row_task_id: str, db: AsyncSession = Depends(get_async_db)):
+    """
+    Cancel one row. Inside a batch the row stays Cancelled whatever the batch
+    agent reports for it; the batch agent stops once none of its rows are left.
+    """
+    execution_id = await _resolve_task_execution(db, row_task_id)
+    return await _cancel(db, execution_id, row_task_id=row_task_id)
+
+@router.post("/execution/{execution_id}/rerun_failed", response_model=RerunResponse)
+async def rerun_failed_execution(
+    execution_id: str,
+    email: str = Form(...),
+    password: str = Form(...),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Queue only the Failed and TimedOut rows of an execution again, with the
+    row data they were uploaded with. Credentials are not kept after a run,
+    so they are passed again like on /start.
+    """
+    if status_counters.execution(execution_id) is None:
+        raise HTTPException(status_code=404, detail="No tasks found for this execution ID")
+    outcome = await rerun_failed_tasks(db, execution_id, {"email": email, "password": password})
+    return {"execution_id": execution_id, **outcome}
+
+
+@router.post("/execution/{execution_id}/file/{file_name}/rerun_failed", response_model=RerunResponse)
+async def rerun_failed_file(
+    execution_id: str,
+    file_name: str,
+    email: str = Form(...),
+    password: str = Form(...),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Queue the Failed and TimedOut rows of one uploaded file again.
+    """
+    from urllib.parse import unquote
+    file_name = unquote(file_name)
+    if status_counters.file(execution_id, file_name) is None:
+        raise HTTPException(status_code=404,
+                            detail=f"No tasks found for file '{file_name}' in execution '{execution_id}'")
+    outcome = await rerun_failed_tasks(db, execution_id, {"email": email, "password": password}, file_name=file_name)
+    return {"execution_id": execution_id, **outcome}
+
+
+async def _export(db: AsyncSession, execution_id: str, file_name: Optional[str], format: str):
+    if format not in EXPORT_FORMATS:
+        raise HTTPException(status_code=400, detail=f"Unknown format '{format}'; choose from {list(EXPORT_FORMATS)}")
+    if not await has_export_rows(db, execution_id, file_name):
+        raise HTTPException(status_code=404, detail="No exportable rows found")
+    stem = os.path.splitext(file_name)[0] if file_name else execution_id
+    download_name = f"{stem}_results.{format}"
+    if format == "csv":
+        return StreamingResponse(
+            stream_csv(execution_id, file_name),
+            media_type="text/csv",
+            headers={"Content-Disposition": f'attachment; filename="{download_name}"'}
+        )
+    path = await asyncio.to_thread(write_xlsx, execution_id, file_name)
+    return FileResponse(
+        path,
+        media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+        filename=download_name,
+        background=BackgroundTask(os.remove, path)
+    )
+
+
+@router.get("/execution/{execution_id}/export")
+async def export_execution(execution_id: str, format: str = "xlsx", db: AsyncSession = Depends(get_async_db)):
+    """
+    Download an execution's uploaded rows in file order with status,
+    duration, final_result, error and row_task_id columns appended, as
+    xlsx or csv. Rows of several files are exported one file after the
+    other, with a leading file_name column.
+    """
+    return await _export(db, execution_id, None, format)
+
+
+@router.get("/execution/{execution_id}/file/{file_name}/export")
+async def export_file(execution_id: str, file_name: str, format: str = "xlsx",
+                      db: AsyncSession = Depends(get_async_db)):
+    """
+    Download one uploaded file back with the status and result columns appended.
+    """
+    from urllib.parse import unquote
+    return await _export(db, execution_id, unquote(file_name), format)
+
 @router.get("/executions", response_model=ExecutionsListResponse)
-async def get_all_executions(limit: int = 100, offset: int = 0, db: Session = Depends(get_db)):
+async def get_all_executions(
+    limit: int = 100,
+    cursor: Optional[str] = None,
+    agentId: Optional[str] = None,
+    status: Optional[str] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    db: AsyncSession = Depends(get_async_db)
+):
     """
-    Get a list of all executions and their overall status.
+    Get a page of executions and their overall status, ordered by execution_id.
+    Pass the returned next_cursor as cursor to fetch the following page.
+    Optional filters: agentId, status (executions with at least one task in it)
+    and since/until (executions with task activity inside that time range).
+    Served from the execution_summary tables kept up to date by
+    controllers.status, so the cost does not grow with the number of tasks.
     """
-    # Get unique execution IDs
-    execution_ids = db.query(TaskTracker.execution_id).distinct().offset(offset).limit(limit).all()
-    
-    if not execution_ids:
-        return {"executions": []}
-    
+    limit = max(1, min(limit, 1000))
+    query = select(ExecutionSummaryEntry).order_by(ExecutionSummaryEntry.execution_id).limit(limit + 1)
+    if cursor:
+        query = query.where(ExecutionSummaryEntry.execution_id > cursor)
+    if agentId:
+        query = query.where(select(ExecutionMember.execution_id).where(
+            ExecutionMember.execution_id == ExecutionSummaryEntry.execution_id,
+            ExecutionMember.kind == "agent",
+            ExecutionMember.value == agentId
+        ).exists())
+    if status:
+        query = query.where(select(ExecutionStatusCount.execution_id).where(
+            ExecutionStatusCount.execution_id == ExecutionSummaryEntry.execution_id,
+            ExecutionStatusCount.status == status,
+            ExecutionStatusCount.count > 0
+        ).exists())
+    if since:
+        query = query.where(ExecutionSummaryEntry.last_updated >= since)
+    if until:
+        query = query.where(ExecutionSummaryEntry.first_seen <= until)
+
+    result = await db.execute(query)
+    entries = result.scalars().all()
+    next_cursor = None
+    if len(entries) > limit:
+        entries = entries[:limit]
+        next_cursor = entries[-1].execution_id
+
+    if not entries:
+        return {"executions": [], "next_cursor": None}
+
+    execution_ids = [entry.execution_id for entry in entries]
+    status_counts = {execution_id: {} for execution_id in execution_ids}
+    result = await db.execute(select(ExecutionStatusCount).where(
+        ExecutionStatusCount.execution_id.in_(execution_ids),
+        ExecutionStatusCount.count > 0
+    ))
+    for counter in result.scalars().all():
+        status_counts[counter.execution_id][counter.status] = counter.count
+
+    members = {execution_id: {"file": [], "agent": []} for execution_id in execution_ids}
+    result = await db.execute(select(ExecutionMember).where(ExecutionMember.execution_id.in_(execution_ids)))
+    for member in result.scalars().all():
+        members[member.execution_id].setdefault(member.kind, []).append(member.value)
+
     executions = []
-    for (execution_id,) in execution_ids:
-        # Get execution stats
-        stats = db.query(
-            TaskTracker.status,
-            db.func.count(TaskTracker.id).label('count')
-        ).filter(
-            TaskTracker.execution_id == execution_id
-        ).group_by(TaskTracker.status).all()
-        
-        # Calculate status counts
-        status_counts = {status: count for status, count in stats}
-        total = sum(status_counts.values())
-        
-        # Get file names
-        file_names = db.query(TaskTracker.file_name).filter(
-            TaskTracker.execution_id == execution_id
-        ).distinct().all()
-        file_names = [name for (name,) in file_names]
-        
-        # Get agents
-        agents = db.query(TaskTracker.agent_id).filter(
-            TaskTracker.execution_id == execution_id
-        ).distinct().all()
-        agents = [agent for (agent,) in agents]
-        
+    for entry in entries:
+        counts = status_counts[entry.execution_id]
+        total = sum(counts.values())
+
         # Calculate completion percentage
-        completed = status_counts.get('Completed', 0)
+        completed = counts.get('Completed', 0)
         completion_percentage = (completed / total * 100) if total > 0 else 0
-        
+
         executions.append({
-            "execution_id": execution_id,
-            "files": file_names,
-            "agents": agents,
+            "execution_id": entry.execution_id,
+            "files": members[entry.execution_id]["file"],
+            "agents": members[entry.execution_id]["agent"],
             "total_tasks": total,
-            "status_counts": status_counts,
+            "status_counts": counts,
             "completion_percentage": round(completion_percentage, 2),
-            "is_complete": total > 0 and (status_counts.get('Pending', 0) + 
-                                          status_counts.get('Running', 0) + 
-                                          status_counts.get('Processing', 0) == 0)
+            "is_complete": total > 0 and (counts.get('Pending', 0) +
+                                          counts.get('Running', 0) +
+                                          counts.get('Processing', 0) == 0)
         })
-    
-    return {"executions": executions}
+
+    return {"executions": executions, "next_cursor": next_cursor}
 
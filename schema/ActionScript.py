@@ -0,0 +1,12 @@
+from sqlalchemy import Column, String, Integer, DateTime, JSON
+from sqlalchemy.sql import func
+from database.connector import Base
+
+class ActionScript(Base):
+    __tablename__ = "action_scripts"
+
+    template_id = Column(String, primary_key=True, index=True)  # {app_type}_{operation}
+    history = Column(JSON)  # Parameterised AgentHistoryList dump
+    step_count = Column(Integer)
+    recorded_from = Column(String)  # row_task_id of the run it was recorded from
+    updated_at = Column(DateTime, server_default=func.now(), onupdate=func.now())
@@ -0,0 +1,29 @@
+from datetime import datetime
+from sqlalchemy import Column, String, Integer, DateTime, JSON, Index
+from database.connector import Base
+
+class AgentJob(Base):
+    __tablename__ = "agent_jobs"
+
+    id = Column(String, primary_key=True)  # row_task_id for row jobs, batch_id for batch jobs
+    kind = Column(String)  # "row" or "batch"
+    execution_id = Column(String, index=True)
+    agent_id = Column(String)
+    row_task_ids = Column(JSON)  # Tracker rows this job drives
+    payload = Column(JSON)  # Arguments for the runner; credentials are kept in job_secrets
+    status = Column(String)  # queued, leased, done, failed, cancelled
+    priority = Column(Integer, default=1)  # 0 low, 1 normal, 2 high
+    attempts = Column(Integer, default=0)  # Leases of the current run, for crash recovery
+    retries = Column(Integer, default=0)  # Automatic retries of failed rows so far
+    available_at = Column(DateTime)  # Not claimed before this time (retry backoff)
+    lease_owner = Column(String)
+    lease_expires_at = Column(DateTime)
+    created_at = Column(DateTime, default=datetime.now)
+    started_at = Column(DateTime)  # Last time a worker claimed it
+    updated_at = Column(DateTime, default=datetime.now, onupdate=datetime.now)
+
+    __table_args__ = (
+        Index("ix_agent_jobs_status_created", "status", "created_at"),
+        Index("ix_agent_jobs_status_lease", "status", "lease_expires_at"),
+        Index("ix_agent_jobs_status_tenant", "status", "agent_id", "execution_id", "priority", "created_at"),
+    )
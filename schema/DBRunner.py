@@ -1,5 +1,5 @@
 from sqlalchemy import JSON
-from sqlalchemy import Column, String, Boolean, Integer, PickleType
+from sqlalchemy import Column, String, Boolean, Integer, Float, PickleType
 from database.connector import Base
 
 class DBRunner(Base):
@@ -14,3 +14,10 @@ class Task(Base):
     initial_actions = Column(JSON)
     operation_description=Column(String)
     operation_steps=Column(String)
+    # Per-operation run limits; NULL falls back to AGENT_RUN_TIMEOUT_SECONDS / AGENT_MAX_STEPS
+    timeout_seconds = Column(Integer)
+    max_steps = Column(Integer)
+    # Per-operation retry policy; NULL falls back to the AGENT_RETRY_* defaults
+    retry_max_attempts = Column(Integer)  # Runs per row including the first
+    retry_backoff_seconds = Column(Float)  # Wait before the first retry, doubled for each later one
+    retry_on = Column(JSON)  # Retryable failure classes, see controllers.retry.FAILURE_CLASSES
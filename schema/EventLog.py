@@ -0,0 +1,12 @@
+from datetime import datetime
+from sqlalchemy import Column, String, Integer, DateTime, JSON
+from database.connector import Base
+
+class EventLog(Base):
+    __tablename__ = "event_log"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    execution_id = Column(String)
+    kind = Column(String)  # counts, touch or event
+    data = Column(JSON)
+    created_at = Column(DateTime, default=datetime.now, index=True)
@@ -0,0 +1,33 @@
+from sqlalchemy import Column, String, Integer, DateTime, Index
+from sqlalchemy.sql import func
+from database.connector import Base
+
+class ExecutionSummaryEntry(Base):
+    __tablename__ = "execution_summary"
+
+    execution_id = Column(String, primary_key=True)
+    total_tasks = Column(Integer, default=0)
+    first_seen = Column(DateTime, server_default=func.now(), index=True)
+    last_updated = Column(DateTime, server_default=func.now(), index=True)
+
+class ExecutionStatusCount(Base):
+    __tablename__ = "execution_status_counts"
+
+    execution_id = Column(String, primary_key=True)
+    status = Column(String, primary_key=True)
+    count = Column(Integer, default=0)
+
+    __table_args__ = (
+        Index("ix_execution_status_counts_status", "status", "execution_id"),
+    )
+
+class ExecutionMember(Base):
+    __tablename__ = "execution_members"
+
+    execution_id = Column(String, primary_key=True)
+    kind = Column(String, primary_key=True)  # "file" or "agent"
+    value = Column(String, primary_key=True)
+
+    __table_args__ = (
+        Index("ix_execution_members_kind_value", "kind", "value", "execution_id"),
+    )
@@ -0,0 +1,12 @@
+from datetime import datetime
+from sqlalchemy import Column, String, DateTime, JSON
+from database.connector import Base
+
+class JobSecret(Base):
+    __tablename__ = "job_secrets"
+
+    # Credentials of a queued or running job, kept out of agent_jobs.payload
+    # and deleted as soon as the job can no longer run
+    job_id = Column(String, primary_key=True)
+    sensitive_data = Column(JSON)
+    created_at = Column(DateTime, default=datetime.now)
@@ -0,0 +1,22 @@
+from sqlalchemy import Column, String, Integer, Float, DateTime, Boolean, Index
+from database.connector import Base
+
+class TaskAttempt(Base):
+    __tablename__ = "task_attempts"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    row_task_id = Column(String)
+    execution_id = Column(String, index=True)
+    job_id = Column(String)
+    attempt = Column(Integer)  # 1 for a row's first run, counting retries and reruns
+    status = Column(String)  # Outcome of the run: Completed, Failed, TimedOut or Cancelled
+    failure_class = Column(String)  # See controllers.retry.FAILURE_CLASSES
+    error = Column(String)
+    retried = Column(Boolean, default=False)  # Whether a retry was scheduled after it
+    started_at = Column(DateTime)
+    finished_at = Column(DateTime)
+    duration = Column(Float)  # Duration in seconds
+
+    __table_args__ = (
+        Index("ix_task_attempts_row_attempt", "row_task_id", "attempt"),
+    )
@@ -0,0 +1,19 @@
+from sqlalchemy import Column, String, Integer, JSON, Index
+from database.connector import Base
+
+class TaskInput(Base):
+    __tablename__ = "task_inputs"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    row_task_id = Column(String)
+    execution_id = Column(String)
+    file_name = Column(String)
+    upload_id = Column(Integer)  # uploads.id, so an interrupted upload can resume
+    row_index = Column(Integer)  # 0-based data row of the uploaded file
+    data = Column(JSON)  # The row as uploaded, column -> value
+
+    __table_args__ = (
+        # Exports read an execution's rows back in file order
+        Index("ix_task_inputs_execution_file_row", "execution_id", "file_name", "row_index"),
+        Index("ix_task_inputs_upload", "upload_id"),
+    )
@@ -0,0 +1,23 @@
+from datetime import datetime
+from sqlalchemy import Column, String, Integer, Text, DateTime, Boolean, LargeBinary, Index
+from database.connector import Base
+
+class TaskResult(Base):
+    __tablename__ = "task_results"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    row_task_id = Column(String)  # Or a batch id, for the batch run's own transcript
+    execution_id = Column(String, index=True)
+    job_id = Column(String)
+    done = Column(Boolean)
+    replayed = Column(Boolean, default=False)
+    final_result = Column(Text)
+    error = Column(Text)
+    details = Column(LargeBinary)  # zlib-compressed JSON: urls, errors, model_thoughts
+    details_size = Column(Integer)  # Uncompressed size of details in bytes
+    updated_at = Column(DateTime, default=datetime.now, onupdate=datetime.now)
+
+    __table_args__ = (
+        # Latest run only; earlier runs are in task_attempts
+        Index("ux_task_results_row", "row_task_id", unique=True),
+    )
@@ -1,5 +1,6 @@
-from sqlalchemy import Column, String, Integer, Float, DateTime, ForeignKey
+from sqlalchemy import Column, String, Integer, Float, DateTime, ForeignKey, Index
 from sqlalchemy.sql import func
+from datetime import datetime
 from database.connector import Base
 
 class TaskTracker(Base):
@@ -11,6 +12,18 @@ class TaskTracker(Base):
     agent_id = Column(String, index=True)
     row_task_id = Column(String, index=True)
     operation = Column(String)
-    status = Column(String)  # Pending, Completed, Failed, Running, etc.
+    status = Column(String)  # Pending, Running, Completed, Failed, Cancelled, TimedOut
     time_stamp = Column(DateTime, server_default=func.now())
     duration = Column(Float)  # Duration in seconds
+    attempts = Column(Integer, default=0)  # Runs started, including retries and reruns
+    job_id = Column(String)  # agent_jobs row that runs it
+    row_hash = Column(String)  # Fingerprint of the row's normalized data, see controllers.task.row_hash
+    duplicate_of = Column(String)  # row_task_id of the identical row whose run it shares
+    updated_at = Column(DateTime, default=datetime.now, onupdate=datetime.now)
+
+    __table_args__ = (
+        Index("ix_task_tracker_execution_status", "execution_id", "status"),
+        Index("ix_task_tracker_execution_file", "execution_id", "file_name"),
+        Index("ix_task_tracker_execution_updated", "execution_id", "updated_at"),
+        Index("ix_task_tracker_execution_hash", "execution_id", "row_hash"),
+    )
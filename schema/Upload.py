@@ -0,0 +1,22 @@
+from datetime import datetime
+from sqlalchemy import Column, String, Integer, DateTime, Index
+from database.connector import Base
+
+class Upload(Base):
+    __tablename__ = "uploads"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    execution_id = Column(String)
+    file_hash = Column(String)  # sha256 of the uploaded bytes
+    file_name = Column(String)
+    agent_id = Column(String)
+    status = Column(String)  # processing, done, failed
+    row_count = Column(Integer)  # Tracker rows created
+    duplicate_rows = Column(Integer)  # Rows collapsed onto an identical row's run
+    created_at = Column(DateTime, default=datetime.now)
+    updated_at = Column(DateTime, default=datetime.now, onupdate=datetime.now)
+
+    __table_args__ = (
+        # One upload of the same content per execution; repeats return the first
+        Index("ux_uploads_execution_hash", "execution_id", "file_hash", unique=True),
+    )
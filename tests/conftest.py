@@ -0,0 +1,55 @@
+import asyncio
+import importlib
+import os
+import pkgutil
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+
+@pytest.fixture(scope="session")
+def database(tmp_path_factory):
+    """
+    A scratch runs.db with every table. database.connector opens ./runs.db
+    relative to the working directory on first connect, so the tests move
+    to a temporary directory before anything touches the database.
+    """
+    directory = tmp_path_factory.mktemp("db")
+    previous = os.getcwd()
+    os.chdir(directory)
+    import schema
+    from database.connector import Base, engine, ensure_schema
+    for module in pkgutil.iter_modules(list(schema.__path__)):
+        importlib.import_module(f"schema.{module.name}")
+    Base.metadata.create_all(bind=engine)
+    ensure_schema()
+    yield engine
+    engine.dispose()
+    os.chdir(previous)
+
+
+@pytest.fixture
+def run_db(database):
+    """
+    Empty every table, then return run(coroutine_function), which runs it in
+    a fresh event loop and closes the async engine's connections afterwards
+    (they belong to the loop that opened them).
+    """
+    from database.connector import Base, async_engine
+    with database.begin() as connection:
+        for table in reversed(Base.metadata.sorted_tables):
+            connection.execute(table.delete())
+
+    def run(function, *args, **kwargs):
+        async def main():
+            try:
+                return await function(*args, **kwargs)
+            finally:
+                await async_engine.dispose()
+        return asyncio.run(main())
+
+    return run
@@ -0,0 +1,51 @@
+import time
+from datetime import datetime, timedelta
+
+import pytest
+
+pytest.importorskip("browser_use")
+
+from sqlalchemy import insert
+
+from database.connector import AsyncSessionLocal
+from model.Agent_input import BulkStatusRequest
+from routes.router import get_bulk_task_status
+from schema.TaskTracker import TaskTracker
+
+
+async def _poll(**request):
+    async with AsyncSessionLocal() as db:
+        started = time.monotonic()
+        response = await get_bulk_task_status(BulkStatusRequest(execution_id="e1", **request), db)
+        return response, time.monotonic() - started
+
+
+async def _add_row(updated_at: datetime):
+    async with AsyncSessionLocal() as db:
+        await db.execute(insert(TaskTracker).values(row_task_id="r1", execution_id="e1", status="Running",
+                                                    updated_at=updated_at))
+        await db.commit()
+
+
+def test_client_side_changed_since_returns_right_away(run_db):
+    async def main():
+        await _add_row(datetime.now() - timedelta(seconds=5))
+        return await _poll(changed_since=datetime.now() - timedelta(seconds=10), wait=2)
+
+    response, waited = run_db(main)
+    assert [task[0] for task in response["tasks"]] == ["r1"]
+    assert waited < 1
+
+
+def test_issued_as_of_waits_past_rows_already_sent(run_db):
+    async def main():
+        await _add_row(datetime.now() - timedelta(seconds=5))
+        first, _ = await _poll()
+        second, waited = await _poll(changed_since=first["as_of"], wait=1)
+        return first, second, waited
+
+    first, second, waited = run_db(main)
+    assert [task[0] for task in first["tasks"]] == ["r1"]
+    # r1 is inside the margin of the as_of, so the poll waits it out
+    assert waited >= 1
+    assert [task[0] for task in second["tasks"]] == ["r1"]
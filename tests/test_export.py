@@ -0,0 +1,74 @@
+import csv
+import io
+import os
+
+from openpyxl import load_workbook
+from sqlalchemy import insert
+
+from controllers.export import stream_csv, write_xlsx
+from database.connector import AsyncSessionLocal
+from schema.TaskInput import TaskInput
+from schema.TaskResult import TaskResult
+from schema.TaskTracker import TaskTracker
+
+# Inserted out of file order; the upload has its own "status" column
+ROWS = [
+    (2, {"name": "Linus", "status": "new", "phone": "+49 30 1234"}, "Failed", None, "=HYPERLINK(\"x\")"),
+    (0, {"name": "Ada", "status": "vip", "phone": "-5"}, "Completed", "@SUM(A1)", None),
+    (1, {"name": "=cmd|' /C calc'!A0", "status": "new", "phone": "12"}, "Completed", "Saved", None),
+]
+
+
+async def _add_rows():
+    async with AsyncSessionLocal() as db:
+        for index, data, status, final_result, error in ROWS:
+            row_task_id = f"r{index}"
+            await db.execute(insert(TaskInput).values(row_task_id=row_task_id, execution_id="e1", file_name="f.xlsx",
+                                                      row_index=index, data=data))
+            await db.execute(insert(TaskTracker).values(row_task_id=row_task_id, execution_id="e1", file_name="f.xlsx",
+                                                        status=status, duration=1.5))
+            await db.execute(insert(TaskResult).values(row_task_id=row_task_id, execution_id="e1",
+                                                       final_result=final_result, error=error))
+        await db.commit()
+
+
+def _read_csv(run_db) -> list:
+    async def main():
+        await _add_rows()
+        return "".join([chunk async for chunk in stream_csv("e1", "f.xlsx")])
+
+    text = run_db(main)
+    assert text.startswith("\ufeff")
+    return list(csv.reader(io.StringIO(text[1:])))
+
+
+def test_csv_export(run_db):
+    header, *rows = _read_csv(run_db)
+
+    assert header == ["name", "status", "phone", "agent_status", "duration", "final_result", "error", "row_task_id"]
+    assert [row[-1] for row in rows] == ["r0", "r1", "r2"]
+    assert rows[0][:6] == ["Ada", "vip", "-5", "Completed", "1.5", "'@SUM(A1)"]
+    assert rows[1][0] == "'=cmd|' /C calc'!A0"
+    assert rows[2][2] == "+49 30 1234"
+    assert rows[2][6] == "'=HYPERLINK(\"x\")"
+
+
+def test_xlsx_export(run_db):
+    run_db(_add_rows)
+    path = write_xlsx("e1")
+    try:
+        sheet = load_workbook(path).active
+        header, *rows = sheet.iter_rows()
+    finally:
+        os.remove(path)
+
+    assert [cell.value for cell in header] == ["file_name", "name", "status", "phone", "agent_status", "duration",
+                                               "final_result", "error", "row_task_id"]
+    assert [row[-1].value for row in rows] == ["r0", "r1", "r2"]
+    # Formula-like text is kept as is, but stored as a quoted string
+    for cell in (rows[0][6], rows[1][1], rows[2][7]):
+        assert cell.value in ("@SUM(A1)", "=cmd|' /C calc'!A0", "=HYPERLINK(\"x\")")
+        assert cell.data_type == "s"
+        assert cell.quotePrefix
+    assert (rows[0][3].value, rows[2][3].value) == ("-5", "+49 30 1234")
+    assert not rows[0][3].quotePrefix
@@ -0,0 +1,64 @@
+from collections import Counter
+from datetime import datetime, timedelta
+
+import pytest
+
+from controllers.fair_share import plan_claims, priority_level, JOB_AGING_SECONDS
+
+NOW = datetime(2026, 1, 1, 12, 0, 0)
+
+
+def _plan(groups, slots, running_by_agent=None, running_by_execution=None, tenant_cap=0):
+    return plan_claims(groups, Counter(running_by_agent or {}), Counter(running_by_execution or {}), slots,
+                       now=NOW, tenant_cap=tenant_cap)
+
+
+def test_agents_share_slots_equally():
+    groups = [("a", "e1", 1, 100, NOW), ("b", "e2", 1, 100, NOW)]
+    assert _plan(groups, 10) == Counter({("a", "e1", 1): 5, ("b", "e2", 1): 5})
+
+
+def test_small_upload_is_not_starved_by_a_huge_one():
+    groups = [("a", "big", 1, 10000, NOW - timedelta(seconds=1)), ("a", "small", 1, 3, NOW)]
+    plan = _plan(groups, 6)
+    assert plan[("a", "small", 1)] == 3
+    assert plan[("a", "big", 1)] == 3
+
+
+def test_each_priority_level_doubles_the_share():
+    groups = [("a", "e1", 2, 100, NOW), ("b", "e2", 0, 100, NOW)]
+    assert _plan(groups, 10) == Counter({("a", "e1", 2): 8, ("b", "e2", 0): 2})
+
+
+def test_running_jobs_count_against_the_share():
+    groups = [("a", "e1", 1, 100, NOW), ("b", "e2", 1, 100, NOW)]
+    plan = _plan(groups, 4, running_by_agent={"a": 4}, running_by_execution={"e1": 4})
+    assert plan == Counter({("b", "e2", 1): 4})
+
+
+def test_waiting_raises_a_group_weight():
+    # Waiting one aging period doubles the weight, matching one priority level
+    waited = NOW - timedelta(seconds=JOB_AGING_SECONDS)
+    groups = [("a", "e1", 0, 100, waited), ("b", "e2", 1, 100, NOW)]
+    plan = _plan(groups, 10)
+    assert plan[("a", "e1", 0)] == plan[("b", "e2", 1)] == 5
+
+
+def test_tenant_cap_is_respected():
+    groups = [("a", "e1", 1, 100, NOW), ("b", "e2", 1, 100, NOW)]
+    plan = _plan(groups, 10, running_by_agent={"a": 1}, running_by_execution={"e1": 1}, tenant_cap=3)
+    assert plan == Counter({("a", "e1", 1): 2, ("b", "e2", 1): 3})
+
+
+def test_never_plans_more_than_queued_or_slots():
+    groups = [("a", "e1", 1, 2, NOW), ("b", "e2", 1, 1, NOW)]
+    assert sum(_plan(groups, 10).values()) == 3
+    assert sum(_plan(groups, 2).values()) == 2
+    assert _plan([], 5) == Counter()
+
+
+def test_priority_level_names():
+    assert priority_level(None) == 1
+    assert priority_level("HIGH") == 2
+    with pytest.raises(ValueError):
+        priority_level("urgent")
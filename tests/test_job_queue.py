@@ -0,0 +1,225 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+pytest.importorskip("browser_use")
+
+from sqlalchemy import select, update, insert
+
+from controllers import job_queue
+from controllers.status import bulk_set_status
+from database.connector import AsyncSessionLocal
+from schema.AgentJob import AgentJob
+from schema.JobSecret import JobSecret
+from schema.TaskTracker import TaskTracker
+
+
+def _job(job_id: str, execution_id: str = "e1", agent_id: str = "a1", priority: int = 1, **payload) -> dict:
+    return {
+        "id": job_id,
+        "kind": "row",
+        "execution_id": execution_id,
+        "agent_id": agent_id,
+        "priority": priority,
+        "row_task_ids": [job_id],
+        "payload": {"session_id": job_id, **payload}
+    }
+
+
+async def _enqueue(db, jobs: list):
+    await job_queue.enqueue_jobs(db, jobs)
+    await db.commit()
+    # Distinct creation times, in list order
+    start = datetime.now() - timedelta(minutes=1)
+    for offset, job in enumerate(jobs):
+        await db.execute(update(AgentJob).where(AgentJob.id == job["id"])
+                         .values(created_at=start + timedelta(seconds=offset)))
+    await db.commit()
+
+
+async def _jobs(db) -> dict:
+    result = await db.execute(select(AgentJob))
+    return {job.id: job for job in result.scalars().all()}
+
+
+async def _add_rows(db, *row_task_ids, status="Pending"):
+    await db.execute(insert(TaskTracker), [
+        {"row_task_id": row_task_id, "execution_id": "e1", "file_name": "f.xlsx", "agent_id": "a1",
+         "status": status, "job_id": row_task_id}
+        for row_task_id in row_task_ids
+    ])
+    await db.commit()
+
+
+async def _secrets(db) -> dict:
+    result = await db.execute(select(JobSecret.job_id, JobSecret.sensitive_data))
+    return dict(result.all())
+
+
+async def _statuses(db) -> dict:
+    result = await db.execute(select(TaskTracker.row_task_id, TaskTracker.status))
+    return dict(result.all())
+
+
+CREDENTIALS = {"email": "user@example.com", "password": "secret"}
+
+
+def test_claim_leases_oldest_jobs_first(run_db):
+    async def main():
+        async with AsyncSessionLocal() as db:
+            await _enqueue(db, [_job(f"j{index}") for index in range(5)])
+            claimed = await job_queue.claim_jobs(db, "worker-1", 3)
+            return claimed, await _jobs(db)
+
+    claimed, jobs = run_db(main)
+    assert [job.id for job in claimed] == ["j0", "j1", "j2"]
+    assert all(job.attempts == 1 for job in claimed)
+    for job_id in ("j0", "j1", "j2"):
+        assert jobs[job_id].status == "leased"
+        assert jobs[job_id].lease_owner == "worker-1"
+        assert jobs[job_id].lease_expires_at > datetime.now()
+    assert jobs["j3"].status == jobs["j4"].status == "queued"
+
+
+def test_claim_skips_leased_and_backed_off_jobs(run_db):
+    async def main():
+        async with AsyncSessionLocal() as db:
+            await _enqueue(db, [_job(f"j{index}") for index in range(3)])
+            await db.execute(update(AgentJob).where(AgentJob.id == "j2")
+                             .values(available_at=datetime.now() + timedelta(minutes=5)))
+            await db.commit()
+            first = await job_queue.claim_jobs(db, "worker-1", 1)
+            second = await job_queue.claim_jobs(db, "worker-2", 5)
+            return first, second
+
+    first, second = run_db(main)
+    assert [job.id for job in first] == ["j0"]
+    assert [job.id for job in second] == ["j1"]
+
+
+def test_claim_spreads_slots_across_executions(run_db):
+    async def main():
+        async with AsyncSessionLocal() as db:
+            await _enqueue(db, [_job(f"big{index}", "big") for index in range(20)] +
+                           [_job(f"small{index}", "small") for index in range(2)])
+            return await job_queue.claim_jobs(db, "worker-1", 4)
+
+    claimed = run_db(main)
+    by_execution = sorted(job.execution_id for job in claimed)
+    assert by_execution == ["big", "big", "small", "small"]
+
+
+def test_credentials_are_kept_out_of_the_job_row(run_db):
+    async def main():
+        async with AsyncSessionLocal() as db:
+            await _enqueue(db, [_job("j0", sensitive_data=CREDENTIALS)])
+            claimed = await job_queue.claim_jobs(db, "worker-1", 1)
+            return claimed[0], await job_queue.load_job_secret(db, claimed[0]), await _secrets(db)
+
+    job, sensitive_data, secrets = run_db(main)
+    assert "sensitive_data" not in job.payload
+    assert sensitive_data == CREDENTIALS
+    assert secrets == {"j0": CREDENTIALS}
+
+
+def test_requeue_returns_jobs_and_rows_to_the_queue(run_db):
+    async def main():
+        async with AsyncSessionLocal() as db:
+            await _enqueue(db, [_job("j0", sensitive_data=CREDENTIALS)])
+            await _add_rows(db, "j0", status="Running")
+            await job_queue.claim_jobs(db, "worker-1", 1)
+            counts = await job_queue.requeue_jobs(db, AgentJob.lease_owner == "worker-1")
+            return counts, await _jobs(db), await _statuses(db), await _secrets(db)
+
+    counts, jobs, statuses, secrets = run_db(main)
+    assert counts == {"requeued": 1, "failed": 0}
+    assert (jobs["j0"].status, jobs["j0"].lease_owner, jobs["j0"].attempts) == ("queued", None, 1)
+    assert statuses == {"j0": "Pending"}
+    assert secrets == {"j0": CREDENTIALS}
+
+
+def test_requeue_refunds_the_attempt_on_shutdown(run_db):
+    async def main():
+        async with AsyncSessionLocal() as db:
+            await _enqueue(db, [_job("j0")])
+            await _add_rows(db, "j0")
+            await job_queue.claim_jobs(db, "worker-1", 1)
+            await job_queue.requeue_jobs(db, AgentJob.id == "j0", refund_attempt=True)
+            return await _jobs(db)
+
+    assert run_db(main)["j0"].attempts == 0
+
+
+def test_requeue_fails_exhausted_jobs_and_drops_their_credentials(run_db):
+    async def main():
+        async with AsyncSessionLocal() as db:
+            # A job queued by an older version, credentials still in its payload
+            await _enqueue(db, [_job("j0")])
+            await db.execute(update(AgentJob).where(AgentJob.id == "j0").values(
+                payload={"session_id": "j0", "sensitive_data": CREDENTIALS}))
+            await _enqueue(db, [_job("j1", sensitive_data=CREDENTIALS)])
+            await _add_rows(db, "j0", "j1", status="Running")
+            await db.execute(update(AgentJob).values(attempts=job_queue.JOB_MAX_ATTEMPTS - 1))
+            await db.commit()
+            await job_queue.claim_jobs(db, "worker-1", 2)
+            counts = await job_queue.requeue_jobs(db, AgentJob.lease_expires_at > datetime.now())
+            return counts, await _jobs(db), await _statuses(db), await _secrets(db)
+
+    counts, jobs, statuses, secrets = run_db(main)
+    assert counts == {"requeued": 0, "failed": 2}
+    assert {job.status for job in jobs.values()} == {"failed"}
+    assert all("sensitive_data" not in job.payload for job in jobs.values())
+    assert statuses == {"j0": "Failed", "j1": "Failed"}
+    assert secrets == {}
+
+
+def test_finished_and_cancelled_jobs_drop_their_credentials(run_db):
+    async def main():
+        async with AsyncSessionLocal() as db:
+            await _enqueue(db, [_job("j0", sensitive_data=CREDENTIALS), _job("j1", sensitive_data=CREDENTIALS),
+                                _job("j2", sensitive_data=CREDENTIALS)])
+            await _add_rows(db, "j0", "j1", "j2")
+            claimed = await job_queue.claim_jobs(db, "worker-1", 1)
+            await job_queue.finish_job(db, claimed[0], "done")
+            await job_queue.cancel_tasks(db, "e1", row_task_id="j1")
+            return await _jobs(db), await _secrets(db)
+
+    jobs, secrets = run_db(main)
+    assert (jobs["j0"].status, jobs["j1"].status, jobs["j2"].status) == ("done", "cancelled", "queued")
+    assert secrets == {"j2": CREDENTIALS}
+
+
+def test_purge_drops_orphaned_credentials(run_db):
+    async def main():
+        async with AsyncSessionLocal() as db:
+            await _enqueue(db, [_job("j0", sensitive_data=CREDENTIALS), _job("j1")])
+            await db.execute(update(AgentJob).where(AgentJob.id == "j1").values(
+                status="done", payload={"session_id": "j1", "sensitive_data": CREDENTIALS}))
+            db.add(JobSecret(job_id="gone", sensitive_data=CREDENTIALS))
+            await db.commit()
+            purged = await job_queue.purge_job_secrets(db)
+            return purged, await _jobs(db), await _secrets(db)
+
+    purged, jobs, secrets = run_db(main)
+    assert purged == 1
+    assert secrets == {"j0": CREDENTIALS}
+    assert jobs["j1"].payload == {"session_id": "j1"}
+
+
+def test_rerun_stores_the_new_credentials(run_db):
+    async def main():
+        async with AsyncSessionLocal() as db:
+            await _enqueue(db, [_job("j0", sensitive_data=CREDENTIALS)])
+            await _add_rows(db, "j0")
+            claimed = await job_queue.claim_jobs(db, "worker-1", 1)
+            await job_queue.finish_job(db, claimed[0], "failed")
+            await bulk_set_status(db, "Failed", TaskTracker.row_task_id == "j0")
+            await db.commit()
+            counts = await job_queue.rerun_failed_tasks(db, "e1", {"email": "new@example.com"})
+            return counts, await _jobs(db), await _secrets(db)
+
+    counts, jobs, secrets = run_db(main)
+    assert counts == {"requeued": 1, "jobs_requeued": 1, "skipped": 0}
+    assert jobs["j0"].status == "queued"
+    assert "sensitive_data" not in jobs["j0"].payload
+    assert secrets == {"j0": {"email": "new@example.com"}}
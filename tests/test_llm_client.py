@@ -0,0 +1,121 @@
+import asyncio
+import json
+import time
+
+import httpx
+import pytest
+
+pytest.importorskip("langchain_openai")
+
+from controllers.llm_client import LLMRateLimiter, RateLimitedTransport, estimate_request_tokens
+
+BASE_URL = "http://llm.test/v1"
+
+
+def _client(limiter: LLMRateLimiter, handler) -> httpx.AsyncClient:
+    # The limiter in front of an in-process OpenAI-compatible stub
+    return httpx.AsyncClient(transport=RateLimitedTransport(limiter, httpx.MockTransport(handler)),
+                             base_url=BASE_URL)
+
+
+def _completion(request: httpx.Request) -> httpx.Response:
+    return httpx.Response(200, json={"choices": [{"message": {"role": "assistant", "content": "ok"}}]})
+
+
+def _body(index: int, max_tokens: int = 10) -> dict:
+    return {"model": "gpt-4o", "messages": [{"role": "user", "content": f"request {index}"}], "max_tokens": max_tokens}
+
+
+def test_requests_are_paced_to_rpm():
+    # 600 RPM refills one request every 0.1 s once the bucket is empty
+    limiter = LLMRateLimiter(requests_per_minute=600, tokens_per_minute=10 ** 9)
+    limiter.requests.tokens = 0
+
+    async def main():
+        sent = []
+
+        def handler(request):
+            sent.append(time.monotonic())
+            return _completion(request)
+
+        async with _client(limiter, handler) as client:
+            started = time.monotonic()
+            for index in range(5):
+                await client.post("/chat/completions", json=_body(index))
+        return started, sent
+
+    started, sent = asyncio.run(main())
+    assert sent[-1] - started >= 0.45
+    gaps = [later - earlier for earlier, later in zip(sent, sent[1:])]
+    assert min(gaps) >= 0.08
+    assert limiter.calls == 5
+
+
+def test_requests_are_paced_to_tpm():
+    body = json.dumps(_body(0, max_tokens=50)).encode("utf-8")
+    estimate = estimate_request_tokens(body)
+    # Three requests' worth of tokens per second
+    limiter = LLMRateLimiter(requests_per_minute=10 ** 6, tokens_per_minute=estimate * 180)
+    limiter.tokens.tokens = 0
+
+    async def main():
+        async with _client(limiter, _completion) as client:
+            started = time.monotonic()
+            for _ in range(3):
+                await client.post("/chat/completions", content=body, headers={"content-type": "application/json"})
+            return time.monotonic() - started
+
+    assert asyncio.run(main()) >= 0.9
+
+
+def test_queued_requests_are_served_in_arrival_order():
+    limiter = LLMRateLimiter(requests_per_minute=1200, tokens_per_minute=10 ** 9)
+    limiter.requests.tokens = 0
+
+    async def main():
+        order = []
+
+        def handler(request):
+            order.append(json.loads(request.content)["messages"][0]["content"])
+            return _completion(request)
+
+        async with _client(limiter, handler) as client:
+            tasks = []
+            for index in range(8):
+                tasks.append(asyncio.create_task(client.post("/chat/completions", json=_body(index))))
+                # Let each one reach the limiter's queue before the next
+                await asyncio.sleep(0.005)
+            await asyncio.gather(*tasks)
+        return order
+
+    assert asyncio.run(main()) == [f"request {index}" for index in range(8)]
+
+
+def test_rate_limited_response_pauses_the_queue():
+    limiter = LLMRateLimiter(requests_per_minute=10 ** 6, tokens_per_minute=10 ** 9)
+
+    async def main():
+        sent = []
+
+        def handler(request):
+            sent.append(time.monotonic())
+            if len(sent) == 1:
+                return httpx.Response(429, headers={"retry-after": "0.5"}, json={"error": "rate limited"})
+            return _completion(request)
+
+        async with _client(limiter, handler) as client:
+            first = await client.post("/chat/completions", json=_body(0))
+            second, third = await asyncio.gather(
+                client.post("/chat/completions", json=_body(1)),
+                client.post("/chat/completions", json=_body(2))
+            )
+        return first, second, third, sent
+
+    first, second, third, sent = asyncio.run(main())
+    assert first.status_code == 429
+    assert second.status_code == third.status_code == 200
+    # Everything queued behind the 429 waits out its retry-after
+    assert sent[1] - sent[0] >= 0.45
+    assert sent[2] - sent[0] >= 0.45
+    assert limiter.rate_limited_responses == 1
+    assert second.extensions["queue_wait"] >= 0.45
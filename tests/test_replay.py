@@ -0,0 +1,92 @@
+from controllers.replay import ReplayStore, fill_history, parameterise_history
+from database.connector import AsyncSessionLocal
+from schema.ActionScript import ActionScript
+
+SCRIPT = {"history": [{"model_output": {"action": [{"click_element": {"index": 3}}]}}]}
+
+
+def test_cached_scripts_expire(run_db):
+    async def main():
+        store = ReplayStore(ttl=0)
+        assert await store.get("crm_create") is None
+        # Recorded by another worker process
+        async with AsyncSessionLocal() as db:
+            db.add(ActionScript(template_id="crm_create", history=SCRIPT, step_count=1))
+            await db.commit()
+        found = await store.get("crm_create")
+        # ... and dropped by one
+        async with AsyncSessionLocal() as db:
+            await db.delete(await db.get(ActionScript, "crm_create"))
+            await db.commit()
+        return found, await store.get("crm_create")
+
+    found, dropped = run_db(main)
+    assert found == SCRIPT
+    assert dropped is None
+
+
+def test_scripts_are_cached_within_the_ttl(run_db):
+    async def main():
+        store = ReplayStore(ttl=3600)
+        assert await store.get("crm_create") is None
+        async with AsyncSessionLocal() as db:
+            db.add(ActionScript(template_id="crm_create", history=SCRIPT, step_count=1))
+            await db.commit()
+        return await store.get("crm_create")
+
+    assert run_db(main) is None
+
+
+def test_script_is_invalidated_after_repeated_failures(run_db, monkeypatch):
+    monkeypatch.setattr("controllers.replay.REPLAY_MAX_FAILURES", 2)
+
+    async def main():
+        store = ReplayStore()
+        await store.save("crm_create", SCRIPT, [{"name": "Ada"}])
+        first = await store.record_failure("crm_create")
+        store.record_success("crm_create")
+        second = [await store.record_failure("crm_create") for _ in range(2)]
+        return first, second, await store.get("crm_create")
+
+    first, second, script = run_db(main)
+    assert first is False
+    assert second == [False, True]
+    assert script is None
+
+
+def _recorded(*actions):
+    return {"history": [{"model_output": {"action": list(actions)}}]}
+
+
+def test_only_whole_values_are_parameterised():
+    history = _recorded(
+        {"go_to_url": {"url": "https://crm.example.com/US/orders?limit=10"}},
+        {"input_text": {"index": 4, "text": "Ada Lovelace"}},
+        {"input_text": {"index": 5, "text": "10"}},
+        {"click_element_by_text": {"text": "No"}},
+        {"input_text": {"index": 6, "text": "Not in the US"}},
+    )
+    row = {"name": "Ada Lovelace", "quantity": 10, "consent": "No", "country": "US"}
+
+    actions = parameterise_history(history, [row])["history"][0]["model_output"]["action"]
+
+    assert actions == [
+        {"go_to_url": {"url": "https://crm.example.com/US/orders?limit=10"}},
+        {"input_text": {"index": 4, "text": "{{row.name}}"}},
+        {"input_text": {"index": 5, "text": "{{row.quantity}}"}},
+        {"click_element_by_text": {"text": "{{row.consent}}"}},
+        {"input_text": {"index": 6, "text": "Not in the US"}},
+    ]
+    assert history["history"][0]["model_output"]["action"][1]["input_text"]["text"] == "Ada Lovelace"
+
+
+def test_parameterised_script_is_filled_with_another_row():
+    history = _recorded({"input_text": {"index": 4, "text": "Ada"}}, {"input_text": {"index": 5, "text": "US"}})
+    script = parameterise_history(history, [{"name": "Ada", "country": "US"}])
+
+    filled = fill_history(script, [{"name": "Grace", "country": "DE"}])
+
+    assert filled["history"][0]["model_output"]["action"] == [
+        {"input_text": {"index": 4, "text": "Grace"}},
+        {"input_text": {"index": 5, "text": "DE"}},
+    ]
@@ -0,0 +1,76 @@
+import json
+import zlib
+
+from sqlalchemy import insert
+
+from controllers.results import pack_result, unpack_details, get_task_result
+from database.connector import AsyncSessionLocal
+from schema.TaskResult import TaskResult
+from schema.TaskTracker import TaskTracker
+
+
+class Thought:
+    # Stands in for browser_use's pydantic AgentBrain
+    def model_dump(self, mode=None):
+        return {"evaluation_previous_goal": "Success", "next_goal": "Save the contact"}
+
+
+def test_details_round_trip():
+    result = {
+        "done": True,
+        "final_result": 42,
+        "urls": ["https://crm.example.com/contacts/new", None],
+        "errors": [None, "Element not found"],
+        "model_thoughts": [Thought()]
+    }
+
+    record = pack_result("e1", "j1", result)
+
+    assert record["done"] is True
+    assert record["final_result"] == "42"
+    assert record["error"] == "Element not found"
+    assert record["details_size"] == len(zlib.decompress(record["details"]))
+    assert unpack_details(record["details"]) == {
+        "urls": ["https://crm.example.com/contacts/new", None],
+        "errors": ["Element not found"],
+        "model_thoughts": [Thought().model_dump()]
+    }
+
+
+def test_details_compress():
+    result = {"model_thoughts": [{"next_goal": "Fill in the contact form"}] * 200}
+
+    record = pack_result("e1", "j1", result)
+
+    assert record["details_size"] == len(json.dumps({"urls": [], "errors": [], **result}).encode("utf-8"))
+    assert len(record["details"]) < record["details_size"] / 10
+
+
+def test_empty_details_are_not_stored():
+    record = pack_result("e1", "j1", error=TimeoutError("Run timed out"))
+
+    assert record["details"] is None
+    assert record["details_size"] is None
+    assert record["done"] is False
+    assert record["error"] == "Run timed out"
+    assert unpack_details(record["details"]) == {"urls": [], "errors": [], "model_thoughts": []}
+
+
+def test_stored_result_is_read_back(run_db):
+    async def main():
+        async with AsyncSessionLocal() as db:
+            await db.execute(insert(TaskTracker), [
+                {"row_task_id": "r1", "execution_id": "e1", "status": "Completed", "job_id": "r1"},
+                {"row_task_id": "r2", "execution_id": "e1", "status": "Completed", "job_id": "r1",
+                 "duplicate_of": "r1"}
+            ])
+            record = pack_result("e1", "r1", {"done": True, "final_result": "Saved", "urls": ["https://crm.example.com"]})
+            await db.execute(insert(TaskResult).values(row_task_id="r1", **record))
+            await db.commit()
+            return await get_task_result(db, "e1", "r2"), await get_task_result(db, "e1", "r2", details=False)
+
+    item, summary = run_db(main)
+    assert item["result_of"] == "r1"
+    assert item["final_result"] == "Saved"
+    assert item["urls"] == ["https://crm.example.com"]
+    assert "urls" not in summary
@@ -0,0 +1,67 @@
+import asyncio
+import os
+from types import SimpleNamespace
+
+import pytest
+
+from controllers.retry import (
+    retry_policy, should_retry, retry_delay, classify_failure,
+    AGENT_RETRY_BACKOFF_SECONDS, AGENT_RETRY_MAX_ATTEMPTS
+)
+
+POLICY = {"max_attempts": 3, "backoff_seconds": 10, "max_backoff_seconds": 60, "retry_on": ["timeout", "llm"]}
+
+
+def test_should_retry_until_max_attempts():
+    assert should_retry(POLICY, 1, "timeout")
+    assert should_retry(POLICY, 2, "llm")
+    assert not should_retry(POLICY, 3, "timeout")
+
+
+def test_should_retry_only_listed_failure_classes():
+    assert not should_retry(POLICY, 1, "browser")
+    assert not should_retry(POLICY, 1, "error")
+
+
+def test_should_retry_without_policy():
+    assert not should_retry(None, 1, "timeout")
+    assert not should_retry({}, 1, "timeout")
+    assert not should_retry({**POLICY, "max_attempts": 1}, 1, "timeout")
+
+
+@pytest.mark.parametrize("attempt, delay", [(1, 10), (2, 20), (3, 40), (4, 60), (10, 60)])
+def test_retry_delay_backs_off_exponentially_with_jitter(attempt, delay):
+    delays = [retry_delay(POLICY, attempt) for _ in range(200)]
+    # Equal jitter: between half the backoff and all of it, capped
+    assert all(delay / 2 <= value <= delay for value in delays)
+    assert len(set(delays)) > 1
+
+
+def test_retry_delay_defaults():
+    assert AGENT_RETRY_BACKOFF_SECONDS / 2 <= retry_delay(None, 1) <= AGENT_RETRY_BACKOFF_SECONDS
+
+
+def test_retry_policy_uses_template_overrides():
+    template = SimpleNamespace(retry_max_attempts=5, retry_backoff_seconds=None, retry_on=["browser"])
+    policy = retry_policy(template)
+    assert policy["max_attempts"] == 5
+    assert policy["backoff_seconds"] == AGENT_RETRY_BACKOFF_SECONDS
+    assert policy["retry_on"] == ["browser"]
+    assert retry_policy(None)["max_attempts"] == max(1, AGENT_RETRY_MAX_ATTEMPTS)
+
+
+@pytest.mark.skipif("AGENT_RETRY_MAX_ATTEMPTS" in os.environ or "AGENT_RETRY_ON" in os.environ,
+                    reason="retry defaults overridden by the environment")
+def test_retries_are_opt_in():
+    policy = retry_policy(None)
+    assert not should_retry(policy, 1, "timeout")
+    assert "incomplete" not in policy["retry_on"]
+    assert should_retry(retry_policy(SimpleNamespace(retry_max_attempts=2)), 1, "timeout")
+
+
+def test_classify_failure():
+    assert classify_failure(stop_status="TimedOut") == "deadline"
+    assert classify_failure() == "incomplete"
+    assert classify_failure(asyncio.TimeoutError()) == "timeout"
+    assert classify_failure(type("ReadTimeout", (Exception,), {})()) == "timeout"
+    assert classify_failure(ValueError("bad")) == "error"
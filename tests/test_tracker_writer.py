@@ -0,0 +1,126 @@
+import asyncio
+from datetime import datetime, timedelta
+
+from sqlalchemy import select, insert
+
+from controllers.tracker_writer import TrackerWriter, _apply_updates
+from schema.TaskTracker import TaskTracker
+from schema.TaskAttempt import TaskAttempt
+from schema.TaskResult import TaskResult
+
+
+def _update(row_task_id: str, status: str = None, only_from=None, start_clock: bool = False,
+            finish_clock: bool = False, attempt: dict = None, result: dict = None) -> dict:
+    return {"row_task_id": row_task_id, "status": status, "only_from": only_from, "start_clock": start_clock,
+            "finish_clock": finish_clock, "attempt": attempt, "result": result}
+
+
+async def _add_rows(db, *row_task_ids, status="Pending", time_stamp=None):
+    await db.execute(insert(TaskTracker), [
+        {"row_task_id": row_task_id, "execution_id": "e1", "file_name": "f.xlsx", "agent_id": "a1",
+         "status": status, "time_stamp": time_stamp or datetime.now(), "duration": 0.0, "attempts": 0}
+        for row_task_id in row_task_ids
+    ])
+    await db.commit()
+
+
+async def _rows(db) -> dict:
+    result = await db.execute(select(TaskTracker))
+    return {tracker.row_task_id: tracker for tracker in result.scalars().all()}
+
+
+def test_status_changes_apply_in_order(run_db):
+    from database.connector import AsyncSessionLocal
+
+    async def main():
+        async with AsyncSessionLocal() as db:
+            await _add_rows(db, "r1", "r2")
+            results = await _apply_updates(db, [
+                _update("r1", "Running", only_from=("Pending",)),
+                _update("r1", "Completed", only_from=("Running",)),
+                # r2 is not Running, so this compare-and-set fails
+                _update("r2", "Completed", only_from=("Running",)),
+                _update("missing", "Running")
+            ])
+            await db.commit()
+            return results, await _rows(db)
+
+    results, rows = run_db(main)
+    assert results == [True, True, False, False]
+    assert rows["r1"].status == "Completed"
+    assert rows["r2"].status == "Pending"
+
+
+def test_clocks_and_attempts(run_db):
+    from database.connector import AsyncSessionLocal
+
+    async def main():
+        async with AsyncSessionLocal() as db:
+            await _add_rows(db, "r1", "r2", time_stamp=datetime.now() - timedelta(hours=1))
+            await _apply_updates(db, [
+                _update("r1", "Running", start_clock=True),
+                # Cancelled meanwhile: the start does not count
+                _update("r2", "Running", only_from=("Cancelled",), start_clock=True)
+            ])
+            await db.commit()
+            await asyncio.sleep(0.05)
+            await _apply_updates(db, [_update("r1", "Pending", finish_clock=True, attempt={
+                "job_id": "r1", "status": "Failed", "failure_class": "timeout", "error": "slow"
+            })])
+            await db.commit()
+            attempts = (await db.execute(select(TaskAttempt))).scalars().all()
+            return await _rows(db), attempts
+
+    rows, attempts = run_db(main)
+    assert rows["r1"].attempts == 1
+    assert rows["r1"].time_stamp > datetime.now() - timedelta(minutes=1)
+    assert 0.05 <= rows["r1"].duration < 60
+    assert rows["r2"].attempts == 0
+    assert len(attempts) == 1
+    attempt = attempts[0]
+    assert (attempt.row_task_id, attempt.attempt, attempt.failure_class, attempt.retried) == ("r1", 1, "timeout", True)
+    assert attempt.started_at == rows["r1"].time_stamp
+
+
+def test_results_are_upserted(run_db):
+    from database.connector import AsyncSessionLocal
+
+    def result(final_result):
+        return {"execution_id": "e1", "job_id": "r1", "done": True, "replayed": False,
+                "final_result": final_result, "error": None, "details": None, "details_size": None}
+
+    async def main():
+        async with AsyncSessionLocal() as db:
+            await _add_rows(db, "r1")
+            await _apply_updates(db, [_update("r1", "Completed", result=result("first"))])
+            await db.commit()
+            await _apply_updates(db, [_update("r1", result=result("second"))])
+            await db.commit()
+            return (await db.execute(select(TaskResult))).scalars().all()
+
+    results = run_db(main)
+    assert [(row.row_task_id, row.final_result) for row in results] == [("r1", "second")]
+
+
+def test_writer_groups_concurrent_updates_into_one_commit(run_db):
+    from database.connector import AsyncSessionLocal
+
+    async def main():
+        async with AsyncSessionLocal() as db:
+            await _add_rows(db, *[f"r{index}" for index in range(20)])
+        writer = TrackerWriter()
+        try:
+            changed = await asyncio.gather(*[
+                writer.update(f"r{index}", "Running", only_from=("Pending",)) for index in range(20)
+            ])
+        finally:
+            await writer.close()
+        async with AsyncSessionLocal() as db:
+            return changed, writer.stats(), await _rows(db)
+
+    changed, stats, rows = run_db(main)
+    assert all(changed)
+    assert stats["updates"] == 20
+    # The first update commits alone; the rest queue up behind it
+    assert stats["commits"] <= 2
+    assert {row.status for row in rows.values()} == {"Running"}
@@ -0,0 +1,181 @@
+import io
+from datetime import datetime, timedelta
+
+import pytest
+
+pytest.importorskip("browser_use")
+
+from fastapi import UploadFile
+from sqlalchemy import select, update
+
+from controllers import task as task_module
+from controllers.task import (process_excel_file, register_upload, find_upload, finish_upload, row_hash,
+                              row_hash_scope)
+from database.connector import AsyncSessionLocal
+from schema.AgentJob import AgentJob
+from schema.DBRunner import Task
+from schema.TaskTracker import TaskTracker
+from schema.Upload import Upload
+
+CREDENTIALS = {"email": "user@example.com", "password": "secret"}
+SHEET = "name,operation\nAda,create\nGrace,create\n"
+
+
+async def _add_template(db):
+    if await db.get(Task, "crm_create") is None:
+        db.add(Task(id="crm_create", operation_description="Create a contact", operation_steps="1. Save"))
+        await db.commit()
+
+
+async def _ingest(tmp_path, sheet: str, name: str = "f.csv", upload_id: int = None):
+    path = tmp_path / name
+    path.write_text(sheet)
+    async with AsyncSessionLocal() as db:
+        await _add_template(db)
+    return await process_excel_file(str(path), name, "e1", "a1", "crm", "https://crm.example.com", CREDENTIALS,
+                                    dedup_rows=True, upload_id=upload_id)
+
+
+async def _tracker(db) -> dict:
+    result = await db.execute(select(TaskTracker).order_by(TaskTracker.id))
+    return {row.row_task_id: row for row in result.scalars().all()}
+
+
+async def _jobs(db) -> dict:
+    result = await db.execute(select(AgentJob))
+    return {job.id: job for job in result.scalars().all()}
+
+
+def test_row_hash_ignores_layout_of_the_row():
+    scope = row_hash_scope("a1", "crm", "https://crm.example.com", CREDENTIALS)
+
+    assert row_hash(scope, {"Name ": " Ada", "operation": "create", "Note": ""}) == \
+        row_hash(scope, {"operation": "create", "name": "Ada"})
+    assert row_hash(scope, {"name": "Ada"}) != row_hash(scope, {"name": "Grace"})
+    other = row_hash_scope("a1", "crm", "https://crm.example.com", {**CREDENTIALS, "password": "other"})
+    assert row_hash(scope, {"name": "Ada"}) != row_hash(other, {"name": "Ada"})
+
+
+def test_duplicate_joins_the_queued_job(run_db, tmp_path):
+    async def main():
+        await _ingest(tmp_path, SHEET)
+        await _ingest(tmp_path, "name,operation\nAda ,create\n", name="g.csv")
+        async with AsyncSessionLocal() as db:
+            return await _tracker(db), await _jobs(db)
+
+    tracker, jobs = run_db(main)
+    ada, grace, duplicate = tracker.values()
+    assert duplicate.duplicate_of == ada.row_task_id
+    assert duplicate.job_id == ada.job_id
+    assert duplicate.status == "Pending"
+    # No job of its own; it rides along in Ada's
+    assert len(jobs) == 2
+    assert jobs[ada.job_id].row_task_ids == [ada.row_task_id, duplicate.row_task_id]
+
+
+def test_duplicate_of_a_claimed_job_runs_on_its_own(run_db, tmp_path):
+    async def main():
+        await _ingest(tmp_path, SHEET)
+        async with AsyncSessionLocal() as db:
+            await db.execute(update(AgentJob).values(status="leased"))
+            await db.commit()
+        await _ingest(tmp_path, "name,operation\nAda,create\n", name="g.csv")
+        async with AsyncSessionLocal() as db:
+            return await _tracker(db), await _jobs(db)
+
+    tracker, jobs = run_db(main)
+    repeat = list(tracker.values())[-1]
+    assert repeat.duplicate_of is None
+    assert jobs[repeat.job_id].row_task_ids == [repeat.row_task_id]
+
+
+def test_duplicate_of_a_completed_row_is_inserted_completed(run_db, tmp_path):
+    async def main():
+        await _ingest(tmp_path, SHEET)
+        async with AsyncSessionLocal() as db:
+            await db.execute(update(TaskTracker).values(status="Completed"))
+            await db.execute(update(AgentJob).values(status="done"))
+            await db.commit()
+        await _ingest(tmp_path, "name,operation\nGrace,create\n", name="g.csv")
+        async with AsyncSessionLocal() as db:
+            return await _tracker(db), await _jobs(db)
+
+    tracker, jobs = run_db(main)
+    _, grace, duplicate = tracker.values()
+    assert duplicate.status == "Completed"
+    assert duplicate.duplicate_of == grace.row_task_id
+    assert len(jobs) == 2
+
+
+def test_repeat_upload_is_not_processed_again(run_db, monkeypatch):
+    from routes import router as routes
+
+    started = []
+
+    async def fake_process(**kwargs):
+        started.append(kwargs["upload_id"])
+
+    monkeypatch.setattr(routes, "process_excel_file", fake_process)
+
+    async def start():
+        async with AsyncSessionLocal() as db:
+            return await routes.start_agent(
+                executionId="e1", agentId="a1", email=CREDENTIALS["email"], password=CREDENTIALS["password"],
+                taskExcel=UploadFile(file=io.BytesIO(SHEET.encode("utf-8")), filename="f.csv"),
+                appType="crm", url="https://crm.example.com", batchMode=False, batchSize=10,
+                priority="normal", dedupRows=False, db=db
+            )
+
+    async def main():
+        first = await start()
+        second = await start()
+        return first, second
+
+    first, second = run_db(main)
+    assert "duplicate" not in first
+    assert second["duplicate"] is True
+    assert second["file_hash"] == first["file_hash"]
+    assert len(started) == 1
+
+
+def test_failed_upload_can_be_retried(run_db):
+    async def main():
+        async with AsyncSessionLocal() as db:
+            upload_id = await register_upload(db, "e1", "hash", "f.csv", "a1")
+            repeat = await register_upload(db, "e1", "hash", "f.csv", "a1")
+            await finish_upload(db, upload_id, None)
+            retried = await register_upload(db, "e1", "hash", "f.csv", "a1")
+            return upload_id, repeat, retried, (await find_upload(db, "e1", "hash")).status
+
+    upload_id, repeat, retried, status = run_db(main)
+    assert repeat is None
+    assert retried == upload_id
+    assert status == "processing"
+
+
+def test_stalled_upload_can_be_retried(run_db):
+    async def main():
+        async with AsyncSessionLocal() as db:
+            upload_id = await register_upload(db, "e1", "hash", "f.csv", "a1")
+            stalled = datetime.now() - timedelta(seconds=task_module.UPLOAD_STALE_SECONDS + 1)
+            await db.execute(update(Upload).where(Upload.id == upload_id).values(updated_at=stalled))
+            await db.commit()
+            return upload_id, await register_upload(db, "e1", "hash", "f.csv", "a1")
+
+    upload_id, retried = run_db(main)
+    assert retried == upload_id
+
+
+def test_retried_upload_resumes_after_its_queued_rows(run_db, tmp_path):
+    async def main():
+        async with AsyncSessionLocal() as db:
+            upload_id = await register_upload(db, "e1", "hash", "f.csv", "a1")
+        # An attempt that got through the first row only
+        await _ingest(tmp_path, "name,operation\nAda,create\n", upload_id=upload_id)
+        await _ingest(tmp_path, SHEET, upload_id=upload_id)
+        async with AsyncSessionLocal() as db:
+            return await db.get(Upload, upload_id), await _tracker(db)
+
+    upload, tracker = run_db(main)
+    assert (upload.status, upload.row_count, upload.duplicate_rows) == ("done", 2, 0)
+    assert [row.job_id for row in tracker.values()] == list(tracker)
@@ -0,0 +1,67 @@
+import argparse
+import asyncio
+import multiprocessing
+import os
+import signal
+import sys
+from dotenv import load_dotenv
+
+from database.connector import engine, Base, ensure_schema
+from controllers.worker import run_worker, WORKER_DRAIN_SECONDS
+
+# Standalone agent worker. Run any number of these against the API's runs.db;
+# start the API with JOB_DISPATCH_IN_API=0 to leave all agent runs to them. They must all run on the API's
+# host: runs.db is in WAL mode, whose shared-memory index does not work across
+# machines, and SQLite on a network filesystem is not safe to share anyway.
+
+load_dotenv()
+
+
+def _worker_main(max_concurrency, drain_seconds):
+    if sys.platform.startswith("win"):
+        asyncio.set_event_loop_policy(asyncio.WindowsProactorEventLoopPolicy())
+    asyncio.run(run_worker(max_concurrency, drain_seconds))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run browser agent workers against the shared job queue.")
+    parser.add_argument("--processes", type=int, default=1, help="worker processes to start on this host")
+    parser.add_argument("--concurrency", type=int, default=None,
+                        help="max concurrent agents per worker process (default AGENT_MAX_CONCURRENCY)")
+    parser.add_argument("--drain-seconds", type=float, default=WORKER_DRAIN_SECONDS,
+                        help="how long a stopping worker waits for its running jobs")
+    args = parser.parse_args()
+
+    Base.metadata.create_all(bind=engine)
+    ensure_schema()
+    # Children must not share the parent's pooled connections
+    engine.dispose()
+
+    if args.processes <= 1:
+        _worker_main(args.concurrency, args.drain_seconds)
+        return
+
+    processes = [
+        multiprocessing.Process(target=_worker_main, args=(args.concurrency, args.drain_seconds))
+        for _ in range(args.processes)
+    ]
+    for process in processes:
+        process.start()
+
+    def _forward(sig, frame):
+        # Each child drains on its own; the parent just waits for them
+        for process in processes:
+            if process.is_alive():
+                try:
+                    os.kill(process.pid, sig)
+                except OSError:
+                    pass
+
+    signal.signal(signal.SIGTERM, _forward)
+    signal.signal(signal.SIGINT, _forward)
+    for process in processes:
+        process.join()
+
+
+if __name__ == "__main__":
+    main()